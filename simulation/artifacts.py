@@ -0,0 +1,130 @@
+"""
+Simulation Artifact Store
+Content-addressed storage for files collected from simulation containers.
+
+Containers hand artifacts over as tar streams (`get_archive`, `docker cp`).
+The stream is unpacked member by member straight to disk while hashing, so
+no artifact is ever held in memory; each file is stored once under its
+SHA-256 digest however many runs produce it. The least recently stored
+files are evicted once the store exceeds `max_bytes`.
+"""
+
+import io
+import os
+import tarfile
+import hashlib
+import logging
+import posixpath
+import tempfile
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks: Iterator[bytes] = iter(chunks)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class ArtifactStore:
+    """Directory of artifact files named by their SHA-256 digest."""
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest: str) -> Optional[str]:
+        """On-disk path of an artifact, or None for a malformed digest."""
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+            return None
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        """Whether an artifact is still in the store (it may have been evicted)."""
+        path = self.path(digest)
+        return path is not None and os.path.isfile(path)
+
+    def store_archive(self, chunks: Iterable[bytes], source: str) -> List[Dict[str, Any]]:
+        """
+        Unpack a tar stream of `source` (a container path) into the store.
+        Returns one {"path", "digest", "size"} entry per regular file, with
+        `path` being the file's path inside the container.
+        """
+        base = posixpath.dirname(source.rstrip("/"))
+        stored = []
+        with tarfile.open(fileobj=io.BufferedReader(_ChunkReader(chunks), CHUNK_SIZE), mode="r|") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                digest, size = self._store_file(archive.extractfile(member))
+                stored.append({"path": posixpath.join(base, member.name), "digest": digest, "size": size})
+        self._evict()
+        return stored
+
+    def _store_file(self, source) -> Tuple[str, int]:
+        sha256 = hashlib.sha256()
+        size = 0
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                for block in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    sha256.update(block)
+                    f.write(block)
+                    size += len(block)
+            digest = sha256.hexdigest()
+            path = self.path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                # Same content already stored; refresh its eviction age
+                os.utime(path)
+                os.remove(temporary)
+            else:
+                os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return digest, size
+
+    def _evict(self):
+        """Remove the oldest artifacts until the store fits max_bytes."""
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                logger.warning(f"Failed to evict artifact {path}: {e}")
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Simulator Micro-Benchmarks
+Measures simulator throughput and compares it against stored baselines.
+
+Usage:
+    python -m simulation.benchmark --output bench.json \\
+        --baseline benchmarks/simulation_baseline.json
+
+Each case reports steps/sec and robots x steps/sec. With --baseline, any case
+whose robot_steps_per_sec falls more than --tolerance below the baseline is
+reported as a regression and the command exits non-zero.
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+from contextlib import contextmanager
+from typing import Dict, Any, List
+
+import numpy as np
+
+from simulation.lidar import PlanarLidar
+from simulation.simulation import TurtleBotSimulator
+from simulation.swarm import SwarmSimulator
+from simulation.world import CIRCLE, StaticWorld
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_FORMAT_VERSION = 1
+
+# (name, robots, integrator, dt, steps[, robot_model]); single-robot cases run
+# TurtleBotSimulator, the motion model defaults to differential_drive and
+# lidar cases time one 360-beam scan of every robot per step
+BENCHMARK_CASES = [
+    ("turtlebot", 1, "euler", 0.1, 20000),
+    ("turtlebot", 1, "exact", 0.1, 20000),
+    ("turtlebot", 1, "euler", 0.01, 20000),
+    ("swarm", 100, "euler", 0.1, 2000),
+    ("swarm", 100, "exact", 0.1, 2000),
+    ("swarm", 1000, "euler", 0.1, 1000),
+    ("swarm", 1000, "exact", 0.1, 1000),
+    ("swarm", 10000, "euler", 0.1, 200),
+    ("swarm", 10000, "exact", 0.1, 200),
+    ("turtlebot", 1, "euler", 0.1, 20000, "ackermann"),
+    ("turtlebot", 1, "euler", 0.1, 20000, "waypoint_follower"),
+    ("swarm", 10000, "euler", 0.1, 200, "ackermann"),
+    ("swarm", 10000, "exact", 0.1, 200, "holonomic"),
+    ("swarm", 10000, "euler", 0.1, 200, "waypoint_follower"),
+    ("lidar", 100, "euler", 0.1, 50),
+    ("lidar", 500, "euler", 0.1, 10),
+]
+
+DEFAULT_MOTION_MODEL = "differential_drive"
+
+# Extra parameters so every model actually turns or moves during the benchmark
+MOTION_MODEL_PARAMETERS = {
+    "ackermann": {"steering_angle": 0.3},
+    "holonomic": {"lateral_velocity": 0.2},
+    "waypoint_follower": {"waypoints": [[5, 0], [5, 5], [0, 5], [0, 0]], "loop_waypoints": True}
+}
+
+
+def case_id(case: Dict[str, Any]) -> str:
+    """Stable identifier used to match results against baselines."""
+    identifier = f"{case['name']}/robots={case['robots']}/integrator={case['integrator']}/dt={case['dt']}"
+    model = case.get("robot_model", DEFAULT_MOTION_MODEL)
+    return identifier if model == DEFAULT_MOTION_MODEL else f"{identifier}/model={model}"
+
+
+@contextmanager
+def quiet_simulators():
+    """Silence per-step progress logging so it does not dominate the timings."""
+    loggers = [logging.getLogger(name) for name in ("simulation.simulation", "simulation.swarm")]
+    levels = [log.level for log in loggers]
+    for log in loggers:
+        log.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        for log, level in zip(loggers, levels):
+            log.setLevel(level)
+
+
+def _model_parameters(robot_model: str) -> Dict[str, Any]:
+    return {"robot_model": robot_model, **MOTION_MODEL_PARAMETERS.get(robot_model, {})}
+
+
+def _time_turtlebot(integrator: str, dt: float, steps: int, robot_model: str = DEFAULT_MOTION_MODEL) -> float:
+    simulator = TurtleBotSimulator({
+        "sync_mode": "fast", "integrator": integrator, "dt": dt,
+        "max_time": steps * dt * 2, "max_steps": steps, **_model_parameters(robot_model)
+    })
+    start = time.perf_counter()
+    for _ in simulator.frames(decimation=steps):
+        pass
+    return time.perf_counter() - start
+
+
+def _time_swarm(robots: int, integrator: str, dt: float, steps: int, robot_model: str = DEFAULT_MOTION_MODEL) -> float:
+    swarm = SwarmSimulator({"num_robots": robots, "integrator": integrator, "dt": dt, **_model_parameters(robot_model)})
+    start = time.perf_counter()
+    for _ in range(steps):
+        swarm.step(dt)
+    return time.perf_counter() - start
+
+
+def _time_lidar(robots: int, steps: int) -> float:
+    # Deterministic clutter: 200 boxes and cylinders plus the robots themselves
+    rng = np.random.default_rng(0)
+    side = 3.0 * np.sqrt(robots)
+    count = 200
+    yaw = rng.uniform(0, 2 * np.pi, count)
+    size = rng.uniform(0.1, 0.5, (count, 2))
+    kinds = (rng.random(count) < 0.5).astype(np.int8)
+    size[kinds == CIRCLE, 1] = size[kinds == CIRCLE, 0]
+    shapes = np.column_stack([rng.uniform(0, side, (count, 2)), size, np.cos(yaw), np.sin(yaw)])
+    world = StaticWorld([str(i) for i in range(count)], kinds, shapes)
+    lidar = PlanarLidar(beams=360, max_range=3.5, noise=0.01, seed=0)
+    x, y, theta = rng.uniform(0, side, robots), rng.uniform(0, side, robots), rng.uniform(0, 2 * np.pi, robots)
+    start = time.perf_counter()
+    for _ in range(steps):
+        lidar.scan(x, y, theta, world, 0.1)
+    return time.perf_counter() - start
+
+
+def run_case(name: str, robots: int, integrator: str, dt: float, steps: int, repeat: int = 3,
+             robot_model: str = DEFAULT_MOTION_MODEL) -> Dict[str, Any]:
+    """Time one case, keeping the best of `repeat` runs to reduce noise."""
+    timings = []
+    for _ in range(repeat):
+        if name == "turtlebot":
+            timings.append(_time_turtlebot(integrator, dt, steps, robot_model))
+        elif name == "lidar":
+            timings.append(_time_lidar(robots, steps))
+        else:
+            timings.append(_time_swarm(robots, integrator, dt, steps, robot_model))
+    seconds = max(min(timings), 1e-9)
+    result = {
+        "name": name, "robots": robots, "integrator": integrator, "dt": dt,
+        "robot_model": robot_model, "steps": steps, "seconds": seconds,
+        "steps_per_sec": steps / seconds,
+        "robot_steps_per_sec": robots * steps / seconds
+    }
+    result["id"] = case_id(result)
+    return result
+
+
+def run_benchmarks(cases=None, repeat: int = 3, scale: float = 1.0) -> Dict[str, Any]:
+    """Run every case; `scale` shrinks or grows the step counts."""
+    results = []
+    with quiet_simulators():
+        for name, robots, integrator, dt, steps, *model in cases or BENCHMARK_CASES:
+            result = run_case(name, robots, integrator, dt, max(1, int(steps * scale)), repeat,
+                              model[0] if model else DEFAULT_MOTION_MODEL)
+            logger.info(f"{result['id']}: {result['steps_per_sec']:.0f} steps/s, "
+                        f"{result['robot_steps_per_sec']:.0f} robot-steps/s")
+            results.append(result)
+    return {
+        "version": BENCHMARK_FORMAT_VERSION,
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform()
+        },
+        "results": results
+    }
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any],
+                        tolerance: float = 0.3) -> List[Dict[str, Any]]:
+    """
+    Return one entry per case slower than (1 - tolerance) x its baseline
+    robot_steps_per_sec. Cases missing from the baseline are ignored.
+    """
+    expected = {result["id"]: result for result in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        reference = expected.get(result["id"])
+        if reference is None:
+            continue
+        ratio = result["robot_steps_per_sec"] / reference["robot_steps_per_sec"]
+        if ratio < 1.0 - tolerance:
+            regressions.append({
+                "id": result["id"],
+                "baseline": reference["robot_steps_per_sec"],
+                "measured": result["robot_steps_per_sec"],
+                "ratio": ratio
+            })
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Brain Swarm simulator micro-benchmarks")
+    parser.add_argument("--output", help="Write the benchmark report as JSON to this file")
+    parser.add_argument("--baseline", help="Baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="Allowed fractional slowdown before a case fails (default 0.3)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the best is kept")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for per-case step counts")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Overwrite --baseline with this run instead of comparing")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(repeat=args.repeat, scale=args.scale)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Benchmark report written to {args.output}")
+
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Baseline updated: {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(report, baseline, args.tolerance)
+    for regression in regressions:
+        logger.error(f"REGRESSION {regression['id']}: {regression['measured']:.0f} robot-steps/s "
+                     f"vs baseline {regression['baseline']:.0f} ({regression['ratio']:.0%})")
+    if regressions:
+        return 1
+    logger.info("No benchmark regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Simulation Result Cache
+Content-addressed on-disk cache for deterministic simulation runs.
+
+A run is identified by the Docker image digest, the hash of the simulation
+script, the canonicalized parameters and the artifact paths it collects. Entries are small JSON files; the
+least recently used ones are evicted once the entry count or total size
+exceeds the configured limits.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+
+
+def canonical_parameters(parameters: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Parameters as the container sees them: environment variables are
+    strings, so {"max_time": 10} and {"max_time": "10"} are the same run.
+    """
+    return {str(key): str(value) for key, value in sorted(parameters.items())}
+
+
+def file_hash(path: str) -> Optional[str]:
+    """SHA-256 of a file's content, or None if it cannot be read."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def make_cache_key(image_digest: str, script_hash: str, parameters: Dict[str, Any],
+                   artifacts: Iterable[str] = ()) -> str:
+    """Stable key for one (image, script, parameters, artifact paths) combination."""
+    document = json.dumps({
+        "version": CACHE_VERSION,
+        "image": image_digest,
+        "script": script_hash,
+        "parameters": canonical_parameters(parameters),
+        "artifacts": sorted(artifacts)
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    LRU result store with entry-count and byte-size limits.
+    Reads bump an entry's mtime, which doubles as its LRU timestamp.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Store a result and evict old entries beyond the limits."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(value, f)
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Failed to cache simulation result: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until both limits hold."""
+        entries = []
+        try:
+            with os.scandir(self.directory) as listing:
+                for entry in listing:
+                    if entry.name.endswith(".json"):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total_bytes -= size
+
+    def clear(self):
+        """Remove every cached entry."""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,238 @@
+"""
+Warm Container Pool
+Keeps pre-started, idle simulation containers and dispatches runs into them
+with an exec instead of paying `containers.run` start-up per request.
+
+Each container serves one run at a time. A run executes in its own scratch
+directory with its own environment. Containers are recycled after
+`max_runs` runs or after any failed run. The pool grows on demand up to
+`max_size` and shrinks back to `min_size` as containers sit idle longer than
+`idle_timeout` seconds; while it holds more than `min_size` containers, a
+reaper thread expires idle ones even when no run is released.
+"""
+
+import time
+import uuid
+import logging
+import threading
+from typing import Dict, Any, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+POOL_LABEL = "brain-swarm.pool"
+
+# Runs `"$@"` inside a private scratch directory, which is removed afterwards.
+# Artifacts left by the container's previous run are deleted first, with
+# pathname expansion off so the space-separated list is split but never globbed.
+RUN_WRAPPER = ('set -f; rm -rf -- $RUN_ARTIFACTS; set +f; mkdir -p "$RUN_DIR" && cd "$RUN_DIR" && "$@"; status=$?; '
+               'cd / && rm -rf "$RUN_DIR"; exit $status')
+
+
+class WarmContainer:
+    """A pooled container and its bookkeeping."""
+
+    __slots__ = ("container", "runs", "idle_since")
+
+    def __init__(self, container):
+        self.container = container
+        self.runs = 0
+        self.idle_since = time.monotonic()
+
+
+class WarmContainerPool:
+    """
+    Pool of idle containers of one image, started with a long-running no-op
+    command and shared by exec-dispatched runs.
+    """
+
+    def __init__(self, docker_client, image: str, min_size: int = 1, max_size: int = 4,
+                 max_runs: int = 50, idle_timeout: float = 300.0, volumes: Optional[Dict[str, Any]] = None,
+                 acquire_timeout: float = 300.0, run_options: Optional[Dict[str, Any]] = None,
+                 on_start: Optional[Callable[[float], None]] = None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.docker_client = docker_client
+        self.image = image
+        self.max_size = int(max_size)
+        self.min_size = max(0, min(int(min_size), self.max_size))
+        self.max_runs = int(max_runs)
+        self.idle_timeout = float(idle_timeout)
+        self.volumes = volumes or {}
+        self.acquire_timeout = float(acquire_timeout)
+        # Extra containers.run arguments, such as resource limits
+        self.run_options = run_options or {}
+        # Called with the seconds each container took to start
+        self.on_start = on_start
+        self._idle: List[WarmContainer] = []
+        self._size = 0
+        self._closed = False
+        self._available = threading.Condition()
+        # Reaper thread, running only while the pool holds more than min_size containers
+        self._reaper: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def _start(self) -> WarmContainer:
+        started = time.monotonic()
+        container = self.docker_client.containers.run(
+            image=self.image,
+            command=["sleep", "infinity"],
+            detach=True,
+            name=f"turtlebot-pool-{uuid.uuid4().hex[:12]}",
+            volumes=self.volumes,
+            labels={POOL_LABEL: self.image},
+            **self.run_options
+        )
+        if self.on_start is not None:
+            self.on_start(time.monotonic() - started)
+        return WarmContainer(container)
+
+    def _discard(self, warm: WarmContainer):
+        try:
+            warm.container.remove(force=True)
+        except Exception as e:
+            logger.warning(f"Failed to remove pooled container: {e}")
+
+    def warm(self):
+        """Start containers until the pool holds min_size of them."""
+        while True:
+            with self._available:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            self._add(self._start_slot())
+
+    def _start_slot(self) -> WarmContainer:
+        """Start a container for a slot already counted in _size, giving the slot back on failure."""
+        try:
+            return self._start()
+        except Exception:
+            with self._available:
+                self._size -= 1
+                self._available.notify()
+            raise
+
+    def _add(self, warm: WarmContainer):
+        with self._available:
+            if self._closed:
+                self._size -= 1
+            else:
+                self._idle.append(warm)
+                self._available.notify()
+                return
+        self._discard(warm)
+
+    def acquire(self) -> WarmContainer:
+        """Take an idle container, starting one if the pool has room, else wait for one."""
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Container pool is closed")
+                if self._idle:
+                    # Most recently used first, so surplus containers age out
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    if self._size > self.min_size and self._reaper is None:
+                        self._reaper = threading.Thread(target=self._reap, name=f"pool-reaper-{self.image}",
+                                                        daemon=True)
+                        self._reaper.start()
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._available.wait(remaining):
+                    raise TimeoutError(f"No pooled {self.image} container became free")
+        logger.info(f"Growing {self.image} container pool to {self._size}")
+        return self._start_slot()
+
+    def release(self, warm: WarmContainer, healthy: bool = True):
+        """Return a container after a run; failed or worn-out containers are recycled."""
+        warm.runs += 1
+        recycle = not healthy or warm.runs >= self.max_runs
+        with self._available:
+            if recycle or self._closed:
+                self._size -= 1
+            else:
+                warm.idle_since = time.monotonic()
+                self._idle.append(warm)
+            stale = self._expire_idle()
+            self._available.notify()
+        for container in ([warm] if recycle or self._closed else []) + stale:
+            self._discard(container)
+        if recycle and not self._closed:
+            logger.info(f"Recycled a {self.image} container after {warm.runs} runs")
+            threading.Thread(target=self._replenish, daemon=True).start()
+
+    def _replenish(self):
+        try:
+            self.warm()
+        except Exception as e:
+            logger.warning(f"Failed to refill {self.image} container pool: {e}")
+
+    def _reap(self):
+        """Expire idle surplus containers until the pool is back to min_size or closed."""
+        interval = max(self.idle_timeout / 4, 0.05)
+        while not self._stopped.wait(interval):
+            with self._available:
+                stale = self._expire_idle()
+                done = self._closed or self._size <= self.min_size
+                if done:
+                    self._reaper = None
+            for warm in stale:
+                self._discard(warm)
+            if done:
+                return
+
+    def _expire_idle(self) -> List[WarmContainer]:
+        """Remove containers idle past idle_timeout beyond min_size; caller holds the lock."""
+        now = time.monotonic()
+        stale = []
+        # Oldest idle containers sit at the front of the list
+        while self._size > self.min_size and self._idle and now - self._idle[0].idle_since >= self.idle_timeout:
+            stale.append(self._idle.pop(0))
+            self._size -= 1
+        return stale
+
+    def run(self, command: List[str], environment: Dict[str, Any], output: Callable[[bytes], None],
+            artifacts: Sequence[str] = (), collect: Optional[Callable[[Any], None]] = None) -> int:
+        """
+        Execute a command in a pooled container, streaming its output in
+        chunks; returns the exit code. `artifacts` are container paths
+        cleared before the run, and `collect(container)` is called after it
+        while the container is still reserved for this run.
+        """
+        warm = self.acquire()
+        healthy = False
+        try:
+            api = self.docker_client.api
+            run_environment = {**environment, "RUN_DIR": f"/tmp/run-{uuid.uuid4().hex[:12]}",
+                               "RUN_ARTIFACTS": " ".join(artifacts)}
+            exec_id = api.exec_create(
+                warm.container.id, ["sh", "-c", RUN_WRAPPER, "run", *command],
+                environment=run_environment, workdir="/"
+            )["Id"]
+            for chunk in api.exec_start(exec_id, stream=True):
+                output(chunk)
+            exit_code = api.exec_inspect(exec_id)["ExitCode"]
+            if collect is not None:
+                collect(warm.container)
+            healthy = exit_code == 0
+            return exit_code
+        finally:
+            self.release(warm, healthy)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size and idle container count."""
+        with self._available:
+            return {"image": self.image, "size": self._size, "idle": len(self._idle),
+                    "min_size": self.min_size, "max_size": self.max_size}
+
+    def close(self):
+        """Remove every idle container; busy ones are removed when released."""
+        with self._available:
+            self._closed = True
+            self._stopped.set()
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._available.notify_all()
+        for warm in idle:
+            self._discard(warm)
@@ -0,0 +1,179 @@
+"""
+Docker Image Metadata Cache
+Remembers image lookups (existence, id, repo digests, size) so requests do
+not each pay a daemon round-trip for `images.get`.
+
+Entries are only trusted while a background watcher is subscribed to the
+Docker events stream; pull, tag, load, untag and delete events invalidate the
+affected entries. Whenever the stream is down, lookups go straight to the
+daemon and the cache is dropped, so a missed event can never serve stale
+metadata.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional
+
+import docker
+
+logger = logging.getLogger(__name__)
+
+# Events after which a previously missing image name may now resolve
+ADDED_ACTIONS = ("pull", "tag", "load", "import")
+
+# Seconds between reconnection attempts to the events stream
+RECONNECT_DELAY = 5.0
+
+
+class ImageInfo(NamedTuple):
+    """Metadata of a local image."""
+    name: str
+    id: str
+    repo_digests: List[str]
+    size: int
+
+
+def normalize_image_name(name: str) -> str:
+    """Image reference with the implicit `:latest` tag made explicit."""
+    if "@" in name or ":" in name.rsplit("/", 1)[-1]:
+        return name
+    return f"{name}:latest"
+
+
+class ImageMetadataCache:
+    """
+    Image lookups cached per normalized name; missing images are cached as
+    None so "image not found" is answered without the daemon as well.
+    `max_age` bounds how long any entry lives even while watching.
+    """
+
+    def __init__(self, docker_client, max_age: float = 300.0):
+        self.docker_client = docker_client
+        self.max_age = float(max_age)
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Any] = {}
+        # Bumped by every invalidation so lookups racing an event are not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._watching = False
+        self._stopped = threading.Event()
+        self._stream = None
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, name: str) -> Optional[ImageInfo]:
+        """Metadata for an image, or None if it is not present locally."""
+        key = normalize_image_name(name)
+        now = time.monotonic()
+        with self._lock:
+            if self._watching and key in self._entries:
+                info, stored_at = self._entries[key]
+                if now - stored_at < self.max_age:
+                    self.hits += 1
+                    return info
+            self.misses += 1
+            generation = self._generation
+        info = self._lookup(key)
+        self._store(key, info, generation)
+        return info
+
+    def _store(self, key: str, info: Optional[ImageInfo], generation: int):
+        with self._lock:
+            if self._watching and generation == self._generation:
+                self._entries[key] = (info, time.monotonic())
+
+    def _lookup(self, name: str) -> Optional[ImageInfo]:
+        try:
+            image = self.docker_client.images.get(name)
+        except docker.errors.ImageNotFound:
+            return None
+        attrs = getattr(image, "attrs", None) or {}
+        return ImageInfo(name, image.id, list(attrs.get("RepoDigests") or []), int(attrs.get("Size") or 0))
+
+    def invalidate(self, event: Dict[str, Any]):
+        """Drop the entries an image event may have changed."""
+        action = event.get("Action") or event.get("status") or ""
+        actor = event.get("Actor") or {}
+        subjects = {actor.get("ID") or event.get("id"), (actor.get("Attributes") or {}).get("name")}
+        names = {normalize_image_name(subject) for subject in subjects if subject}
+        with self._lock:
+            self._generation += 1
+            for key, (info, _) in list(self._entries.items()):
+                if key in names or (info is not None and info.id in subjects):
+                    del self._entries[key]
+                elif info is None and action in ADDED_ACTIONS:
+                    # A load or import may have created any name
+                    del self._entries[key]
+        logger.debug(f"Image cache invalidated by {action} of {', '.join(sorted(names)) or 'unknown image'}")
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def start(self):
+        """Subscribe to Docker image events in a background thread."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._watch, name="docker-image-events", daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        while not self._stopped.is_set():
+            try:
+                self._stream = self.docker_client.events(decode=True, filters={"type": "image"})
+                with self._lock:
+                    self._generation += 1
+                    self._entries.clear()
+                    self._watching = True
+                for event in self._stream:
+                    self.invalidate(event)
+                    if self._stopped.is_set():
+                        break
+            except Exception as e:
+                if not self._stopped.is_set():
+                    logger.warning(f"Docker events stream failed, image cache disabled: {e}")
+            finally:
+                with self._lock:
+                    self._generation += 1
+                    self._watching = False
+                    self._entries.clear()
+            self._stopped.wait(RECONNECT_DELAY)
+
+    def stop(self):
+        """Stop watching events; lookups go to the daemon from now on."""
+        self._stopped.set()
+        stream, self._stream = self._stream, None
+        if stream is not None and hasattr(stream, "close"):
+            try:
+                stream.close()
+            except Exception:
+                pass
+        self._thread = None
+
+    def prepull(self, names: Iterable[str]) -> Dict[str, bool]:
+        """Pull images missing locally; returns which of them are available afterwards."""
+        available = {}
+        for name in names:
+            key = normalize_image_name(name)
+            info = self.get(key)
+            if info is None:
+                try:
+                    logger.info(f"Pulling simulation image {key}")
+                    self.docker_client.images.pull(key)
+                    # Do not wait for the pull event to drop the cached miss
+                    self.invalidate({"Action": "pull", "Actor": {"ID": key}})
+                    info = self.get(key)
+                except Exception as e:
+                    logger.warning(f"Failed to pull simulation image {key}: {e}")
+            if info is None:
+                logger.warning(f"Simulation image {key} is not available; runs using it will fail")
+            available[key] = info is not None
+        return available
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"watching": self._watching, "entries": len(self._entries),
+                    "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,197 @@
+"""
+In-Process Execution Backend
+Runs trusted `simulation.simulation` scenarios in a pool of pre-started
+worker processes instead of starting a container per run.
+
+Request parameters are normalized exactly like the container normalizes its
+environment (see load_parameters), so both backends see the same scenario.
+Runs default to the `fast` sync mode: nothing paces a headless worker, and a
+worker held for wall-clock time would starve the pool. Scenarios are capped
+in simulated time and steps, may only load worlds from a configured
+directory, and stop at their wall-clock timeout; a worker that does not stop
+is killed and the pool restarted.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from typing import Dict, Any, Optional
+
+from simulation.simulation import (
+    TurtleBotSimulator, create_lidar, create_world, load_parameters, logger as simulation_logger
+)
+
+logger = logging.getLogger(__name__)
+
+# Scripts whose behavior the in-process backend reproduces
+TRUSTED_SCRIPTS = ("/app/simulation.py",)
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Upper bounds of one in-process scenario
+MAX_SCENARIO_TIME = 3600.0
+MAX_SCENARIO_STEPS = 1_000_000
+
+# Seconds past the timeout a worker gets to stop on its own before it is killed
+KILL_GRACE = 5.0
+
+
+class _LineCollector(logging.Handler):
+    """Collects formatted simulator log lines for the run's output."""
+
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+        self.lines = []
+
+    def emit(self, record: logging.LogRecord):
+        self.lines.append(self.format(record))
+
+
+def scenario_parameters(parameters: Dict[str, Any], worlds_dir: Optional[str] = None,
+                        max_time: float = MAX_SCENARIO_TIME, max_steps: int = MAX_SCENARIO_STEPS) -> Dict[str, Any]:
+    """
+    Request parameters as the container would load them from its environment.
+    Raises ValueError for scenarios the host must not run: lockstep pacing,
+    host paths, or runs longer than `max_time` simulated seconds. The step
+    count is capped at `max_steps`, and `world_file` is resolved inside
+    `worlds_dir` (rejected when there is none).
+    """
+    environ = {
+        str(key).upper(): value if isinstance(value, str) else json.dumps(value)
+        for key, value in parameters.items()
+    }
+    loaded = load_parameters(environ)
+    loaded.setdefault("sync_mode", "fast")
+    if loaded["sync_mode"] == "lockstep":
+        raise ValueError("lockstep runs need an interactive step gate and cannot run in-process")
+    if "trajectory_dir" in loaded:
+        raise ValueError("trajectory_dir would write to the host and cannot be set in-process")
+    if float(loaded.get("max_time", 30.0)) > max_time:
+        raise ValueError(f"max_time of in-process runs is limited to {max_time:g} seconds")
+    loaded["max_steps"] = min(int(loaded.get("max_steps", max_steps)), max_steps)
+    if "world_file" in loaded:
+        if not worlds_dir:
+            raise ValueError("world_file needs SIMULATION_WORLDS_DIR for in-process runs")
+        root = os.path.realpath(worlds_dir)
+        path = os.path.realpath(os.path.join(root, str(loaded["world_file"])))
+        if not path.startswith(root + os.sep):
+            raise ValueError(f"world_file must name a world inside {worlds_dir}")
+        loaded["world_file"] = path
+    return loaded
+
+
+def run_scenario(parameters: Dict[str, Any], worlds_dir: Optional[str] = None,
+                 max_time: float = MAX_SCENARIO_TIME, max_steps: int = MAX_SCENARIO_STEPS,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Execute one scenario and return {"success", "output", "results", "error"}.
+    Runs inside a pool worker; the simulator's log lines become the output.
+    The run fails once it has taken `timeout` wall-clock seconds.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    collector = _LineCollector()
+    simulation_logger.addHandler(collector)
+    propagate, level = simulation_logger.propagate, simulation_logger.level
+    simulation_logger.propagate = False
+    simulation_logger.setLevel(logging.INFO)
+    try:
+        loaded = scenario_parameters(parameters, worlds_dir, max_time, max_steps)
+        simulator = TurtleBotSimulator(loaded, world=create_world(loaded), lidar=create_lidar(loaded))
+        simulator.initialize()
+        for _ in simulator.frames():
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Execution exceeded {timeout:g} second timeout")
+        simulation_logger.info("Simulation completed successfully")
+        return {"success": True, "output": "\n".join(collector.lines), "results": simulator.results(), "error": None}
+    except Exception as e:
+        simulation_logger.error(f"Simulation error: {e}")
+        return {"success": False, "output": "\n".join(collector.lines), "results": None, "error": str(e)}
+    finally:
+        simulation_logger.removeHandler(collector)
+        simulation_logger.propagate = propagate
+        simulation_logger.setLevel(level)
+
+
+def _warm_up(delay: float) -> int:
+    """No-op task that holds a worker briefly so the pool starts all of them."""
+    time.sleep(delay)
+    return os.getpid()
+
+
+class InProcessBackend:
+    """
+    Pool of pre-started worker processes running simulation scenarios.
+    start() spawns every worker up front so the first requests do not pay
+    for process start-up and imports. Workers are started with forkserver
+    (or spawn), never forked from the multi-threaded server process.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: float = 300.0, worlds_dir: Optional[str] = None,
+                 max_time: float = MAX_SCENARIO_TIME, max_steps: int = MAX_SCENARIO_STEPS):
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.timeout = timeout
+        self.worlds_dir = worlds_dir
+        self.max_time = float(max_time)
+        self.max_steps = int(max_steps)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # run() admits at most one scenario per worker, so none waits in the pool's queue
+        self._slots = threading.BoundedSemaphore(self.workers)
+
+    def start(self) -> ProcessPoolExecutor:
+        """Create the pool and wait until every worker process is up."""
+        with self._lock:
+            if self._executor is not None:
+                return self._executor
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+            warmers = [executor.submit(_warm_up, 0.05) for _ in range(self.workers)]
+            pids = {warmer.result() for warmer in warmers}
+            self._executor = executor
+        logger.info(f"In-process simulation backend started {len(pids)} worker processes")
+        return executor
+
+    def submit(self, parameters: Dict[str, Any]) -> Future:
+        """Schedule a scenario and return its future."""
+        return self.start().submit(run_scenario, dict(parameters), self.worlds_dir, self.max_time,
+                                   self.max_steps, self.timeout)
+
+    def run(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a scenario to completion, failing it after `timeout` seconds.
+        Scenarios stop themselves at the timeout; if one has not finished
+        KILL_GRACE seconds later, the pool is killed and restarted. Runs wait
+        here for a free worker, so the timeout only counts time spent running.
+        """
+        try:
+            with self._slots:
+                return self.submit(parameters).result(timeout=self.timeout + KILL_GRACE)
+        except TimeoutError:
+            logger.warning("In-process scenario did not stop at its timeout; restarting the worker pool")
+            self.restart()
+            return {"success": False, "output": "", "results": None,
+                    "error": f"Execution exceeded {self.timeout:g} second timeout"}
+
+    def restart(self):
+        """Kill every worker, failing the runs in flight; the next run starts a fresh pool."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        # ProcessPoolExecutor cannot stop a busy worker, so kill the processes themselves
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.kill()
+
+    def close(self):
+        """Shut the worker pool down."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
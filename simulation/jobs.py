@@ -0,0 +1,296 @@
+"""
+Simulation Job Queue
+Runs blocking simulation requests on a bounded pool of worker threads.
+
+Submitting a job returns its id immediately; callers poll the job for its
+state and result. At most `max_pending` jobs may be queued or running at
+once, and only the `history` most recently finished jobs are remembered.
+
+Every job declares the CPUs and memory its run is limited to. A job starts
+only when a worker is free and its quota fits in the host capacity that is
+not claimed by running jobs. Waiting jobs are ordered by priority first.
+Within a priority, the client with the smallest share of running CPUs goes
+next, so one client's burst cannot starve everyone else. Smaller jobs never
+jump ahead of the next job in line, which keeps large jobs from starving.
+Queued jobs can be cancelled; a running job is left to its runner.
+"""
+
+import os
+import time
+import uuid
+import logging
+import itertools
+import threading
+from concurrent.futures import CancelledError, Future
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Any, Callable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+
+# Priority classes, most urgent first
+PRIORITIES = ("interactive", "normal", "batch")
+
+
+class QueueFull(RuntimeError):
+    """Raised when a job is submitted while max_pending jobs are outstanding."""
+
+
+class Quota(NamedTuple):
+    """Resources a job's run is limited to."""
+    cpus: float
+    memory_mb: int
+
+
+def host_capacity(memory_fraction: float = 0.8) -> Quota:
+    """CPUs and a fraction of physical memory of this host."""
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        memory = 4096
+    return Quota(float(os.cpu_count() or 1), int(memory * memory_fraction))
+
+
+class Job:
+    """One submitted request and, once it has run, its result or error."""
+
+    __slots__ = ("id", "request", "priority", "client", "quota", "sequence", "callback", "status", "result",
+                 "error", "submitted_at", "started_at", "finished_at")
+
+    def __init__(self, request: Any, priority: str, client: str, quota: Quota, sequence: int,
+                 callback: Optional[Callable[["Job"], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.priority = priority
+        self.client = client
+        self.quota = quota
+        self.sequence = sequence
+        self.callback = callback
+        self.status = QUEUED
+        self.result = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (COMPLETED, FAILED, CANCELLED)
+
+
+class JobQueue:
+    """
+    Executes `runner(request)` for submitted jobs on `workers` threads,
+    within `capacity` (host_capacity() by default).
+    A runner may instead return a concurrent.futures.Future: the worker
+    thread is then free at once, and the job keeps its resource reservation
+    until the future settles.
+    A job whose runner raises is marked failed with the exception message,
+    or cancelled if it raised concurrent.futures.CancelledError; otherwise
+    it is completed with the runner's return value as its result.
+    """
+
+    def __init__(self, runner: Callable[[Any], Any], workers: int = 4, max_pending: int = 256,
+                 history: int = 1000, capacity: Optional[Quota] = None,
+                 default_quota: Quota = Quota(1.0, 512)):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.runner = runner
+        self.workers = int(workers)
+        self.max_pending = int(max_pending)
+        self.history = int(history)
+        self.capacity = capacity or host_capacity()
+        self.default_quota = default_quota
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._pending = 0
+        self._sequence = itertools.count()
+        # priority -> client -> that client's waiting jobs in submission order
+        self._waiting: Dict[str, Dict[str, Deque[Job]]] = {priority: {} for priority in PRIORITIES}
+        self._client_cpus: Dict[str, float] = {}
+        self._used = Quota(0.0, 0)
+        self._closed = False
+        self._lock = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"simulation-job-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, request: Any, priority: str = "normal", client: str = "anonymous",
+               quota: Optional[Quota] = None, callback: Optional[Callable[[Job], None]] = None) -> Job:
+        """
+        Queue a request and return its job without waiting for it to run.
+        `callback(job)` is called from the worker thread once the job has finished.
+        """
+        quota = quota or self.default_quota
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {PRIORITIES}")
+        if quota.cpus > self.capacity.cpus or quota.memory_mb > self.capacity.memory_mb:
+            raise ValueError(f"Quota of {quota.cpus:g} CPUs and {quota.memory_mb} MB exceeds the host capacity "
+                             f"of {self.capacity.cpus:g} CPUs and {self.capacity.memory_mb} MB")
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Job queue is closed")
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} simulation jobs are already pending")
+            job = Job(request, priority, client, quota, next(self._sequence), callback)
+            self._pending += 1
+            self._jobs[job.id] = job
+            self._waiting[priority].setdefault(client, deque()).append(job)
+            self._lock.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job with this id, or None if it is unknown or was forgotten."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued job so it never runs, and return it; running and
+        finished jobs are returned unchanged. None if the job is unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return job
+            clients = self._waiting[job.priority]
+            clients[job.client].remove(job)
+            if not clients[job.client]:
+                del clients[job.client]
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            self._pending -= 1
+            self._forget_finished()
+            # The cancelled job may have been the head of line holding others back
+            self._lock.notify_all()
+        self._notify(job)
+        return job
+
+    def _next(self) -> Optional[Job]:
+        """The job that should start next; caller holds the lock."""
+        for clients in self._waiting.values():
+            if clients:
+                client = min(clients, key=lambda name: (self._client_cpus.get(name, 0.0), clients[name][0].sequence))
+                return clients[client][0]
+        return None
+
+    def _take(self) -> Optional[Job]:
+        """Dequeue and reserve resources for the next job if it fits; caller holds the lock."""
+        job = self._next()
+        if job is None:
+            return None
+        cpus, memory_mb = self._used.cpus + job.quota.cpus, self._used.memory_mb + job.quota.memory_mb
+        if cpus > self.capacity.cpus + 1e-9 or memory_mb > self.capacity.memory_mb:
+            return None
+        clients = self._waiting[job.priority]
+        clients[job.client].popleft()
+        if not clients[job.client]:
+            del clients[job.client]
+        self._used = Quota(cpus, memory_mb)
+        self._client_cpus[job.client] = self._client_cpus.get(job.client, 0.0) + job.quota.cpus
+        job.started_at = time.time()
+        job.status = RUNNING
+        return job
+
+    def _work(self):
+        while True:
+            with self._lock:
+                job = self._take()
+                while job is None:
+                    if self._closed:
+                        return
+                    self._lock.wait()
+                    job = self._take()
+            self._execute(job)
+
+    def _execute(self, job: Job):
+        outcome = Future()
+        try:
+            result = self.runner(job.request)
+        except Exception as e:
+            outcome.set_exception(e)
+        else:
+            if isinstance(result, Future):
+                outcome = result
+            else:
+                outcome.set_result(result)
+        # Called at once for synchronous runners, from whichever thread settles an asynchronous one
+        outcome.add_done_callback(lambda done: self._finish(job, done))
+
+    def _finish(self, job: Job, outcome: Future):
+        """Record a job's result or error and release its reservation."""
+        try:
+            job.result = outcome.result()
+            job.status = COMPLETED
+        except CancelledError:
+            logger.info(f"Simulation job {job.id} was cancelled")
+            job.status = CANCELLED
+        except Exception as e:
+            logger.error(f"Simulation job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+                self._used = Quota(self._used.cpus - job.quota.cpus, self._used.memory_mb - job.quota.memory_mb)
+                remaining = self._client_cpus.pop(job.client) - job.quota.cpus
+                if remaining > 1e-9:
+                    self._client_cpus[job.client] = remaining
+                self._forget_finished()
+                # Freed resources may admit a job another worker is waiting on
+                self._lock.notify_all()
+            self._notify(job)
+
+    def _notify(self, job: Job):
+        if job.callback is not None:
+            try:
+                job.callback(job)
+            except Exception as e:
+                logger.error(f"Completion callback of simulation job {job.id} failed: {e}")
+
+    def _forget_finished(self):
+        """Drop the oldest finished jobs beyond `history`; pending jobs are always kept."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts of jobs by status, queued jobs by priority, and resource use against capacity."""
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            waiting = {priority: sum(map(len, clients.values())) for priority, clients in self._waiting.items()}
+            used = self._used
+        return {
+            "workers": self.workers, "max_pending": self.max_pending, **counts,
+            "queued_by_priority": waiting,
+            "cpus": {"used": used.cpus, "capacity": self.capacity.cpus},
+            "memory_mb": {"used": used.memory_mb, "capacity": self.capacity.memory_mb}
+        }
+
+    def close(self, wait: bool = False):
+        """Stop accepting jobs; jobs that have not started are cancelled."""
+        dropped = []
+        with self._lock:
+            self._closed = True
+            for clients in self._waiting.values():
+                for jobs in clients.values():
+                    dropped.extend(jobs)
+                clients.clear()
+            finished_at = time.time()
+            for job in dropped:
+                job.status = CANCELLED
+                job.finished_at = finished_at
+            self._pending -= len(dropped)
+            self._forget_finished()
+            self._lock.notify_all()
+        for job in dropped:
+            self._notify(job)
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,189 @@
+"""
+Bounded Log Capture
+Streams simulation output into a gzip file on disk while keeping only a
+bounded head and tail of it in memory for the API response.
+
+Each run gets a log id; the full log is read back later in ranges through
+LogStore.read(), which decompresses only up to the requested range. The
+oldest log files are deleted once more than `max_files` are stored.
+"""
+
+import os
+import gzip
+import time
+import uuid
+import struct
+import asyncio
+import logging
+from typing import Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOG_SUFFIX = ".log.gz"
+
+
+class LogCapture:
+    """
+    Sink for one run's output: every chunk is compressed to disk, the first
+    `head_bytes` and last `tail_bytes` are also kept in memory.
+    """
+
+    def __init__(self, log_id: str, path: str, head_bytes: int, tail_bytes: int):
+        self.log_id = log_id
+        self.path = path
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.total_bytes = 0
+        # Time spent compressing and storing output, for the log collection metric
+        self.seconds = 0.0
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._file = gzip.open(path, "wb", compresslevel=6)
+
+    def write(self, chunk: bytes):
+        """Append a chunk of raw output."""
+        if not chunk:
+            return
+        started = time.perf_counter()
+        self._file.write(chunk)
+        self.total_bytes += len(chunk)
+        room = self.head_bytes - len(self._head)
+        if room > 0:
+            self._head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk and self.tail_bytes > 0:
+            self._tail += chunk
+            # Trim lazily so a stream of small chunks is not copied on every write
+            if len(self._tail) > 2 * self.tail_bytes:
+                del self._tail[:-self.tail_bytes]
+        self.seconds += time.perf_counter() - started
+
+    def close(self):
+        if not self._file.closed:
+            started = time.perf_counter()
+            self._file.close()
+            self.seconds += time.perf_counter() - started
+
+    @property
+    def omitted_bytes(self) -> int:
+        return self.total_bytes - len(self._head) - min(len(self._tail), self.tail_bytes)
+
+    def excerpt(self) -> str:
+        """The captured output, with the middle elided once it exceeds head plus tail."""
+        head = self._head.decode("utf-8", errors="replace")
+        tail = bytes(self._tail[-self.tail_bytes:] if self.tail_bytes else b"").decode("utf-8", errors="replace")
+        if self.omitted_bytes <= 0:
+            return head + tail
+        return f"{head}\n... [{self.omitted_bytes} bytes omitted; full log at /logs/{self.log_id}] ...\n{tail}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def stream_process(command: Sequence[str], output: Callable[[bytes], None], timeout: float) -> Optional[int]:
+    """
+    Run a command without blocking the event loop, passing its stdout and
+    stderr to `output` in chunks as they arrive. Returns the exit code, or
+    None if the process was killed after `timeout` seconds. Cancelling the
+    calling task kills the process before the cancellation propagates.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+
+    async def pump(stream: asyncio.StreamReader):
+        while True:
+            chunk = await stream.read(64 * 1024)
+            if not chunk:
+                return
+            output(chunk)
+
+    try:
+        await asyncio.wait_for(asyncio.gather(pump(process.stdout), pump(process.stderr), process.wait()), timeout)
+    except asyncio.TimeoutError:
+        await _kill(process)
+        return None
+    except asyncio.CancelledError:
+        await _kill(process)
+        raise
+    return process.returncode
+
+
+async def _kill(process: asyncio.subprocess.Process):
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+
+class LogStore:
+    """Directory of compressed run logs addressed by log id."""
+
+    def __init__(self, directory: str, head_bytes: int = 16 * 1024, tail_bytes: int = 48 * 1024,
+                 max_files: int = 1000):
+        self.directory = directory
+        self.head_bytes = int(head_bytes)
+        self.tail_bytes = int(tail_bytes)
+        self.max_files = int(max_files)
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, log_id: str) -> str:
+        return os.path.join(self.directory, log_id + LOG_SUFFIX)
+
+    def create(self) -> LogCapture:
+        """Start capturing a new log, evicting the oldest ones beyond max_files."""
+        self._evict()
+        log_id = uuid.uuid4().hex
+        return LogCapture(log_id, self.path(log_id), self.head_bytes, self.tail_bytes)
+
+    def _evict(self):
+        entries: List[Tuple[float, str]] = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(LOG_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_files + 1)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Failed to evict log file {path}: {e}")
+
+    def _valid(self, log_id: str) -> bool:
+        return len(log_id) == 32 and all(c in "0123456789abcdef" for c in log_id)
+
+    def size(self, log_id: str) -> Optional[int]:
+        """Uncompressed size of a stored log (gzip keeps it modulo 4 GiB), or None if unknown."""
+        if not self._valid(log_id):
+            return None
+        try:
+            with open(self.path(log_id), "rb") as f:
+                f.seek(-4, os.SEEK_END)
+                return struct.unpack("<I", f.read(4))[0]
+        except OSError:
+            return None
+
+    def read(self, log_id: str, offset: int = 0, length: int = 64 * 1024) -> Optional[bytes]:
+        """
+        Up to `length` bytes of a stored log starting at `offset`, or None if
+        the log does not exist or is still being written. Only the compressed
+        prefix up to the range is read.
+        """
+        if not self._valid(log_id):
+            return None
+        try:
+            with gzip.open(self.path(log_id), "rb") as f:
+                f.seek(offset)
+                return f.read(length)
+        except (OSError, EOFError):
+            # Missing, or still being written by a running simulation
+            return None
@@ -3,26 +3,103 @@ FastAPI-based Robot Simulation Backend
 Handles TurtleBot simulation using Docker SDK with proper error handling.
 """
 
+import os
+import json
+import math
+import uuid
+import asyncio
 import logging
+import time
+import tarfile
+import threading
 import subprocess
+from concurrent.futures import Future
 from contextlib import asynccontextmanager
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, List, Literal, Optional
 import docker
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
 import uvicorn
 
+from simulation import simulation as simulation_module
+from simulation.artifacts import CHUNK_SIZE, ArtifactStore
+from simulation.cache import ResultCache, file_hash, make_cache_key
+from simulation.containers import WarmContainerPool
+from simulation.images import ImageMetadataCache
+from simulation.inprocess import (
+    MAX_SCENARIO_STEPS, MAX_SCENARIO_TIME, TRUSTED_SCRIPTS, InProcessBackend, scenario_parameters
+)
+from simulation.jobs import RUNNING, Job, JobQueue, Quota, QueueFull, host_capacity
+from simulation.logs import LogStore, stream_process
+from simulation.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry
+from simulation.simulation import RESULTS_PATH, TurtleBotSimulator
+from simulation.sweep import expand_grid, run_sweep
+from simulation.telemetry import stream_simulation_events
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Host directory mounted read-only at /app inside simulation containers
+SCRIPT_HOST_DIR = "/tmp/simulation_scripts"
+SCRIPT_CONTAINER_DIR = "/app"
+SCRIPT_VOLUMES = {SCRIPT_HOST_DIR: {'bind': SCRIPT_CONTAINER_DIR, 'mode': 'ro'}}
+
+# Largest log range served by one GET /logs/{log_id} request
+MAX_LOG_READ = 1024 * 1024
+
+# Execution backends: a container per run, or the in-process worker pool
+BACKENDS = ("docker", "inprocess")
+
+# Modules of the simulation package whose code decides an in-process run's outcome
+INPROCESS_MODULES = ("simulation.py", "world.py", "lidar.py", "spatial.py")
+
+
+def docker_limits(quota: Quota) -> Dict[str, Any]:
+    """containers.run arguments enforcing a run's quota."""
+    return {"nano_cpus": int(quota.cpus * 1e9), "mem_limit": f"{quota.memory_mb}m"}
+
 
 class SimulationRequest(BaseModel):
     """Request model for simulation execution."""
     script_path: str = "/app/simulation.py"
-    container_name: str = "turtlebot-sim"
+    container_name: Optional[str] = Field(
+        None, description="Container name; a unique turtlebot-sim-<id> name is generated when omitted"
+    )
     image_name: str = "turtlebot-simulation:latest"
     parameters: Dict[str, Any] = {}
+    use_cache: bool = True
+    backend: Optional[Literal["docker", "inprocess"]] = Field(
+        None, description="Execution backend; defaults to SIMULATION_BACKEND"
+    )
+    cpus: Optional[float] = Field(None, gt=0, description="CPU limit of the run; defaults to SIMULATION_DEFAULT_CPUS")
+    memory_mb: Optional[int] = Field(None, gt=0, description="Memory limit of the run; defaults to SIMULATION_DEFAULT_MEMORY_MB")
+    priority: Literal["interactive", "normal", "batch"] = "normal"
+    client_id: Optional[str] = Field(None, description="Fair-share identity; defaults to the caller's address")
+    artifacts: List[str] = Field(
+        default_factory=lambda: [RESULTS_PATH],
+        description="Container files or directories collected after the run"
+    )
+    timeout: Optional[float] = Field(
+        None, gt=0, description="Seconds a Docker CLI fallback run may take; defaults to SIMULATION_RUN_TIMEOUT"
+    )
+    
+    @field_validator("artifacts")
+    @classmethod
+    def _absolute_paths(cls, paths: List[str]) -> List[str]:
+        for path in paths:
+            if not path.startswith("/") or any(c.isspace() or c in "*?[" for c in path):
+                raise ValueError(f"Artifact paths must be absolute and contain no whitespace or wildcards: {path!r}")
+        return paths
+
+
+class ArtifactInfo(BaseModel):
+    """A collected artifact: its path in the container and its content digest."""
+    path: str
+    digest: str
+    size: int
 
 
 class SimulationResponse(BaseModel):
@@ -31,6 +108,65 @@ class SimulationResponse(BaseModel):
     message: str
     output: Optional[str] = None
     error: Optional[str] = None
+    cached: bool = False
+    results: Optional[Dict[str, Any]] = None
+    backend: Optional[str] = None
+    log_id: Optional[str] = Field(None, description="Full run log, readable through GET /logs/{log_id}")
+    log_bytes: Optional[int] = None
+    artifacts: Optional[List[ArtifactInfo]] = Field(
+        None, description="Collected artifacts, downloadable through GET /artifacts/{digest}"
+    )
+
+
+class JobResponse(BaseModel):
+    """State of a queued simulation job; `result` is set once it has run."""
+    job_id: str
+    status: str
+    priority: str
+    submitted_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[SimulationResponse] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_job(cls, job: Job) -> "JobResponse":
+        return cls(
+            job_id=job.id, status=job.status, priority=job.priority, submitted_at=job.submitted_at,
+            started_at=job.started_at, finished_at=job.finished_at,
+            result=job.result, error=job.error
+        )
+
+
+class BatchRequest(BaseModel):
+    """Request model for many simulations submitted at once."""
+    requests: List[SimulationRequest] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(
+        None, ge=1, description="Runs of this batch in flight at once; capped at SIMULATION_BATCH_CONCURRENCY"
+    )
+
+
+class StreamRequest(BaseModel):
+    """Request model for a streamed in-process simulation."""
+    parameters: Dict[str, Any] = {}
+    decimation: int = Field(1, ge=1, description="Send one frame every N simulation steps")
+    buffer_size: int = Field(64, ge=1, description="Frames buffered per client before the oldest are dropped")
+
+
+class SweepRequest(BaseModel):
+    """Request model for a batched parameter sweep."""
+    grid: Dict[str, List[Any]] = {}
+    points: List[Dict[str, Any]] = []
+    parameters: Dict[str, Any] = {}
+    processes: Optional[int] = Field(None, ge=0, description="Worker processes for non-vectorizable points (0 = in-process)")
+
+
+class SweepResponse(BaseModel):
+    """Compact table of sweep results, one row per parameter set."""
+    columns: List[str]
+    rows: List[List[Any]]
+    vectorized: int
+    pooled: int
 
 
 class TurtleBotSimulation:
@@ -42,7 +178,123 @@ class TurtleBotSimulation:
     def __init__(self):
         self.docker_client = None
         self.is_docker_available = False
+        self.result_cache = ResultCache(
+            os.environ.get("SIMULATION_CACHE_DIR", "/tmp/simulation_cache"),
+            max_entries=int(os.environ.get("SIMULATION_CACHE_MAX_ENTRIES", "256")),
+            max_bytes=int(os.environ.get("SIMULATION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        )
+        self.default_backend = os.environ.get("SIMULATION_BACKEND", "docker").lower()
+        if self.default_backend not in BACKENDS:
+            raise ValueError(f"Unknown SIMULATION_BACKEND '{self.default_backend}', expected one of {BACKENDS}")
+        workers = os.environ.get("SIMULATION_INPROCESS_WORKERS")
+        self.inprocess = InProcessBackend(
+            workers=int(workers) if workers else None,
+            timeout=float(os.environ.get("SIMULATION_INPROCESS_TIMEOUT", "300")),
+            worlds_dir=os.environ.get("SIMULATION_WORLDS_DIR"),
+            max_time=float(os.environ.get("SIMULATION_INPROCESS_MAX_TIME", str(MAX_SCENARIO_TIME))),
+            max_steps=int(os.environ.get("SIMULATION_INPROCESS_MAX_STEPS", str(MAX_SCENARIO_STEPS)))
+        )
+        # Per-run resource limits, and the host capacity runs are admitted against
+        self.default_quota = Quota(
+            float(os.environ.get("SIMULATION_DEFAULT_CPUS", "1")),
+            int(os.environ.get("SIMULATION_DEFAULT_MEMORY_MB", "512"))
+        )
+        capacity = host_capacity()
+        self.jobs = JobQueue(
+            self.run_job,
+            workers=int(os.environ.get("SIMULATION_JOB_WORKERS", "4")),
+            max_pending=int(os.environ.get("SIMULATION_JOB_MAX_PENDING", "256")),
+            history=int(os.environ.get("SIMULATION_JOB_HISTORY", "1000")),
+            capacity=Quota(
+                float(os.environ.get("SIMULATION_CAPACITY_CPUS", capacity.cpus)),
+                int(os.environ.get("SIMULATION_CAPACITY_MEMORY_MB", capacity.memory_mb))
+            ),
+            default_quota=self.default_quota
+        )
+        # Warm container pools, one per image; disabled while SIMULATION_POOL_MAX is 0
+        self.pool_settings = {
+            "min_size": int(os.environ.get("SIMULATION_POOL_MIN", "1")),
+            "max_size": int(os.environ.get("SIMULATION_POOL_MAX", "0")),
+            "max_runs": int(os.environ.get("SIMULATION_POOL_MAX_RUNS", "50")),
+            "idle_timeout": float(os.environ.get("SIMULATION_POOL_IDLE_TIMEOUT", "300"))
+        }
+        self.container_pools: Dict[str, WarmContainerPool] = {}
+        self._pools_lock = threading.Lock()
+        self.batch_concurrency = int(os.environ.get("SIMULATION_BATCH_CONCURRENCY", "8"))
+        self.batch_max_items = int(os.environ.get("SIMULATION_BATCH_MAX_ITEMS", "1000"))
+        # /sweep and /simulate/stream run synchronously outside the job queue, so they are bounded here
+        self.sweep_slots = threading.BoundedSemaphore(int(os.environ.get("SIMULATION_SWEEP_CONCURRENCY", "2")))
+        self.sweep_max_points = int(os.environ.get("SIMULATION_SWEEP_MAX_POINTS", "10000"))
+        self.sweep_max_processes = int(os.environ.get("SIMULATION_SWEEP_MAX_PROCESSES", str(os.cpu_count() or 1)))
+        self.stream_slots = threading.BoundedSemaphore(int(os.environ.get("SIMULATION_STREAM_CONCURRENCY", "4")))
+        self.artifacts = ArtifactStore(
+            os.environ.get("SIMULATION_ARTIFACT_DIR", "/tmp/simulation_artifacts"),
+            max_bytes=int(os.environ.get("SIMULATION_ARTIFACT_MAX_BYTES", str(1024 * 1024 * 1024)))
+        )
+        self.logs = LogStore(
+            os.environ.get("SIMULATION_LOG_DIR", "/tmp/simulation_logs"),
+            head_bytes=int(os.environ.get("SIMULATION_LOG_HEAD_BYTES", str(16 * 1024))),
+            tail_bytes=int(os.environ.get("SIMULATION_LOG_TAIL_BYTES", str(48 * 1024))),
+            max_files=int(os.environ.get("SIMULATION_LOG_MAX_FILES", "1000"))
+        )
+        self.run_timeout = float(os.environ.get("SIMULATION_RUN_TIMEOUT", "300"))
+        # Event loop shared by every Docker CLI fallback run, started on first use
+        self._cli_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cli_lock = threading.Lock()
+        # Container name -> task of the CLI run in flight for it, for per-job cancellation
+        self._cli_runs: Dict[str, asyncio.Task] = {}
+        self.prepull_images = [
+            name.strip() for name in os.environ.get("SIMULATION_PREPULL_IMAGES", SimulationRequest().image_name).split(",")
+            if name.strip()
+        ]
         self._initialize_docker()
+        self.images = ImageMetadataCache(
+            self.docker_client, max_age=float(os.environ.get("SIMULATION_IMAGE_CACHE_TTL", "300"))
+        ) if self.is_docker_available else None
+        self._register_metrics()
+    
+    def _register_metrics(self):
+        """Prometheus metrics served by GET /metrics; `path` labels are execution_path() values."""
+        self.metrics = MetricsRegistry()
+        self.metrics.gauge(
+            "simulation_queue_depth", "Simulation jobs waiting to start", ("priority",),
+            callback=lambda: {(priority,): count for priority, count in self.jobs.stats()["queued_by_priority"].items()}
+        )
+        self.metrics.gauge(
+            "simulation_jobs_running", "Simulation jobs currently running",
+            callback=lambda: {(): self.jobs.stats()["running"]}
+        )
+        self.metrics.gauge(
+            "simulation_pool_containers", "Warm pool containers by state", ("image", "state"),
+            callback=self._pool_container_counts
+        )
+        self.running_containers = self.metrics.gauge(
+            "simulation_running_containers", "Containers currently executing a run", ("path",)
+        )
+        self.image_lookup_seconds = self.metrics.histogram(
+            "simulation_image_lookup_seconds", "Latency of Docker image metadata lookups"
+        )
+        self.container_start_seconds = self.metrics.histogram(
+            "simulation_container_start_seconds", "Latency of starting a simulation container", ("path",)
+        )
+        self.run_seconds = self.metrics.histogram(
+            "simulation_run_seconds", "Duration of simulation runs, excluding cached results", ("path",)
+        )
+        self.log_collection_seconds = self.metrics.histogram(
+            "simulation_log_collection_seconds", "Time spent compressing and storing a run's output", ("path",)
+        )
+        self.runs_total = self.metrics.counter(
+            "simulation_runs_total", "Simulation requests by execution path, image and outcome",
+            ("path", "image", "outcome")
+        )
+    
+    def _pool_container_counts(self) -> Dict[tuple, float]:
+        counts = {}
+        for pool in list(self.container_pools.values()):
+            stats = pool.stats()
+            counts[(stats["image"], "idle")] = stats["idle"]
+            counts[(stats["image"], "busy")] = stats["size"] - stats["idle"]
+        return counts
     
     def _initialize_docker(self):
         """Initialize Docker client with error handling."""
@@ -61,55 +313,425 @@ class TurtleBotSimulation:
         Main simulation execution method.
         This is the correct pattern: sim.run() where sim is a class instance.
         """
-        logger.info(f"Starting simulation with container: {request.container_name}")
+        path = self.execution_path(request)
+        started = time.monotonic()
+        response = None
+        try:
+            if path == "inprocess":
+                logger.info("Starting simulation in the in-process worker pool")
+                response = self._run_in_process(request)
+                return response
+            
+            logger.info(f"Starting simulation with container: {self._container_name(request)}")
+            
+            if path != "cli":
+                response = self._run_with_docker_sdk(request)
+            else:
+                logger.info("Docker SDK not available, falling back to CLI")
+                response = self._run_with_cli_fallback(request)
+            return response
+        finally:
+            self._record_run(path, request, response, time.monotonic() - started)
+    
+    def run_job(self, request: SimulationRequest):
+        """
+        Job queue runner: like run(), except that a CLI fallback run is
+        returned as a future, so it holds its quota reservation but no job
+        worker thread while the container runs.
+        """
+        if self.execution_path(request) != "cli":
+            return self.run(request)
+        logger.info(f"Starting simulation with container: {self._container_name(request)}")
+        started = time.monotonic()
+        run = self._start_cli_run(request)
         
-        if self.is_docker_available:
-            return self._run_with_docker_sdk(request)
+        def record(done: Future):
+            response = None
+            if not done.cancelled() and done.exception() is None:
+                response = done.result()
+            self._record_run("cli", request, response, time.monotonic() - started)
+        run.add_done_callback(record)
+        return run
+    
+    def execution_path(self, request: SimulationRequest) -> str:
+        """How a request runs: "inprocess", "cli", "pool" (warm container) or "sdk" (fresh container)."""
+        if (request.backend or self.default_backend) == "inprocess":
+            return "inprocess"
+        if not self.is_docker_available:
+            return "cli"
+        # Pooled containers carry the default limits, so other quotas get a fresh container
+        if self.pool_settings["max_size"] >= 1 and self.quota(request) == self.default_quota:
+            return "pool"
+        return "sdk"
+    
+    def _record_run(self, path: str, request: SimulationRequest, response: Optional[SimulationResponse],
+                    seconds: float):
+        """Count a finished request; a run that raised counts as a failure."""
+        if response is not None and response.cached:
+            outcome = "cached"
         else:
-            logger.info("Docker SDK not available, falling back to CLI")
-            return self._run_with_cli_fallback(request)
+            outcome = "success" if response is not None and response.success else "failure"
+            self.run_seconds.observe(seconds, path=path)
+        image = "" if path == "inprocess" else request.image_name
+        self.runs_total.inc(path=path, image=image, outcome=outcome)
+    
+    def _container_name(self, request: SimulationRequest) -> str:
+        """Container name for a run; generated once per request so concurrent runs never clash."""
+        if not request.container_name:
+            request.container_name = f"turtlebot-sim-{uuid.uuid4().hex[:12]}"
+        return request.container_name
+    
+    def start_image_watcher(self):
+        """Watch Docker image events and pre-pull the configured images in the background."""
+        if self.images is None:
+            return
+        self.images.start()
+        threading.Thread(target=self.images.prepull, args=(self.prepull_images,),
+                         name="image-prepull", daemon=True).start()
+    
+    def quota(self, request: SimulationRequest) -> Quota:
+        """CPU and memory limits of a run, falling back to the configured defaults."""
+        return Quota(request.cpus or self.default_quota.cpus, request.memory_mb or self.default_quota.memory_mb)
+    
+    def submit(self, request: SimulationRequest, client: str = "anonymous") -> Job:
+        """Queue a run for admission at its priority and quota."""
+        return self.jobs.submit(request, request.priority, request.client_id or client, self.quota(request))
+    
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued job, or a running CLI fallback run (its container is
+        removed and the job ends as cancelled). Returns the job, or None if
+        it is unknown. Raises ValueError for other running jobs, which cannot
+        be interrupted.
+        """
+        job = self.jobs.cancel(job_id)
+        if job is None or job.status != RUNNING:
+            return job
+        with self._cli_lock:
+            task = self._cli_runs.get(job.request.container_name or "")
+        if task is None:
+            raise ValueError(f"Simulation job {job_id} is already running and cannot be cancelled")
+        # The job finishes once the task has removed its container
+        task.get_loop().call_soon_threadsafe(task.cancel)
+        return job
+    
+    async def run_batch(self, requests: List[SimulationRequest], client: str = "anonymous",
+                        concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run a batch through the job queue and yield one result document per
+        request, in completion order. Each distinct image is checked once up
+        front; requests for missing images fail without being queued.
+        """
+        limit = min(concurrency or self.batch_concurrency, self.batch_concurrency)
+        slots = asyncio.Semaphore(limit)
+        loop = asyncio.get_running_loop()
+        
+        missing = set()
+        if self.is_docker_available and self.images is not None:
+            for image_name in {r.image_name for r in requests if (r.backend or self.default_backend) == "docker"}:
+                with self.image_lookup_seconds.time():
+                    info = await run_in_threadpool(self.images.get, image_name)
+                if info is None:
+                    missing.add(image_name)
+        
+        async def run_one(index: int, request: SimulationRequest) -> Dict[str, Any]:
+            if request.image_name in missing and (request.backend or self.default_backend) == "docker":
+                result = SimulationResponse(success=False, message=f"Docker image {request.image_name} not found",
+                                            error="Image not available", backend="docker")
+                return {"index": index, "job_id": None, "status": "completed", "result": result.model_dump(),
+                        "error": None}
+            async with slots:
+                done = loop.create_future()
+                
+                def finished(job: Job):
+                    loop.call_soon_threadsafe(lambda: done.done() or done.set_result(job))
+                try:
+                    job = self.jobs.submit(request, request.priority, request.client_id or client,
+                                           self.quota(request), finished)
+                except (QueueFull, ValueError, RuntimeError) as e:
+                    return {"index": index, "job_id": None, "status": "rejected", "result": None, "error": str(e)}
+                job = await done
+            result = job.result.model_dump() if job.result is not None else None
+            return {"index": index, "job_id": job.id, "status": job.status, "result": result, "error": job.error}
+        
+        tasks = [asyncio.ensure_future(run_one(index, request)) for index, request in enumerate(requests)]
+        try:
+            for outcome in asyncio.as_completed(tasks):
+                yield await outcome
+        finally:
+            # A disconnected client stops further submissions; queued jobs still finish
+            for task in tasks:
+                task.cancel()
+    
+    def container_pool(self, image_name: str) -> Optional[WarmContainerPool]:
+        """Warm container pool for an image, or None when pooling is disabled."""
+        if self.pool_settings["max_size"] < 1 or not self.is_docker_available:
+            return None
+        with self._pools_lock:
+            pool = self.container_pools.get(image_name)
+            if pool is None:
+                pool = WarmContainerPool(
+                    self.docker_client, image_name, volumes=SCRIPT_VOLUMES,
+                    run_options=docker_limits(self.default_quota),
+                    on_start=lambda seconds: self.container_start_seconds.observe(seconds, path="pool"),
+                    **self.pool_settings
+                )
+                self.container_pools[image_name] = pool
+        return pool
+    
+    def _collect_artifacts(self, container, request: SimulationRequest) -> List[Dict[str, Any]]:
+        """Stream the request's artifacts out of a container into the artifact store."""
+        collected = []
+        for path in request.artifacts:
+            try:
+                stream, _ = container.get_archive(path, chunk_size=CHUNK_SIZE)
+                collected += self.artifacts.store_archive(stream, path)
+            except docker.errors.NotFound:
+                logger.info(f"Artifact {path} was not produced")
+            except Exception as e:
+                logger.warning(f"Failed to collect artifact {path}: {e}")
+        return collected
+    
+    def _collect_cli_artifacts(self, container_name: str, request: SimulationRequest) -> List[Dict[str, Any]]:
+        """CLI counterpart of _collect_artifacts, reading `docker cp` tar streams."""
+        collected = []
+        for path in request.artifacts:
+            process = subprocess.Popen(["docker", "cp", f"{container_name}:{path}", "-"],
+                                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            try:
+                collected += self.artifacts.store_archive(
+                    iter(lambda: process.stdout.read1(CHUNK_SIZE), b""), path
+                )
+            except tarfile.ReadError:
+                logger.info(f"Artifact {path} was not produced")
+            except Exception as e:
+                logger.warning(f"Failed to collect artifact {path}: {e}")
+            finally:
+                process.stdout.close()
+                process.wait()
+        return collected
+    
+    def _cache_key(self, request: SimulationRequest, image_digest: str) -> Optional[str]:
+        """Result cache key for a request, or None if the run cannot be cached."""
+        if not request.use_cache:
+            return None
+        relative = os.path.relpath(request.script_path, SCRIPT_CONTAINER_DIR)
+        if relative.startswith(os.pardir):
+            return None
+        script_hash = file_hash(os.path.join(SCRIPT_HOST_DIR, relative))
+        if script_hash is None:
+            return None
+        return make_cache_key(image_digest, script_hash, request.parameters, request.artifacts)
+    
+    def _inprocess_cache_key(self, request: SimulationRequest) -> Optional[str]:
+        """
+        Result cache key for an in-process run, or None if it cannot be cached.
+        The key covers the simulation modules and the world file's content, and
+        runs with unseeded lidar noise are never cached.
+        """
+        if not request.use_cache:
+            return None
+        limits = self.inprocess
+        try:
+            loaded = scenario_parameters(request.parameters, limits.worlds_dir, limits.max_time, limits.max_steps)
+        except (TypeError, ValueError):
+            return None
+        # Unseeded noise makes every scan, and so every run, different
+        noisy = loaded.get("lidar_beams") and float(loaded.get("lidar_noise", 0.0)) > 0
+        if noisy and loaded.get("lidar_seed") is None:
+            return None
+        package_dir = os.path.dirname(simulation_module.__file__)
+        paths = [os.path.join(package_dir, name) for name in INPROCESS_MODULES]
+        if "world_file" in loaded:
+            paths.append(loaded["world_file"])
+        hashes = [file_hash(path) for path in paths]
+        if None in hashes:
+            return None
+        return make_cache_key("inprocess", ":".join(hashes), request.parameters)
+    
+    def _cached_response(self, cache_key: str) -> Optional[SimulationResponse]:
+        """Cached response for a key, or None if absent or any of its artifacts was evicted."""
+        cached = self.result_cache.get(cache_key)
+        if cached is None:
+            return None
+        missing = [artifact["digest"] for artifact in cached.get("artifacts") or ()
+                   if not self.artifacts.exists(artifact["digest"])]
+        if missing:
+            logger.info(f"Cached simulation result {cache_key[:12]} lost {len(missing)} artifact(s), re-running")
+            return None
+        logger.info(f"Serving cached simulation result {cache_key[:12]}")
+        return SimulationResponse(**dict(cached, cached=True))
+    
+    def _cli_event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._cli_lock:
+            if self._cli_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="simulation-cli", daemon=True).start()
+                self._cli_loop = loop
+            return self._cli_loop
+    
+    async def _cancel_cli_runs(self):
+        """Cancel every CLI fallback run in flight and wait for their containers to be removed."""
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def close(self):
+        """Stop the job queue and CLI fallback runs, then release the Docker client and the in-process worker pool."""
+        self.jobs.close()
+        with self._cli_lock:
+            loop, self._cli_loop = self._cli_loop, None
+        if loop is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._cancel_cli_runs(), loop).result(timeout=30)
+            except Exception as e:
+                logger.warning(f"Failed to cancel CLI fallback runs: {e}")
+            loop.call_soon_threadsafe(loop.stop)
+        self.inprocess.close()
+        if self.images is not None:
+            self.images.stop()
+        for pool in self.container_pools.values():
+            pool.close()
+        if self.docker_client:
+            self.docker_client.close()
+    
+    def _run_in_process(self, request: SimulationRequest) -> SimulationResponse:
+        """Execute a trusted simulation.simulation scenario in the worker pool."""
+        if request.script_path not in TRUSTED_SCRIPTS:
+            return SimulationResponse(
+                success=False,
+                message="Script cannot run in-process",
+                error=f"The inprocess backend only runs {', '.join(TRUSTED_SCRIPTS)}; use the docker backend",
+                backend="inprocess"
+            )
+        
+        cache_key = self._inprocess_cache_key(request)
+        if cache_key:
+            cached = self._cached_response(cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            outcome = self.inprocess.run(request.parameters)
+        except Exception as e:
+            logger.error(f"In-process execution failed: {e}")
+            return SimulationResponse(
+                success=False,
+                message="In-process execution failed",
+                error=str(e),
+                backend="inprocess"
+            )
+        
+        # Like container output, the full log goes to disk and responses carry only its head and tail
+        with self.logs.create() as capture:
+            capture.write(outcome["output"].encode("utf-8"))
+        if not outcome["success"]:
+            return SimulationResponse(
+                success=False,
+                message="Simulation failed",
+                output=capture.excerpt(),
+                error=outcome["error"],
+                backend="inprocess",
+                log_id=capture.log_id,
+                log_bytes=capture.total_bytes
+            )
+        response = SimulationResponse(
+            success=True,
+            message="Simulation completed successfully",
+            output=capture.excerpt(),
+            results=outcome["results"],
+            backend="inprocess",
+            log_id=capture.log_id,
+            log_bytes=capture.total_bytes
+        )
+        if cache_key:
+            self.result_cache.put(cache_key, response.model_dump())
+        return response
     
     def _run_with_docker_sdk(self, request: SimulationRequest) -> SimulationResponse:
         """Execute simulation using Docker SDK."""
         try:
-            # Check if image exists
-            try:
-                self.docker_client.images.get(request.image_name)
-            except docker.errors.ImageNotFound:
+            # Check if image exists; lookups are cached while Docker events are watched
+            with self.image_lookup_seconds.time():
+                image = self.images.get(request.image_name)
+            if image is None:
                 return SimulationResponse(
                     success=False,
                     message=f"Docker image {request.image_name} not found",
-                    error="Image not available"
+                    error="Image not available",
+                    backend="docker"
                 )
             
-            # Run container
-            container = self.docker_client.containers.run(
-                image=request.image_name,
-                command=f"python3 {request.script_path}",
-                detach=True,
-                name=request.container_name,
-                remove=True,
-                volumes={
-                    '/tmp/simulation_scripts': {'bind': '/app', 'mode': 'ro'}
-                },
-                environment=request.parameters
-            )
+            # Deterministic runs of the same image, script and parameters are served from cache
+            cache_key = self._cache_key(request, image.id)
+            if cache_key:
+                cached = self._cached_response(cache_key)
+                if cached is not None:
+                    return cached
             
-            # Wait for container to complete
-            result = container.wait()
-            logs = container.logs().decode('utf-8')
+            quota = self.quota(request)
+            path = self.execution_path(request)
+            pool = self.container_pool(request.image_name) if path == "pool" else None
+            artifacts = []
             
-            if result['StatusCode'] == 0:
-                return SimulationResponse(
+            def collect(container):
+                artifacts.extend(self._collect_artifacts(container, request))
+            
+            with self.logs.create() as capture:
+                if pool is not None:
+                    # Dispatch into an idle pre-started container
+                    with self.running_containers.track(path=path):
+                        status_code = pool.run(["python3", request.script_path], request.parameters,
+                                               capture.write, request.artifacts, collect)
+                else:
+                    # Run container; it is removed once its artifacts are collected
+                    with self.container_start_seconds.time(path=path):
+                        container = self.docker_client.containers.run(
+                            image=request.image_name,
+                            command=f"python3 {request.script_path}",
+                            detach=True,
+                            name=self._container_name(request),
+                            volumes=SCRIPT_VOLUMES,
+                            environment=request.parameters,
+                            **docker_limits(quota)
+                        )
+                    
+                    try:
+                        with self.running_containers.track(path=path):
+                            # Stream logs to disk until the container exits, then collect its status
+                            for chunk in container.logs(stream=True, follow=True):
+                                capture.write(chunk)
+                            status_code = container.wait()['StatusCode']
+                            collect(container)
+                    finally:
+                        container.remove(force=True)
+            self.log_collection_seconds.observe(capture.seconds, path=path)
+            logs = capture.excerpt()
+            
+            if status_code == 0:
+                response = SimulationResponse(
                     success=True,
                     message="Simulation completed successfully",
-                    output=logs
+                    output=logs,
+                    backend="docker",
+                    log_id=capture.log_id,
+                    log_bytes=capture.total_bytes,
+                    artifacts=artifacts
                 )
+                if cache_key:
+                    self.result_cache.put(cache_key, response.model_dump())
+                return response
             else:
                 return SimulationResponse(
                     success=False,
                     message="Simulation failed",
-                    error=logs
+                    error=logs,
+                    backend="docker",
+                    log_id=capture.log_id,
+                    log_bytes=capture.total_bytes,
+                    artifacts=artifacts
                 )
                 
         except Exception as e:
@@ -117,16 +739,55 @@ class TurtleBotSimulation:
             return SimulationResponse(
                 success=False,
                 message="Docker execution failed",
-                error=str(e)
+                error=str(e),
+                backend="docker"
             )
     
     def _run_with_cli_fallback(self, request: SimulationRequest) -> SimulationResponse:
-        """Fallback to CLI execution when Docker SDK fails."""
+        """Fallback to CLI execution when Docker SDK fails, waiting for the run."""
+        return self._start_cli_run(request).result()
+    
+    def _start_cli_run(self, request: SimulationRequest) -> Future:
+        """
+        Start a CLI run as a coroutine on the shared CLI event loop and return
+        its future. The run can be cancelled through cancel() while in flight.
+        """
+        container_name = self._container_name(request)
+        
+        async def tracked() -> SimulationResponse:
+            with self._cli_lock:
+                self._cli_runs[container_name] = asyncio.current_task()
+            try:
+                return await self.run_cli(request)
+            finally:
+                with self._cli_lock:
+                    self._cli_runs.pop(container_name, None)
+        
+        return asyncio.run_coroutine_threadsafe(tracked(), self._cli_event_loop())
+    
+    async def _remove_cli_container(self, container_name: str):
+        process = await asyncio.create_subprocess_exec(
+            "docker", "rm", "-f", container_name,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+        await process.wait()
+    
+    async def run_cli(self, request: SimulationRequest) -> SimulationResponse:
+        """
+        Execute a simulation with the docker CLI, streaming its output to the
+        log as it arrives. A run exceeding its timeout, or whose task is
+        cancelled, has its container removed.
+        """
         try:
             # Construct docker run command
+            quota = self.quota(request)
+            container_name = self._container_name(request)
+            timeout = request.timeout or self.run_timeout
             docker_cmd = [
-                "docker", "run", "--rm",
-                "--name", request.container_name,
+                "docker", "run",
+                "--name", container_name,
+                "--cpus", f"{quota.cpus:g}",
+                "--memory", f"{quota.memory_mb}m",
                 "-v", "/tmp/simulation_scripts:/app:ro"
             ]
             
@@ -137,39 +798,59 @@ class TurtleBotSimulation:
             # Add image and command
             docker_cmd.extend([request.image_name, "python3", request.script_path])
             
-            # Execute command
-            result = subprocess.run(
-                docker_cmd,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
-            )
+            # Execute command, streaming stdout and stderr to the log
+            try:
+                with self.logs.create() as capture:
+                    with self.running_containers.track(path="cli"):
+                        returncode = await stream_process(docker_cmd, capture.write, timeout)
+                self.log_collection_seconds.observe(capture.seconds, path="cli")
+                artifacts = []
+                if returncode is not None:
+                    # docker cp output is unpacked with blocking file I/O, so keep it off the loop
+                    artifacts = await asyncio.get_running_loop().run_in_executor(
+                        None, self._collect_cli_artifacts, container_name, request
+                    )
+            finally:
+                # Without --rm the container outlives the run; this also stops it after a timeout or cancellation
+                await self._remove_cli_container(container_name)
             
-            if result.returncode == 0:
+            if returncode is None:
+                return SimulationResponse(
+                    success=False,
+                    message="Simulation timed out",
+                    error=f"Execution exceeded the {timeout:g} second timeout",
+                    backend="docker",
+                    log_id=capture.log_id,
+                    log_bytes=capture.total_bytes
+                )
+            if returncode == 0:
                 return SimulationResponse(
                     success=True,
                     message="Simulation completed successfully (CLI fallback)",
-                    output=result.stdout
+                    output=capture.excerpt(),
+                    backend="docker",
+                    log_id=capture.log_id,
+                    log_bytes=capture.total_bytes,
+                    artifacts=artifacts
                 )
             else:
                 return SimulationResponse(
                     success=False,
                     message="Simulation failed (CLI fallback)",
-                    error=result.stderr
+                    error=capture.excerpt(),
+                    backend="docker",
+                    log_id=capture.log_id,
+                    log_bytes=capture.total_bytes,
+                    artifacts=artifacts
                 )
                 
-        except subprocess.TimeoutExpired:
-            return SimulationResponse(
-                success=False,
-                message="Simulation timed out",
-                error="Execution exceeded 5 minute timeout"
-            )
         except Exception as e:
             logger.error(f"CLI fallback failed: {e}")
             return SimulationResponse(
                 success=False,
                 message="CLI fallback failed",
-                error=str(e)
+                error=str(e),
+                backend="docker"
             )
 
 
@@ -188,14 +869,24 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Initializing robot simulation backend...")
     simulation_instance = TurtleBotSimulation()
+    if simulation_instance.default_backend == "inprocess":
+        # Pre-fork the workers so the first runs skip process start-up
+        simulation_instance.inprocess.start()
+    simulation_instance.start_image_watcher()
+    default_pool = simulation_instance.container_pool(SimulationRequest().image_name)
+    if default_pool is not None:
+        try:
+            default_pool.warm()
+        except Exception as e:
+            logger.warning(f"Failed to pre-start simulation containers: {e}")
     logger.info("Robot simulation backend ready")
     
     yield
     
     # Shutdown
     logger.info("Shutting down robot simulation backend...")
-    if simulation_instance and simulation_instance.docker_client:
-        simulation_instance.docker_client.close()
+    if simulation_instance:
+        simulation_instance.close()
     logger.info("Robot simulation backend shutdown complete")
 
 
@@ -218,25 +909,208 @@ async def root():
     }
 
 
-@app.post("/simulate", response_model=SimulationResponse)
-async def run_simulation(request: SimulationRequest):
+@app.post("/simulate", response_model=JobResponse, status_code=202)
+async def run_simulation(request: SimulationRequest, http_request: Request):
     """
-    Execute robot simulation.
+    Queue a robot simulation and return its job id immediately.
     
-    This endpoint demonstrates the correct pattern:
-    - simulation_instance.run() calls the run method on a class instance
-    - NOT run.run() which would cause 'function' object has no attribute 'run' error
+    The job runs simulation_instance.run() on the job queue's worker pool,
+    so a long container run never blocks the event loop. It starts once its
+    CPU and memory quota fits the host capacity, ahead of lower priorities
+    and fairly among clients. Poll GET /jobs/{job_id} for its state and result.
     """
     if not simulation_instance:
         raise HTTPException(status_code=500, detail="Simulation backend not initialized")
     
+    client = http_request.client.host if http_request.client else "anonymous"
     try:
-        # This is the CORRECT pattern: instance.run()
-        result = simulation_instance.run(request)
-        return result
+        job = simulation_instance.submit(request, client)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Simulation queue is full: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Queued simulation job {job.id}")
+    return JobResponse.from_job(job)
+
+
+@app.post("/simulate/batch")
+async def run_simulation_batch(request: BatchRequest, http_request: Request):
+    """
+    Run many simulations and stream one NDJSON line per request as each
+    finishes. Lines carry the request's `index` in the batch, its job id,
+    status and SimulationResponse; rejected requests carry an `error`.
+    """
+    if not simulation_instance:
+        raise HTTPException(status_code=500, detail="Simulation backend not initialized")
+    if len(request.requests) > simulation_instance.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch of {len(request.requests)} exceeds the limit of {simulation_instance.batch_max_items} requests"
+        )
+    
+    client = http_request.client.host if http_request.client else "anonymous"
+    
+    async def lines():
+        async for outcome in simulation_instance.run_batch(request.requests, client, request.concurrency):
+            yield json.dumps(outcome) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Report a simulation job's state, and its result once it has finished."""
+    if not simulation_instance:
+        raise HTTPException(status_code=500, detail="Simulation backend not initialized")
+    
+    job = simulation_instance.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown simulation job {job_id}")
+    return JobResponse.from_job(job)
+
+
+@app.delete("/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """
+    Cancel a simulation job. Queued jobs never start; a running CLI fallback
+    run is stopped and its container removed. Finished jobs are unchanged.
+    """
+    if not simulation_instance:
+        raise HTTPException(status_code=500, detail="Simulation backend not initialized")
+    
+    try:
+        job = await run_in_threadpool(simulation_instance.cancel, job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown simulation job {job_id}")
+    return JobResponse.from_job(job)
+
+
+@app.get("/logs/{log_id}")
+async def read_log(log_id: str, offset: int = Query(0, ge=0),
+                   length: int = Query(64 * 1024, ge=1, le=MAX_LOG_READ)):
+    """
+    Read `length` bytes of a run's full log starting at `offset`.
+    X-Log-Size carries the log's total size for paging.
+    """
+    if not simulation_instance:
+        raise HTTPException(status_code=500, detail="Simulation backend not initialized")
+    
+    data = await run_in_threadpool(simulation_instance.logs.read, log_id, offset, length)
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"Log {log_id} not found")
+    headers = {"X-Log-Offset": str(offset)}
+    size = simulation_instance.logs.size(log_id)
+    if size is not None:
+        headers["X-Log-Size"] = str(size)
+    return Response(content=data, media_type="text/plain; charset=utf-8", headers=headers)
+
+
+@app.get("/artifacts/{digest}")
+async def download_artifact(digest: str, filename: Optional[str] = None):
+    """Download a collected artifact by its SHA-256 digest; the file is streamed from disk."""
+    if not simulation_instance:
+        raise HTTPException(status_code=500, detail="Simulation backend not initialized")
+    
+    path = simulation_instance.artifacts.path(digest)
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Artifact {digest} not found")
+    return FileResponse(path, media_type="application/octet-stream",
+                        filename=os.path.basename(filename) if filename else digest)
+
+
+@app.post("/simulate/stream")
+async def stream_simulation(request: StreamRequest):
+    """
+    Run a simulation in-process and stream its state frames as server-sent events.
+    Frames are decimated server-side and buffered per client; a slow client
+    loses the oldest frames instead of stalling the simulation.
+    Streams obey the in-process limits: no lockstep pacing (its step gate
+    would read the server's stdin) and a capped max_time and step count.
+    At most SIMULATION_STREAM_CONCURRENCY streams run at once.
+    """
+    if not simulation_instance:
+        raise HTTPException(status_code=500, detail="Simulation backend not initialized")
+    
+    limits = simulation_instance.inprocess
+    try:
+        # Streams are watched live, so they keep the simulator's realtime default pacing
+        parameters = scenario_parameters(
+            {"sync_mode": "realtime", **request.parameters}, max_time=limits.max_time, max_steps=limits.max_steps
+        )
+        simulator = TurtleBotSimulator(parameters)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid simulation parameters: {str(e)}")
+    
+    slots = simulation_instance.stream_slots
+    if not slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Too many simulation streams are running")
+    
+    async def events():
+        try:
+            async for message in stream_simulation_events(simulator, request.decimation, request.buffer_size):
+                yield message
+        finally:
+            slots.release()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@app.post("/sweep", response_model=SweepResponse)
+async def run_parameter_sweep(request: SweepRequest):
+    """
+    Evaluate a parameter grid and/or explicit list of points in one worker.
+    `parameters` supplies defaults shared by every point. Sweeps are limited
+    to SIMULATION_SWEEP_MAX_POINTS points and SIMULATION_SWEEP_MAX_PROCESSES
+    processes, with at most SIMULATION_SWEEP_CONCURRENCY running at once, and
+    every point obeys the in-process max_time and step limits.
+    """
+    if not simulation_instance:
+        raise HTTPException(status_code=500, detail="Simulation backend not initialized")
+    
+    # Sized before expanding, so an oversized grid is never materialized
+    count = len(request.points) + (math.prod(map(len, request.grid.values())) if request.grid else 0)
+    if not count:
+        raise HTTPException(status_code=400, detail="Sweep needs a non-empty grid or points list")
+    if count > simulation_instance.sweep_max_points:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Sweep of {count} points exceeds the limit of {simulation_instance.sweep_max_points}"
+        )
+    max_processes = simulation_instance.sweep_max_processes
+    processes = max_processes if request.processes is None else min(request.processes, max_processes)
+    
+    slots = simulation_instance.sweep_slots
+    if not slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Too many parameter sweeps are running")
+    try:
+        points = list(request.points) + expand_grid(request.grid)
+        limits = simulation_instance.inprocess
+        result = await run_in_threadpool(
+            run_sweep, points, request.parameters, processes, limits.max_time, limits.max_steps
+        )
+        return SweepResponse(**result)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid sweep parameters: {str(e)}")
     except Exception as e:
-        logger.error(f"Simulation execution error: {e}")
-        raise HTTPException(status_code=500, detail=f"Simulation failed: {str(e)}")
+        logger.error(f"Sweep execution error: {e}")
+        raise HTTPException(status_code=500, detail=f"Sweep failed: {str(e)}")
+    finally:
+        slots.release()
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Queue, container and latency metrics in the Prometheus text format."""
+    if not simulation_instance:
+        raise HTTPException(status_code=500, detail="Simulation backend not initialized")
+    
+    return Response(content=simulation_instance.metrics.render(), media_type=METRICS_CONTENT_TYPE)
 
 
 @app.get("/status")
@@ -248,7 +1122,11 @@ async def get_status():
     return {
         "status": "ready",
         "docker_available": simulation_instance.is_docker_available,
-        "docker_client_status": "connected" if simulation_instance.docker_client else "disconnected"
+        "docker_client_status": "connected" if simulation_instance.docker_client else "disconnected",
+        "default_backend": simulation_instance.default_backend,
+        "jobs": simulation_instance.jobs.stats(),
+        "image_cache": simulation_instance.images.stats() if simulation_instance.images else None,
+        "container_pools": [pool.stats() for pool in simulation_instance.container_pools.values()]
     }
 
 
@@ -0,0 +1,262 @@
+"""
+Shared-Memory Swarm Stepping
+Shards a swarm's (5, N) state array across worker processes.
+
+The state lives in a `multiprocessing.shared_memory` block that the parent
+and every worker map as the same NumPy array, so nothing is pickled per
+tick. Each worker owns a contiguous slice of robots and steps it in place
+with the motion model's batched kernel; barriers around every tick keep workers
+in lockstep with the parent. With a neighbor radius, workers also count
+neighbors per spatial strip: every REBIN_INTERVAL ticks the parent re-bins
+the robots into strips of equal size ordered by x, each worker publishes the
+bounding box of its strip after moving, and reads only the strips whose box
+lies within the radius of its own, so the per-worker cost scales with its
+strip and its neighbors rather than with the whole swarm.
+"""
+
+import os
+import logging
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from simulation.simulation import X, Y, create_motion_model
+from simulation.spatial import UniformGridIndex
+
+logger = logging.getLogger(__name__)
+
+# Control block layout: [command, simulation_time, dt]
+_COMMAND, _TIME, _DT = range(3)
+STEP, STOP = 0.0, 1.0
+
+# Ticks between re-binning robots into spatial strips. Strips drift as robots
+# move, which costs pruning but never correctness: boxes are recomputed each tick.
+REBIN_INTERVAL = 10
+
+# Seconds the parent, or a worker mid-tick, waits at a barrier before the pool
+# is considered broken. Idle workers wait for the next tick without a limit,
+# since the parent may pause arbitrarily long between ticks.
+BARRIER_TIMEOUT = 60.0
+
+# Seconds to wait for every worker to start, import and attach the shared memory
+STARTUP_TIMEOUT = 60.0
+
+
+def partition(num_robots: int, shards: int) -> List[Tuple[int, int]]:
+    """Split robot indices into `shards` contiguous, near-equal [start, stop) ranges."""
+    bounds = np.linspace(0, num_robots, shards + 1).round().astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def count_shard_neighbors(state: np.ndarray, own: np.ndarray, candidates: np.ndarray, radius: float) -> np.ndarray:
+    """
+    Number of robots within radius of each robot in state[:, own].
+    `candidates` are the foreign robots that may lie nearby; only those inside
+    the own robots' bounding box grown by radius are indexed, so the work
+    scales with the shard plus its boundary.
+    """
+    if own.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    x, y = state[X], state[Y]
+    own_x, own_y = x[own], y[own]
+    other_x, other_y = x[candidates], y[candidates]
+    halo = ((other_x >= own_x.min() - radius) & (other_x <= own_x.max() + radius) &
+            (other_y >= own_y.min() - radius) & (other_y <= own_y.max() + radius))
+    local_x = np.concatenate([own_x, other_x[halo]])
+    local_y = np.concatenate([own_y, other_y[halo]])
+
+    index = UniformGridIndex(radius)
+    index.build(local_x, local_y)
+    i, j, _ = index.query_pairs(radius)
+    size = own.size
+    return (np.bincount(i[i < size], minlength=size) +
+            np.bincount(j[j < size], minlength=size))
+
+
+def _strip_box(x: np.ndarray, y: np.ndarray) -> Tuple[float, float, float, float]:
+    """Bounding box (x_min, x_max, y_min, y_max) of a strip; empty strips overlap nothing."""
+    if x.size == 0:
+        return (np.inf, -np.inf, np.inf, -np.inf)
+    return (x.min(), x.max(), y.min(), y.max())
+
+
+def _attach(name: str, shape: Tuple[int, ...], dtype=np.float64) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _worker(state_name: str, control_name: str, strip_names: Optional[Tuple[str, str, str]],
+            shape: Tuple[int, int], shards: List[Tuple[int, int]], shard: int, parameters: Dict[str, Any],
+            neighbor_radius: Optional[float], start_barrier, done_barrier):
+    """Worker loop: wait for a tick, step the shard in place, report completion."""
+    start, stop = shards[shard]
+    blocks = []
+    state = own = control = order = boxes = counts = None
+    try:
+        state_block, state = _attach(state_name, shape)
+        control_block, control = _attach(control_name, (3,))
+        blocks += [state_block, control_block]
+        if strip_names:
+            order_name, boxes_name, counts_name = strip_names
+            order_block, order = _attach(order_name, (shape[1],), np.int64)
+            boxes_block, boxes = _attach(boxes_name, (len(shards), 4))
+            counts_block, counts = _attach(counts_name, (shape[1],))
+            blocks += [order_block, boxes_block, counts_block]
+        model = create_motion_model(parameters)
+        own = state[:, start:stop]
+        scratch = np.empty((2, stop - start), dtype=np.float64)
+        done_barrier.wait(STARTUP_TIMEOUT)
+
+        while True:
+            # Released by the parent's next step() or by close() with STOP
+            start_barrier.wait(None)
+            if control[_COMMAND] == STOP:
+                break
+            model.step_batch(own, float(control[_TIME]), float(control[_DT]), scratch)
+            if neighbor_radius:
+                # Every shard must finish moving before strip boxes are measured
+                done_barrier.wait(BARRIER_TIMEOUT)
+                members = order[start:stop]
+                boxes[shard] = _strip_box(state[X, members], state[Y, members])
+                # ... and every box must be published before any is read
+                done_barrier.wait(BARRIER_TIMEOUT)
+                x_min, x_max, y_min, y_max = boxes[shard]
+                nearby = ((boxes[:, 0] <= x_max + neighbor_radius) & (boxes[:, 1] >= x_min - neighbor_radius) &
+                          (boxes[:, 2] <= y_max + neighbor_radius) & (boxes[:, 3] >= y_min - neighbor_radius))
+                nearby[shard] = False
+                candidates = [order[shards[other][0]:shards[other][1]] for other in np.flatnonzero(nearby)]
+                candidates = np.concatenate(candidates) if candidates else np.zeros(0, dtype=np.int64)
+                counts[members] = count_shard_neighbors(state, members, candidates, neighbor_radius)
+            done_barrier.wait(BARRIER_TIMEOUT)
+    except Exception:
+        logger.exception(f"Swarm worker for robots [{start}, {stop}) failed")
+        start_barrier.abort()
+        done_barrier.abort()
+    finally:
+        # Views must be released before their blocks can be unmapped
+        state = own = control = order = boxes = counts = members = None
+        for block in blocks:
+            block.close()
+
+
+class SharedMemoryStepper:
+    """
+    Pool of worker processes stepping one shared (5, N) state array.
+    `state` is the shared array; callers read and write it directly between
+    ticks. Use as a context manager or call close() to stop the workers and
+    free the shared memory.
+    """
+
+    def __init__(self, parameters: Dict[str, Any], num_robots: int, processes: Optional[int] = None,
+                 neighbor_radius: Optional[float] = None):
+        self.num_robots = int(num_robots)
+        self.processes = max(1, min(int(processes or os.cpu_count() or 1), self.num_robots))
+        self.neighbor_radius = neighbor_radius
+        self.shards = partition(self.num_robots, self.processes)
+        shape = (5, self.num_robots)
+
+        self._blocks = []
+        self._state_block = self._allocate(5 * self.num_robots)
+        self._control_block = self._allocate(3)
+        self.state = np.ndarray(shape, dtype=np.float64, buffer=self._state_block.buf)
+        self.state[:] = 0.0
+        self._control = np.ndarray((3,), dtype=np.float64, buffer=self._control_block.buf)
+        self.neighbor_counts = self._order = None
+        self._ticks = 0
+        strip_names = None
+        if neighbor_radius:
+            # Robot indices sorted by x (strip k is order[shards[k]]), strip boxes and neighbor counts
+            order_block = self._allocate(self.num_robots)
+            boxes_block = self._allocate(4 * self.processes)
+            counts_block = self._allocate(self.num_robots)
+            self._order = np.ndarray((self.num_robots,), dtype=np.int64, buffer=order_block.buf)
+            self.neighbor_counts = np.ndarray((self.num_robots,), dtype=np.float64, buffer=counts_block.buf)
+            self.neighbor_counts[:] = 0.0
+            strip_names = (order_block.name, boxes_block.name, counts_block.name)
+
+        # Workers are never forked from a possibly multi-threaded parent
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(method)
+        self._start_barrier = context.Barrier(self.processes + 1)
+        self._done_barrier = context.Barrier(self.processes + 1)
+        self._workers = [
+            context.Process(
+                target=_worker,
+                args=(self._state_block.name, self._control_block.name, strip_names, shape, self.shards, shard,
+                      dict(parameters), neighbor_radius, self._start_barrier, self._done_barrier),
+                daemon=True
+            )
+            for shard in range(self.processes)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self.closed = False
+        # Ticks are timed from here on, so start-up must not count against them
+        try:
+            self._done_barrier.wait(STARTUP_TIMEOUT)
+        except threading.BrokenBarrierError:
+            self.close()
+            raise RuntimeError("A swarm worker process failed to start; see its log for details")
+        logger.info(f"Sharded {self.num_robots} robots across {self.processes} worker processes")
+
+    def _allocate(self, count: int) -> shared_memory.SharedMemory:
+        block = shared_memory.SharedMemory(create=True, size=max(count, 1) * 8)
+        self._blocks.append(block)
+        return block
+
+    def _wait(self, barrier):
+        try:
+            barrier.wait(BARRIER_TIMEOUT)
+        except threading.BrokenBarrierError:
+            self.close()
+            raise RuntimeError("A swarm worker process failed; see its log for details")
+
+    def step(self, simulation_time: float, dt: float):
+        """Advance every shard by dt and block until all workers are done."""
+        if self.closed:
+            raise RuntimeError("SharedMemoryStepper is closed")
+        self._control[_COMMAND] = STEP
+        self._control[_TIME] = simulation_time
+        self._control[_DT] = dt
+        if self.neighbor_radius and self._ticks % REBIN_INTERVAL == 0:
+            self._order[:] = np.argsort(self.state[X], kind="stable")
+        self._ticks += 1
+        self._wait(self._start_barrier)
+        if self.neighbor_radius:
+            self._wait(self._done_barrier)
+            self._wait(self._done_barrier)
+        self._wait(self._done_barrier)
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        if self.closed:
+            return
+        self.closed = True
+        self._control[_COMMAND] = STOP
+        try:
+            self._start_barrier.wait(BARRIER_TIMEOUT)
+        except threading.BrokenBarrierError:
+            pass
+        for worker in self._workers:
+            worker.join(timeout=5.0)
+            if worker.is_alive():
+                worker.terminate()
+        # Drop our views before unmapping the blocks
+        self.state = self._control = self.neighbor_counts = self._order = None
+        for block in self._blocks:
+            try:
+                block.close()
+            except BufferError:
+                # A caller still holds a view; the mapping goes away with it
+                pass
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,169 @@
+"""
+Trajectory Recorder
+Columnar, memory-mapped storage for per-step simulation state.
+
+A trajectory is a directory holding one .npy file per column plus a small
+header.json. Rows are buffered in preallocated chunks and appended to the
+column files whenever a chunk fills up, so recording never holds more than
+one chunk in memory. Readers memory-map the columns, giving O(1) access to
+any step without loading the run into RAM.
+"""
+
+import io
+import os
+import json
+import logging
+from typing import Dict, Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRAJECTORY_FORMAT = "brain-swarm-trajectory"
+TRAJECTORY_VERSION = 1
+HEADER_FILE = "header.json"
+
+# Scalar time column followed by one pose column per robot
+COLUMNS = ("time", "x", "y", "theta")
+DTYPE = np.dtype("<f8")
+
+
+def _npy_header(shape) -> bytes:
+    """Encode a .npy v1.0 header for a float64 C-order array of the given shape."""
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        buffer, {"descr": np.lib.format.dtype_to_descr(DTYPE), "fortran_order": False, "shape": shape}
+    )
+    return buffer.getvalue()
+
+
+class TrajectoryRecorder:
+    """
+    Append-only recorder for simulation trajectories.
+    Row k holds the state after k steps; row 0 is the initial state.
+    """
+
+    def __init__(self, directory: str, num_robots: int = 1, chunk_size: int = 1024):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.directory = directory
+        self.num_robots = int(num_robots)
+        self.chunk_size = int(chunk_size)
+        self.rows = 0
+        self._fill = 0
+        self._closed = False
+
+        os.makedirs(directory, exist_ok=True)
+        self._buffers = {
+            name: np.empty(self._row_shape(name, self.chunk_size), dtype=DTYPE)
+            for name in COLUMNS
+        }
+        self._files = {}
+        self._header_size = {}
+        for name in COLUMNS:
+            header = _npy_header(self._row_shape(name, 0))
+            handle = open(self._column_path(name), "wb")
+            handle.write(header)
+            self._files[name] = handle
+            self._header_size[name] = len(header)
+        self._write_header()
+
+    def _row_shape(self, name: str, rows: int):
+        return (rows,) if name == "time" else (rows, self.num_robots)
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def append(self, time: float, x, y, theta):
+        """Record one row; pose values may be scalars or per-robot arrays."""
+        if self._closed:
+            raise ValueError("Cannot append to a closed TrajectoryRecorder")
+        row = self._fill
+        self._buffers["time"][row] = time
+        self._buffers["x"][row] = x
+        self._buffers["y"][row] = y
+        self._buffers["theta"][row] = theta
+        self._fill += 1
+        if self._fill == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Append buffered rows to the column files and publish the new row count."""
+        if self._fill == 0:
+            return
+        self.rows += self._fill
+        for name in COLUMNS:
+            handle = self._files[name]
+            handle.seek(0, os.SEEK_END)
+            handle.write(memoryview(self._buffers[name][:self._fill]))
+            # .npy headers are padded so the leading axis can grow in place
+            header = _npy_header(self._row_shape(name, self.rows))
+            if len(header) != self._header_size[name]:
+                raise RuntimeError(f"Header of column '{name}' changed size; cannot grow in place")
+            handle.seek(0)
+            handle.write(header)
+            handle.flush()
+        self._fill = 0
+        self._write_header()
+
+    def _write_header(self):
+        header = {
+            "format": TRAJECTORY_FORMAT,
+            "version": TRAJECTORY_VERSION,
+            "columns": list(COLUMNS),
+            "dtype": DTYPE.str,
+            "num_robots": self.num_robots,
+            "rows": self.rows,
+            "chunk_size": self.chunk_size
+        }
+        temp_path = os.path.join(self.directory, HEADER_FILE + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(header, f, indent=2)
+        os.replace(temp_path, os.path.join(self.directory, HEADER_FILE))
+
+    def close(self):
+        """Flush remaining rows and close the column files."""
+        if self._closed:
+            return
+        self.flush()
+        for handle in self._files.values():
+            handle.close()
+        self._closed = True
+        logger.info(f"Trajectory with {self.rows} rows saved to {self.directory}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TrajectoryReader:
+    """Memory-mapped, random-access view of a recorded trajectory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, HEADER_FILE)) as f:
+            self.header = json.load(f)
+        if self.header.get("format") != TRAJECTORY_FORMAT:
+            raise ValueError(f"{directory} is not a trajectory directory")
+        self.num_robots = self.header["num_robots"]
+        self.rows = self.header["rows"]
+        self._columns = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            for name in self.header["columns"]
+        }
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a read-only memory-mapped column, trimmed to the published rows."""
+        return self._columns[name][:self.rows]
+
+    def __getitem__(self, step: int) -> Dict[str, Any]:
+        if step < 0:
+            step += self.rows
+        if not 0 <= step < self.rows:
+            raise IndexError(f"Step {step} out of range for trajectory of {self.rows} rows")
+        return {name: self._columns[name][step] for name in self._columns}
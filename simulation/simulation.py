@@ -6,15 +6,246 @@ This script runs inside the Docker container for robot simulation.
 
 import os
 import sys
+import math
 import time
+import bisect
+import functools
 import logging
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # The bare simulation container has no NumPy; only batched kernels need it
+    np = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Default location of the final-state JSON inside the container
+RESULTS_PATH = "/tmp/simulation_results.json"
+
+# Supported pacing modes for the simulation loop
+SYNC_MODES = ("realtime", "fast", "lockstep")
+
+# Supported integrators for the robot state update
+INTEGRATORS = ("euler", "exact", "event")
+
+# Row layout of batched (5, N) swarm state arrays
+X, Y, THETA, LINEAR_VELOCITY, ANGULAR_VELOCITY = range(5)
+
+
+class StepPacer:
+    """
+    Paces simulation steps against the wall clock.
+
+    - realtime: each step is held to dt / real_time_factor seconds of wall time
+      (a real_time_factor of 0 runs as fast as possible)
+    - fast: never sleeps
+    - lockstep: blocks on step_gate() before every step; the gate returns
+      False to stop the run early
+    """
+
+    def __init__(self, dt: float, real_time_factor: float = 1.0, sync_mode: str = "realtime",
+                 step_gate: Optional[Callable[[], bool]] = None):
+        if sync_mode not in SYNC_MODES:
+            raise ValueError(f"Unknown sync_mode '{sync_mode}', expected one of {SYNC_MODES}")
+        self.sync_mode = sync_mode
+        self.step_gate = step_gate or stdin_step_gate
+        self.period = 0.0
+        if sync_mode == "realtime" and real_time_factor > 0:
+            self.period = dt / real_time_factor
+        self._start = None
+
+    def wait(self, step: int) -> bool:
+        """Block until step may run. Returns False if the run should stop."""
+        if self.sync_mode == "lockstep":
+            return self.step_gate()
+        if self.period <= 0:
+            return True
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+        # Sleep against absolute deadlines so per-step overhead does not accumulate
+        delay = self._start + step * self.period - now
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+
+def stdin_step_gate() -> bool:
+    """Default lockstep gate: every line read from stdin grants one step."""
+    return sys.stdin.readline() != ""
+
+
+class PhaseProfiler:
+    """
+    Aggregates wall time per simulation phase into log2 histograms.
+
+    Call sites hold `profiler = None` when profiling is off, so the disabled
+    cost is a single `if profiler:` test per phase. When enabled, phases are
+    chained with lap(): one clock read closes a phase and starts the next.
+    """
+
+    def __init__(self):
+        self.clock = time.perf_counter_ns
+        self.phases: Dict[str, List[int]] = {}
+        self.totals: Dict[str, List[int]] = {}
+
+    def lap(self, phase: str, started: int) -> int:
+        """Record the time since `started` under phase and return the current clock."""
+        now = self.clock()
+        elapsed = now - started
+        # Bucket b holds durations in [2^(b-1), 2^b) nanoseconds
+        bucket = elapsed.bit_length()
+        histogram = self.phases.get(phase)
+        if histogram is None:
+            histogram = self.phases[phase] = [0] * 65
+            self.totals[phase] = [0, 0, elapsed, elapsed]  # count, total, min, max
+        histogram[bucket] += 1
+        totals = self.totals[phase]
+        totals[0] += 1
+        totals[1] += elapsed
+        if elapsed < totals[2]:
+            totals[2] = elapsed
+        if elapsed > totals[3]:
+            totals[3] = elapsed
+        return now
+
+    def _quantile(self, phase: str, q: float) -> float:
+        """Upper bucket bound (microseconds) below which a fraction q of samples fall."""
+        target = q * self.totals[phase][0]
+        seen = 0
+        for bucket, count in enumerate(self.phases[phase]):
+            seen += count
+            if count and seen >= target:
+                return (1 << bucket) / 1000.0
+        return 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-phase statistics with non-empty histogram buckets as [upper_ns, count]."""
+        summary = {}
+        for phase, histogram in self.phases.items():
+            count, total, minimum, maximum = self.totals[phase]
+            summary[phase] = {
+                "count": count,
+                "total_ms": total / 1e6,
+                "mean_us": total / count / 1000.0,
+                "min_us": minimum / 1000.0,
+                "max_us": maximum / 1000.0,
+                "p50_us": self._quantile(phase, 0.5),
+                "p99_us": self._quantile(phase, 0.99),
+                "histogram": [[1 << bucket, n] for bucket, n in enumerate(histogram) if n]
+            }
+        return summary
+
+
+class RateScheduler:
+    """
+    Fixed-timestep multi-rate task scheduler.
+
+    The simulation advances in base steps of dt. Each task registers a rate
+    in Hz that is rounded to a whole number of base steps (at least one), so
+    a 1 Hz logger or a 10 Hz controller under 1 kHz physics only runs on the
+    steps it is due. Due tasks run in `order`, then registration order.
+    With a profiler, each task's wall time is recorded under its name unless
+    it was registered with profile=False (tasks that lap their own phases).
+
+    The task lists due on each step of the hyperperiod (the least common
+    multiple of all task periods) are precomputed, so a tick costs one
+    lookup plus the due callbacks rather than a modulo test per task.
+    """
+
+    # Longer hyperperiods fall back to per-task modulo tests
+    MAX_HYPERPERIOD = 4096
+
+    def __init__(self, dt: float, profiler: Optional[PhaseProfiler] = None):
+        self.dt = dt
+        self.profiler = profiler
+        self.tasks: List[Tuple[int, int, str, Callable[[int], None], bool]] = []
+        self._hyperperiod = 1
+        self._due: Optional[List[List[Tuple[str, Callable[[int], None], bool]]]] = None
+        # Bare callbacks per phase for the unprofiled fast path
+        self._calls: Optional[List[Tuple[Callable[[int], None], ...]]] = None
+
+    def every(self, rate: Optional[float]) -> int:
+        """Base steps between runs of a task at rate Hz; None or 0 means every step."""
+        if not rate:
+            return 1
+        if rate < 0:
+            raise ValueError("Task rates must be positive")
+        return max(1, round(1.0 / (rate * self.dt)))
+
+    def add(self, name: str, callback: Callable[[int], None], rate: Optional[float] = None,
+            order: int = 50, profile: bool = True) -> int:
+        """Register callback(step) at rate Hz and return its period in base steps."""
+        every = self.every(rate)
+        self.tasks.append((order, every, name, callback, profile))
+        self.tasks.sort(key=lambda task: task[0])
+        self._hyperperiod = 1
+        for _, period, _, _, _ in self.tasks:
+            self._hyperperiod = self._hyperperiod * period // math.gcd(self._hyperperiod, period)
+        self._due = None
+        self._calls = None
+        if self._hyperperiod <= self.MAX_HYPERPERIOD:
+            self._due = [
+                [(name, callback, profile) for _, period, name, callback, profile in self.tasks if phase % period == 0]
+                for phase in range(self._hyperperiod)
+            ]
+            self._calls = [tuple(callback for _, callback, _ in due) for due in self._due]
+        return every
+
+    def due(self, step: int) -> List[Tuple[str, Callable[[int], None], bool]]:
+        """(name, callback, profile) of the tasks due at base step `step`, in run order."""
+        if self._due is not None:
+            return self._due[step % self._hyperperiod]
+        return [(name, callback, profile) for _, every, name, callback, profile in self.tasks if step % every == 0]
+
+    def hot_path(self, name: str) -> Optional[List[Tuple[Callable[[int], None], ...]]]:
+        """
+        If `name` is the only task run on every step and no task is ordered
+        before it, the callbacks of the other tasks per hyperperiod phase, so
+        a loop can call the hot task directly and tick the rest only when due.
+        None when that does not hold or the due lists were not precomputed.
+        """
+        if self._due is None or self.profiler:
+            return None
+        names = [task_name for _, _, task_name, _, _ in self.tasks]
+        every_step = [task_name for _, every, task_name, _, _ in self.tasks if every == 1]
+        if every_step != [name] or names[0] != name:
+            return None
+        return [tuple(callback for task_name, callback, _ in due if task_name != name) for due in self._due]
+
+    @property
+    def hyperperiod(self) -> int:
+        return self._hyperperiod
+
+    def tick(self, step: int):
+        """Run every task due at base step `step`."""
+        profiler = self.profiler
+        if not profiler:
+            calls = self._calls
+            if calls is None:
+                for _, callback, _ in self.due(step):
+                    callback(step)
+                return
+            for callback in calls[step % self._hyperperiod]:
+                callback(step)
+            return
+        for name, callback, profile in self.due(step):
+            lap = profiler.clock()
+            callback(step)
+            if profile:
+                profiler.lap(name, lap)
+
+
+def is_enabled(value: Any) -> bool:
+    """Interpret flag parameters given as bools, numbers or strings."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
 
 class TurtleBotSimulator:
     """
@@ -22,17 +253,84 @@ class TurtleBotSimulator:
     Demonstrates proper class structure to avoid function attribute errors.
     """
     
-    def __init__(self, parameters: Dict[str, Any] = None):
+    def __init__(self, parameters: Dict[str, Any] = None,
+                 step_gate: Optional[Callable[[], bool]] = None, recorder=None, world=None, lidar=None):
         self.parameters = parameters or {}
         self.position = {"x": 0.0, "y": 0.0, "theta": 0.0}
         self.simulation_time = 0.0
         self.max_simulation_time = float(self.parameters.get("max_time", 30.0))
+        self.sync_mode = str(self.parameters.get("sync_mode", "realtime")).lower()
+        self.real_time_factor = float(self.parameters.get("real_time_factor", 1.0))
+        max_steps = self.parameters.get("max_steps")
+        self.max_steps = int(max_steps) if max_steps is not None else None
+        self.step_gate = step_gate
+        self.recorder = recorder
+        self.world = world
+        self.lidar = lidar
+        self.scan = None
+        self.scan_count = 0
+        self.robot_radius = float(self.parameters.get("robot_radius", 0.1))
+        self.collision_count = 0
+        self.profiler = PhaseProfiler() if is_enabled(self.parameters.get("profile")) else None
+        self.dt = float(self.parameters.get("dt", 0.1))
+        self.integrator = str(self.parameters.get("integrator", "euler")).lower()
+        if self.integrator not in INTEGRATORS:
+            raise ValueError(f"Unknown integrator '{self.integrator}', expected one of {INTEGRATORS}")
+        self.motion_model = create_motion_model(self.parameters)
+        if self.integrator == "event" and not isinstance(self.motion_model, DifferentialDrive):
+            raise ValueError("The event integrator requires the differential_drive motion model")
+        if self.integrator == "event" and (world is not None or lidar is not None):
+            # Jumps skip collision checks and the scheduler, so they would pass through obstacles
+            raise ValueError("The event integrator cannot be used with a world or lidar; use euler or exact")
+        # Command held between controller ticks; None runs the controller every physics step
+        self.command = None
+        self.scheduler = RateScheduler(self.dt, self.profiler)
+        self._register_tasks()
+        
+    def _register_tasks(self):
+        """Register the built-in controller, physics, sensing, persistence and logging tasks."""
+        dt = self.dt
+        scheduler = self.scheduler
+        control_rate = self.parameters.get("control_rate")
+        if control_rate and scheduler.every(float(control_rate)) > 1:
+            scheduler.add("control", self._control_task, float(control_rate), order=0)
+        # A partial, not a lambda, so the hottest task adds no Python frame per step
+        scheduler.add("physics", functools.partial(self.update_robot_state, dt), order=10, profile=False)
+        if self.lidar is not None:
+            scheduler.add("sensing", self._sense_task, float(self.parameters.get("lidar_rate", 10.0)), order=20)
+        if self.recorder is not None:
+            record_rate = self.parameters.get("record_rate")
+            scheduler.add("persistence", self._record_task, float(record_rate) if record_rate else None, order=30)
+        log_interval = float(self.parameters.get("log_interval", 5.0))
+        if log_interval > 0:
+            scheduler.add("logging", self._log_task, 1.0 / log_interval, order=40)
+    
+    def _control_task(self, step: int):
+        """Run the controller and hold its command until the next control tick."""
+        position = self.position
+        self.command = self.motion_model.control(
+            position["x"], position["y"], position["theta"], self.simulation_time
+        )
+    
+    def _sense_task(self, step: int):
+        """Take a lidar scan of the static world from the current pose."""
+        position = self.position
+        self.scan = self.lidar.scan(position["x"], position["y"], position["theta"], self.world)[0]
+        self.scan_count += 1
+    
+    def _record_task(self, step: int):
+        self.record_state((step + 1) * self.dt)
+    
+    def _log_task(self, step: int):
+        logger.info(f"Simulation time: {self.simulation_time:.1f}s, Position: {self.position}")
         
     def initialize(self):
         """Initialize the simulation environment."""
         logger.info("Initializing TurtleBot simulation...")
         logger.info(f"Parameters: {self.parameters}")
         logger.info(f"Max simulation time: {self.max_simulation_time} seconds")
+        logger.info(f"Sync mode: {self.sync_mode}, real time factor: {self.real_time_factor}")
+        logger.info(f"Integrator: {self.integrator}, dt: {self.dt}, motion model: {self.motion_model.name}")
         
     def run(self):
         """
@@ -43,21 +341,8 @@ class TurtleBotSimulator:
         
         try:
             self.initialize()
-            
-            # Simulation loop
-            dt = 0.1  # 10 Hz simulation
-            steps = int(self.max_simulation_time / dt)
-            
-            for step in range(steps):
-                self.simulation_time = step * dt
-                self.update_robot_state(dt)
-                
-                # Log progress every 5 seconds
-                if step % 50 == 0:
-                    logger.info(f"Simulation time: {self.simulation_time:.1f}s, Position: {self.position}")
-                
-                # Simulate real-time execution
-                time.sleep(dt)
+            for _ in self.frames():
+                pass
             
             logger.info("Simulation completed successfully")
             self.save_results()
@@ -67,33 +352,584 @@ class TurtleBotSimulator:
         except Exception as e:
             logger.error(f"Simulation error: {e}")
             sys.exit(1)
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
     
-    def update_robot_state(self, dt: float):
-        """Update robot position and orientation."""
-        # Simple circular motion for demonstration
-        angular_velocity = float(self.parameters.get("angular_velocity", 0.5))
-        linear_velocity = float(self.parameters.get("linear_velocity", 1.0))
+    def frames(self, decimation: int = 1) -> Iterator[Dict[str, Any]]:
+        """
+        Run the simulation loop as a generator of state frames.
+        Pacing, state updates, recording and progress logging happen as the
+        generator is advanced; a frame is yielded every `decimation` steps and
+        after the final step. The event integrator yields one frame per jump.
+        """
+        if decimation < 1:
+            raise ValueError("decimation must be at least 1")
+        self.record_state()
+        
+        if self.integrator == "event":
+            # Headless: the closed-form jumps need no pacing or fixed-step loop
+            for segment, t in enumerate(self._jumps(self.max_simulation_time)):
+                yield self.frame(segment, t)
+            return
         
-        self.position["theta"] += angular_velocity * dt
-        self.position["x"] += linear_velocity * dt * cos_approximation(self.position["theta"])
-        self.position["y"] += linear_velocity * dt * sin_approximation(self.position["theta"])
+        dt = self.dt  # 10 Hz physics by default
+        steps = int(self.max_simulation_time / dt)
+        if self.max_steps is not None:
+            steps = min(steps, self.max_steps)
+        pacer = StepPacer(dt, self.real_time_factor, self.sync_mode, self.step_gate)
+        profiler = self.profiler
+        tick = self.scheduler.tick
+        
+        rest = self.scheduler.hot_path("physics")
+        if rest is not None:
+            # Single-rate default: physics runs every step, so it is called directly and the
+            # sparse tasks (logging, slow persistence) only on the phases they are due
+            update = self.update_robot_state
+            hyperperiod = self.scheduler.hyperperiod
+            paced = pacer.sync_mode == "lockstep" or pacer.period > 0
+            for step in range(steps):
+                if paced and not pacer.wait(step):
+                    logger.info("Step gate closed, stopping simulation")
+                    return
+                self.simulation_time = step * dt
+                update(dt)
+                calls = rest[step % hyperperiod]
+                if calls:
+                    for callback in calls:
+                        callback(step)
+                if step % decimation == 0 or step == steps - 1:
+                    yield self.frame(step, (step + 1) * dt)
+            return
+        
+        for step in range(steps):
+            if profiler:
+                lap = profiler.clock()
+            if not pacer.wait(step):
+                logger.info("Step gate closed, stopping simulation")
+                return
+            if profiler:
+                profiler.lap("pacing", lap)
+            self.simulation_time = step * dt
+            # Control, physics, persistence and logging at their own rates
+            tick(step)
+            
+            if step % decimation == 0 or step == steps - 1:
+                yield self.frame(step, (step + 1) * dt)
     
-    def save_results(self):
-        """Save simulation results."""
+    def frame(self, step: int, t: float) -> Dict[str, Any]:
+        """Snapshot of the robot state after `step`, at simulation time t."""
+        return {"step": step, "time": t, "position": dict(self.position)}
+    
+    def record_state(self, t: Optional[float] = None):
+        """Append the current pose to the trajectory recorder, if one is attached."""
+        if self.recorder is not None:
+            self.recorder.append(
+                self.simulation_time if t is None else t,
+                self.position["x"], self.position["y"], self.position["theta"]
+            )
+    
+    def command_at(self, t: float) -> Tuple[float, float]:
+        """Return the (linear_velocity, angular_velocity) command active at time t."""
+        return self.motion_model.command_at(t)
+    
+    def advance_to(self, t_end: float):
+        """Advance the robot to t_end with one exact jump per constant-command segment."""
+        for _ in self._jumps(t_end):
+            pass
+    
+    def _jumps(self, t_end: float) -> Iterator[float]:
+        """Jump segment by segment towards t_end, yielding the time reached after each jump."""
+        commands = self.motion_model.commands
+        t = self.simulation_time
+        while t < t_end:
+            index = self.motion_model.segment_at(t)
+            _, linear_velocity, angular_velocity = commands[index]
+            if index + 1 < len(commands):
+                t_next = min(commands[index + 1][0], t_end)
+            else:
+                t_next = t_end
+            self.position["x"], self.position["y"], self.position["theta"] = integrate_arc(
+                self.position["x"], self.position["y"], self.position["theta"],
+                linear_velocity, angular_velocity, t_next - t
+            )
+            t = self.simulation_time = t_next
+            self.record_state(t)
+            logger.info(f"Simulation time: {t:.1f}s, Position: {self.position}")
+            yield t
+    
+    def update_robot_state(self, dt: float, step: Optional[int] = None):
+        """Update robot position and orientation; `step` is the scheduler's base step and unused."""
+        profiler = self.profiler
+        if profiler:
+            lap = profiler.clock()
+        position = self.position
+        if self.world is not None:
+            previous = dict(position)
+        
+        if self.command is None:
+            position["x"], position["y"], position["theta"] = self.motion_model.step(
+                position["x"], position["y"], position["theta"], self.simulation_time, dt
+            )
+        else:
+            position["x"], position["y"], position["theta"] = self.motion_model.advance(
+                position["x"], position["y"], position["theta"], self.command, dt
+            )
+        
+        if profiler:
+            lap = profiler.lap("step", lap)
+        
+        # Static obstacles block the move; the robot stays where it was
+        if self.world is not None:
+            if self.world.collides(self.position["x"], self.position["y"], self.robot_radius):
+                self.position.update(previous)
+                self.collision_count += 1
+            if profiler:
+                profiler.lap("collision", lap)
+    
+    def results(self) -> Dict[str, Any]:
+        """Final-state results document."""
         results = {
             "final_position": self.position,
             "simulation_time": self.simulation_time,
             "parameters": self.parameters,
             "status": "completed"
         }
-        
-        results_path = "/tmp/simulation_results.json"
-        try:
-            with open(results_path, 'w') as f:
-                json.dump(results, f, indent=2)
-            logger.info(f"Results saved to {results_path}")
-        except Exception as e:
-            logger.error(f"Failed to save results: {e}")
+        if self.world is not None:
+            results["collisions"] = self.collision_count
+        if self.lidar is not None:
+            results["lidar"] = lidar_summary(self.lidar, self.scan, self.scan_count)
+        if self.profiler:
+            results["profile"] = self.profiler.summary()
+        return results
+    
+    def save_results(self):
+        """Save simulation results."""
+        results = self.results()
+        for phase, stats in results.get("profile", {}).items():
+            logger.info(f"Profile {phase}: {stats['count']} calls, {stats['total_ms']:.2f} ms total, "
+                        f"p50 {stats['p50_us']:.1f} us, p99 {stats['p99_us']:.1f} us")
+        write_results(results)
+
+
+def write_results(results: Dict[str, Any], results_path: str = RESULTS_PATH):
+    """Write a final-state results document as JSON."""
+    try:
+        with open(results_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Results saved to {results_path}")
+    except Exception as e:
+        logger.error(f"Failed to save results: {e}")
+
+
+def integrate_arc(x: float, y: float, theta: float, linear_velocity: float,
+                  angular_velocity: float, dt: float) -> Tuple[float, float, float]:
+    """
+    Exact differential-drive (unicycle) pose after dt seconds of constant
+    commands. The robot follows a circular arc of radius v / w, or a straight
+    line when w is zero, so dt can be arbitrarily large without drift.
+    """
+    dtheta = angular_velocity * dt
+    new_theta = theta + dtheta
+    if abs(dtheta) < 1e-9:
+        # Straight-line limit; the midpoint heading keeps the tiny-turn case second-order accurate
+        heading = theta + 0.5 * dtheta
+        return (x + linear_velocity * dt * math.cos(heading),
+                y + linear_velocity * dt * math.sin(heading),
+                new_theta)
+    radius = linear_velocity / angular_velocity
+    return (x + radius * (math.sin(new_theta) - math.sin(theta)),
+            y - radius * (math.cos(new_theta) - math.cos(theta)),
+            new_theta)
+
+
+def parse_command_schedule(parameters: Dict[str, Any]) -> List[Tuple[float, float, float]]:
+    """
+    Build a sorted list of (start_time, linear_velocity, angular_velocity)
+    segments. `commands` may be a list of dicts or a JSON string (as read from
+    the COMMANDS environment variable); without it the scalar velocity
+    parameters form a single segment. The robot is stationary before the
+    first scheduled command.
+    """
+    default_linear = float(parameters.get("linear_velocity", 1.0))
+    default_angular = float(parameters.get("angular_velocity", 0.5))
+    commands = parameters.get("commands")
+    if not commands:
+        return [(0.0, default_linear, default_angular)]
+    if isinstance(commands, str):
+        commands = json.loads(commands)
+    
+    schedule = sorted(
+        (float(command.get("time", 0.0)),
+         float(command.get("linear_velocity", default_linear)),
+         float(command.get("angular_velocity", default_angular)))
+        for command in commands
+    )
+    if schedule[0][0] > 0.0:
+        schedule.insert(0, (0.0, 0.0, 0.0))
+    return schedule
+
+
+# ---------------------------------------------------------------------------
+# Motion models
+#
+# Each model resolves its parameters once at construction into __slots__
+# attributes and exposes two kernels:
+#   step(x, y, theta, t, dt)    scalar update for a single robot (stdlib only)
+#   step_batch(state, t, dt)    in-place NumPy update of a (5, N) state array
+# step() is control() followed by advance(), so a simulator can run the
+# controller at a lower rate and hold its command between physics steps.
+# Models are selected by the `robot_model` parameter through the registry.
+# ---------------------------------------------------------------------------
+
+MOTION_MODELS: Dict[str, type] = {}
+
+# TurtleBot variants are differential-drive robots
+MOTION_MODEL_ALIASES = {
+    "turtlebot": "differential_drive", "turtlebot3": "differential_drive",
+    "turtlebot3_burger": "differential_drive", "turtlebot3_waffle": "differential_drive",
+    "burger": "differential_drive", "waffle": "differential_drive", "waffle_pi": "differential_drive",
+    "unicycle": "differential_drive", "diff_drive": "differential_drive",
+    "car": "ackermann", "omni": "holonomic", "waypoints": "waypoint_follower"
+}
+
+
+def register_motion_model(name: str):
+    """Class decorator adding a motion model to the registry under name."""
+    def decorator(cls):
+        cls.name = name
+        MOTION_MODELS[name] = cls
+        return cls
+    return decorator
+
+
+def create_motion_model(parameters: Dict[str, Any]) -> "MotionModel":
+    """Instantiate the motion model named by `robot_model` (default differential_drive)."""
+    name = str(parameters.get("robot_model") or "differential_drive").lower()
+    name = MOTION_MODEL_ALIASES.get(name, name)
+    if name not in MOTION_MODELS:
+        raise ValueError(f"Unknown robot_model '{name}', expected one of {sorted(MOTION_MODELS)}")
+    return MOTION_MODELS[name](parameters)
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Batched motion model kernels require NumPy")
+
+
+def unicycle_step_batch(state, dt: float, exact: bool, scratch=None):
+    """
+    Advance a (5, N) state array in place using its velocity rows.
+    `scratch` is an optional (2, N) work buffer. The Euler branch computes
+    the scalar update's (v * dt) * cos(theta), so it matches it exactly
+    wherever np.cos and np.sin round like math.cos and math.sin; the exact
+    branch is the vectorized counterpart of integrate_arc.
+    """
+    theta = state[THETA]
+    linear_velocity = state[LINEAR_VELOCITY]
+    angular_velocity = state[ANGULAR_VELOCITY]
+    if not exact:
+        buf, distance = scratch if scratch is not None else np.empty((2, theta.shape[0]))
+        np.multiply(angular_velocity, dt, out=buf)
+        theta += buf
+        np.multiply(linear_velocity, dt, out=distance)
+        np.cos(theta, out=buf)
+        buf *= distance
+        state[X] += buf
+        np.sin(theta, out=buf)
+        buf *= distance
+        state[Y] += buf
+        return
+
+    dtheta = angular_velocity * dt
+    new_theta = theta + dtheta
+    straight = np.abs(dtheta) < 1e-9
+    radius = linear_velocity / np.where(straight, 1.0, angular_velocity)
+    heading = theta + 0.5 * dtheta
+    distance = linear_velocity * dt
+    state[X] += np.where(straight, distance * np.cos(heading), radius * (np.sin(new_theta) - np.sin(theta)))
+    state[Y] += np.where(straight, distance * np.sin(heading), radius * (np.cos(theta) - np.cos(new_theta)))
+    state[THETA] = new_theta
+
+
+class MotionModel:
+    """
+    Base class for unicycle-type models: subclasses provide commands and the
+    shared integrator turns them into motion.
+    """
+    __slots__ = ("exact",)
+    name = ""
+
+    def __init__(self, parameters: Dict[str, Any]):
+        self.exact = str(parameters.get("integrator", "euler")).lower() == "exact"
+
+    def initial_command(self) -> Tuple[float, float]:
+        """(linear_velocity, angular_velocity) used to seed batched velocity rows."""
+        return self.command_at(0.0)
+
+    def command_at(self, t: float) -> Tuple[float, float]:
+        raise NotImplementedError
+
+    def _integrate(self, x: float, y: float, theta: float, linear_velocity: float,
+                   angular_velocity: float, dt: float) -> Tuple[float, float, float]:
+        if self.exact:
+            return integrate_arc(x, y, theta, linear_velocity, angular_velocity, dt)
+        theta += angular_velocity * dt
+        return (x + linear_velocity * dt * math.cos(theta),
+                y + linear_velocity * dt * math.sin(theta),
+                theta)
+
+    def control(self, x: float, y: float, theta: float, t: float) -> Tuple[float, ...]:
+        """Command for the current pose and time, as consumed by advance()."""
+        return self.command_at(t)
+
+    def advance(self, x: float, y: float, theta: float, command: Tuple[float, ...],
+                dt: float) -> Tuple[float, float, float]:
+        """Integrate a held command over dt."""
+        return self._integrate(x, y, theta, command[0], command[1], dt)
+
+    def step(self, x: float, y: float, theta: float, t: float, dt: float) -> Tuple[float, float, float]:
+        linear_velocity, angular_velocity = self.command_at(t)
+        return self._integrate(x, y, theta, linear_velocity, angular_velocity, dt)
+
+    def step_batch(self, state, t: float, dt: float, scratch=None):
+        raise NotImplementedError
+
+
+@register_motion_model("differential_drive")
+class DifferentialDrive(MotionModel):
+    """
+    TurtleBot-style differential drive following a (possibly scheduled)
+    linear/angular velocity command. Batched stepping uses the state's
+    velocity rows, so per-robot commands set on a swarm are respected; a
+    command schedule overwrites them whenever a new segment starts.
+    """
+    __slots__ = ("commands", "times", "linear_velocity", "angular_velocity", "_batch_segment")
+
+    def __init__(self, parameters: Dict[str, Any]):
+        super().__init__(parameters)
+        self.commands = parse_command_schedule(parameters)
+        self.times = [command[0] for command in self.commands]
+        _, self.linear_velocity, self.angular_velocity = self.commands[0]
+        self._batch_segment = 0
+
+    def segment_at(self, t: float) -> int:
+        return max(bisect.bisect_right(self.times, t) - 1, 0)
+
+    def command_at(self, t: float) -> Tuple[float, float]:
+        if len(self.commands) == 1:
+            return self.linear_velocity, self.angular_velocity
+        _, linear_velocity, angular_velocity = self.commands[self.segment_at(t)]
+        return linear_velocity, angular_velocity
+
+    def step(self, x: float, y: float, theta: float, t: float, dt: float) -> Tuple[float, float, float]:
+        if len(self.commands) == 1:
+            # Constant command: no schedule lookup on the hot path
+            return self._integrate(x, y, theta, self.linear_velocity, self.angular_velocity, dt)
+        linear_velocity, angular_velocity = self.command_at(t)
+        return self._integrate(x, y, theta, linear_velocity, angular_velocity, dt)
+
+    def step_batch(self, state, t: float, dt: float, scratch=None):
+        _require_numpy()
+        if len(self.commands) > 1:
+            segment = self.segment_at(t)
+            if segment != self._batch_segment:
+                _, state[LINEAR_VELOCITY], state[ANGULAR_VELOCITY] = self.commands[segment]
+                self._batch_segment = segment
+        unicycle_step_batch(state, dt, self.exact, scratch)
+
+
+@register_motion_model("ackermann")
+class Ackermann(MotionModel):
+    """
+    Car-like kinematic bicycle model: yaw rate = v * tan(steering) / wheelbase.
+    Parameters: linear_velocity, steering_angle (rad), wheelbase (m) and
+    max_steering_angle (rad) which clamps the steering input.
+    """
+    __slots__ = ("linear_velocity", "yaw_rate_per_speed")
+
+    def __init__(self, parameters: Dict[str, Any]):
+        super().__init__(parameters)
+        wheelbase = float(parameters.get("wheelbase", 0.3))
+        if wheelbase <= 0:
+            raise ValueError("wheelbase must be positive")
+        max_steering = abs(float(parameters.get("max_steering_angle", 0.6)))
+        steering = max(-max_steering, min(max_steering, float(parameters.get("steering_angle", 0.0))))
+        self.linear_velocity = float(parameters.get("linear_velocity", 1.0))
+        self.yaw_rate_per_speed = math.tan(steering) / wheelbase
+
+    def command_at(self, t: float) -> Tuple[float, float]:
+        return self.linear_velocity, self.linear_velocity * self.yaw_rate_per_speed
+
+    def step(self, x: float, y: float, theta: float, t: float, dt: float) -> Tuple[float, float, float]:
+        velocity = self.linear_velocity
+        return self._integrate(x, y, theta, velocity, velocity * self.yaw_rate_per_speed, dt)
+
+    def step_batch(self, state, t: float, dt: float, scratch=None):
+        _require_numpy()
+        # Steering geometry couples yaw rate to each robot's own speed
+        np.multiply(state[LINEAR_VELOCITY], self.yaw_rate_per_speed, out=state[ANGULAR_VELOCITY])
+        unicycle_step_batch(state, dt, self.exact, scratch)
+
+
+@register_motion_model("holonomic")
+class Holonomic(MotionModel):
+    """
+    Omnidirectional base with body-frame velocities: forward (linear_velocity),
+    lateral (lateral_velocity) and angular_velocity. The exact integrator
+    rotates the body velocity in closed form along the turn.
+    """
+    __slots__ = ("linear_velocity", "lateral_velocity", "angular_velocity")
+
+    def __init__(self, parameters: Dict[str, Any]):
+        super().__init__(parameters)
+        self.linear_velocity = float(parameters.get("linear_velocity", 1.0))
+        self.lateral_velocity = float(parameters.get("lateral_velocity", 0.0))
+        self.angular_velocity = float(parameters.get("angular_velocity", 0.5))
+
+    def command_at(self, t: float) -> Tuple[float, float]:
+        return self.linear_velocity, self.angular_velocity
+
+    def control(self, x: float, y: float, theta: float, t: float) -> Tuple[float, ...]:
+        return self.linear_velocity, self.angular_velocity, self.lateral_velocity
+
+    def step(self, x: float, y: float, theta: float, t: float, dt: float) -> Tuple[float, float, float]:
+        return self.advance(x, y, theta, (self.linear_velocity, self.angular_velocity, self.lateral_velocity), dt)
+
+    def advance(self, x: float, y: float, theta: float, command: Tuple[float, ...],
+                dt: float) -> Tuple[float, float, float]:
+        forward, turn, lateral = command
+        if not self.exact:
+            theta += turn * dt
+            cos_theta, sin_theta = math.cos(theta), math.sin(theta)
+            return (x + (forward * cos_theta - lateral * sin_theta) * dt,
+                    y + (forward * sin_theta + lateral * cos_theta) * dt,
+                    theta)
+        dtheta = turn * dt
+        new_theta = theta + dtheta
+        # Integrals of cos(theta(t)) and sin(theta(t)) over the step
+        if abs(dtheta) < 1e-9:
+            heading = theta + 0.5 * dtheta
+            int_cos, int_sin = dt * math.cos(heading), dt * math.sin(heading)
+        else:
+            int_cos = (math.sin(new_theta) - math.sin(theta)) / turn
+            int_sin = (math.cos(theta) - math.cos(new_theta)) / turn
+        return (x + forward * int_cos - lateral * int_sin,
+                y + forward * int_sin + lateral * int_cos,
+                new_theta)
+
+    def step_batch(self, state, t: float, dt: float, scratch=None):
+        _require_numpy()
+        theta = state[THETA]
+        forward = state[LINEAR_VELOCITY]
+        turn = state[ANGULAR_VELOCITY]
+        lateral = self.lateral_velocity
+        if not self.exact:
+            theta += turn * dt
+            cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+            state[X] += (forward * cos_theta - lateral * sin_theta) * dt
+            state[Y] += (forward * sin_theta + lateral * cos_theta) * dt
+            return
+        dtheta = turn * dt
+        new_theta = theta + dtheta
+        straight = np.abs(dtheta) < 1e-9
+        safe_turn = np.where(straight, 1.0, turn)
+        heading = theta + 0.5 * dtheta
+        int_cos = np.where(straight, dt * np.cos(heading), (np.sin(new_theta) - np.sin(theta)) / safe_turn)
+        int_sin = np.where(straight, dt * np.sin(heading), (np.cos(theta) - np.cos(new_theta)) / safe_turn)
+        state[X] += forward * int_cos - lateral * int_sin
+        state[Y] += forward * int_sin + lateral * int_cos
+        state[THETA] = new_theta
+
+
+@register_motion_model("waypoint_follower")
+class WaypointFollower(MotionModel):
+    """
+    Differential-drive robot steering towards a list of waypoints with a
+    proportional heading controller. Parameters: waypoints (list of [x, y]
+    or a JSON string), linear_velocity (cruise speed), heading_gain,
+    max_angular_velocity, waypoint_tolerance and loop_waypoints. Speed scales
+    with cos(heading error) so the robot turns in place for targets behind it.
+    """
+    __slots__ = ("waypoints", "cruise", "gain", "max_turn", "tolerance", "loop",
+                 "index", "_batch_index", "_batch_waypoints")
+
+    def __init__(self, parameters: Dict[str, Any]):
+        super().__init__(parameters)
+        waypoints = parameters.get("waypoints") or []
+        if isinstance(waypoints, str):
+            waypoints = json.loads(waypoints)
+        self.waypoints = [(float(point[0]), float(point[1])) for point in waypoints]
+        self.cruise = float(parameters.get("linear_velocity", 1.0))
+        self.gain = float(parameters.get("heading_gain", 2.0))
+        self.max_turn = float(parameters.get("max_angular_velocity", 1.5))
+        self.tolerance = float(parameters.get("waypoint_tolerance", 0.1))
+        self.loop = is_enabled(parameters.get("loop_waypoints", False))
+        self.index = 0
+        self._batch_index = None
+        self._batch_waypoints = None
+
+    def initial_command(self) -> Tuple[float, float]:
+        return 0.0, 0.0
+
+    def command_at(self, t: float) -> Tuple[float, float]:
+        # Commands depend on the pose, not on time; see step()
+        return 0.0, 0.0
+
+    def _next_target(self, x: float, y: float) -> Optional[Tuple[float, float]]:
+        while self.index < len(self.waypoints):
+            target_x, target_y = self.waypoints[self.index]
+            if math.hypot(target_x - x, target_y - y) > self.tolerance:
+                return target_x, target_y
+            self.index += 1
+            if self.loop and self.index == len(self.waypoints):
+                self.index = 0
+        return None
+
+    def control(self, x: float, y: float, theta: float, t: float) -> Tuple[float, ...]:
+        target = self._next_target(x, y)
+        if target is None:
+            return 0.0, 0.0
+        error = math.atan2(target[1] - y, target[0] - x) - theta
+        error = math.atan2(math.sin(error), math.cos(error))
+        turn = max(-self.max_turn, min(self.max_turn, self.gain * error))
+        return self.cruise * max(0.0, math.cos(error)), turn
+
+    def step(self, x: float, y: float, theta: float, t: float, dt: float) -> Tuple[float, float, float]:
+        if self._next_target(x, y) is None:
+            return x, y, theta
+        speed, turn = self.control(x, y, theta, t)
+        return self._integrate(x, y, theta, speed, turn, dt)
+
+    def step_batch(self, state, t: float, dt: float, scratch=None):
+        _require_numpy()
+        count = state.shape[1]
+        if not self.waypoints:
+            state[LINEAR_VELOCITY] = 0.0
+            state[ANGULAR_VELOCITY] = 0.0
+            return
+        if self._batch_index is None or len(self._batch_index) != count:
+            self._batch_index = np.zeros(count, dtype=np.int64)
+            self._batch_waypoints = np.array(self.waypoints, dtype=np.float64)
+        index = self._batch_index
+        waypoints = self._batch_waypoints
+        total = len(waypoints)
+
+        # Advance robots that reached their target; at most one waypoint per step
+        active = index < total
+        target = waypoints[np.minimum(index, total - 1)]
+        reached = active & (np.hypot(target[:, 0] - state[X], target[:, 1] - state[Y]) <= self.tolerance)
+        index += reached
+        if self.loop:
+            index %= total
+        active = index < total
+        target = waypoints[np.minimum(index, total - 1)]
+
+        error = np.arctan2(target[:, 1] - state[Y], target[:, 0] - state[X]) - state[THETA]
+        error = np.arctan2(np.sin(error), np.cos(error))
+        state[ANGULAR_VELOCITY] = np.where(active, np.clip(self.gain * error, -self.max_turn, self.max_turn), 0.0)
+        state[LINEAR_VELOCITY] = np.where(active, self.cruise * np.maximum(0.0, np.cos(error)), 0.0)
+        unicycle_step_batch(state, dt, self.exact, scratch)
 
 
 def cos_approximation(angle: float) -> float:
@@ -108,18 +944,29 @@ def sin_approximation(angle: float) -> float:
     return math.sin(angle)
 
 
-def load_parameters() -> Dict[str, Any]:
-    """Load simulation parameters from environment variables."""
+# Parameters read from (upper-cased) environment variables
+PARAMETER_NAMES = [
+    "max_time", "angular_velocity", "linear_velocity",
+    "simulation_mode", "robot_model", "environment",
+    "sync_mode", "real_time_factor", "max_steps",
+    "num_robots", "spawn_spacing", "neighbor_radius", "robot_radius", "swarm_processes",
+    "dt", "integrator", "commands",
+    "trajectory_dir", "world_file", "profile",
+    "control_rate", "record_rate", "log_interval",
+    "lidar_beams", "lidar_range", "lidar_fov", "lidar_noise", "lidar_rate", "lidar_seed",
+    "wheelbase", "steering_angle", "max_steering_angle", "lateral_velocity",
+    "waypoints", "heading_gain", "max_angular_velocity", "waypoint_tolerance", "loop_waypoints"
+]
+
+
+def load_parameters(environ: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Load simulation parameters from environment variables (os.environ by default)."""
+    environ = os.environ if environ is None else environ
     parameters = {}
     
     # Read common simulation parameters
-    env_vars = [
-        "max_time", "angular_velocity", "linear_velocity",
-        "simulation_mode", "robot_model", "environment"
-    ]
-    
-    for var in env_vars:
-        value = os.environ.get(var.upper())
+    for var in PARAMETER_NAMES:
+        value = environ.get(var.upper())
         if value:
             # Try to convert to appropriate type
             try:
@@ -133,6 +980,67 @@ def load_parameters() -> Dict[str, Any]:
     return parameters
 
 
+def create_recorder(parameters: Dict[str, Any], num_robots: int = 1):
+    """
+    Create a TrajectoryRecorder when `trajectory_dir` is set.
+    The recorder needs NumPy and the simulation package, so it is skipped with
+    a warning where those are unavailable (e.g. the bare simulation container).
+    """
+    directory = parameters.get("trajectory_dir")
+    if not directory:
+        return None
+    try:
+        from simulation.recorder import TrajectoryRecorder
+    except ImportError as e:
+        logger.warning(f"Trajectory recording unavailable: {e}")
+        return None
+    return TrajectoryRecorder(str(directory), num_robots=num_robots)
+
+
+def create_world(parameters: Dict[str, Any]):
+    """
+    Load the static obstacle index for `world_file`, if set.
+    Like the recorder this needs NumPy and the simulation package.
+    """
+    world_file = parameters.get("world_file")
+    if not world_file:
+        return None
+    try:
+        from simulation.world import load_world
+    except ImportError as e:
+        logger.warning(f"World collision checks unavailable: {e}")
+        return None
+    return load_world(str(world_file))
+
+
+def create_lidar(parameters: Dict[str, Any]):
+    """Build the simulated planar lidar when `lidar_beams` is set (needs NumPy)."""
+    beams = parameters.get("lidar_beams")
+    if not beams:
+        return None
+    try:
+        from simulation.lidar import PlanarLidar
+    except ImportError as e:
+        logger.warning(f"Lidar simulation unavailable: {e}")
+        return None
+    seed = parameters.get("lidar_seed")
+    return PlanarLidar(
+        beams=int(beams),
+        max_range=float(parameters.get("lidar_range", 3.5)),
+        fov=float(parameters.get("lidar_fov", 2 * math.pi)),
+        noise=float(parameters.get("lidar_noise", 0.0)),
+        seed=int(seed) if seed is not None else None
+    )
+
+
+def lidar_summary(lidar, scan, scan_count: int) -> Dict[str, Any]:
+    """Results entry describing the lidar and its most recent scan."""
+    summary = {"beams": lidar.beams, "max_range": lidar.max_range, "scans": scan_count}
+    if scan is not None:
+        summary["closest_range"] = float(scan.min())
+    return summary
+
+
 def run():
     """
     Main entry point function.
@@ -147,7 +1055,10 @@ def run():
     
     # Create simulator instance and run
     # CORRECT pattern: Create instance, then call method
-    simulator = TurtleBotSimulator(parameters)
+    simulator = TurtleBotSimulator(
+        parameters, recorder=create_recorder(parameters), world=create_world(parameters),
+        lidar=create_lidar(parameters)
+    )
     simulator.run()  # ✅ This is correct: instance.run()
     
     logger.info("TurtleBot simulation script completed")
@@ -0,0 +1,228 @@
+"""
+Spatial Index
+Uniform-grid (spatial hash) index for batched robot neighbor and collision queries.
+
+Robots are bucketed into square cells and kept sorted by cell key, giving a
+CSR-style layout: every occupied cell owns a contiguous run of robot indices.
+Queries for all robots at once expand each robot's surrounding cells into
+candidate pairs with a few vectorized NumPy operations, instead of the
+O(N^2) all-pairs distance matrix.
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Cell coordinates are clipped to this range so the packed int64 keys never overflow
+_CELL_LIMIT = 2 ** 30
+
+
+def _cell_keys(cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+    """Pack integer cell coordinates into sortable int64 keys."""
+    return cx * (2 ** 32) + cy
+
+
+class UniformGridIndex:
+    """
+    Uniform grid over robot positions.
+    Call build() once, then update() every tick; update() skips the re-sort
+    when no robot changed cell and otherwise re-sorts from the previous order,
+    which is nearly sorted and therefore cheap.
+    """
+
+    def __init__(self, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = float(cell_size)
+        self.x = self.y = None
+        self.cx = self.cy = None
+        self.keys = None
+        self.order = None
+        self.cell_keys = None
+        self.cell_start = None
+        self.cell_count = None
+
+    def __len__(self) -> int:
+        return 0 if self.keys is None else len(self.keys)
+
+    def _cells(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        cx = np.clip(np.floor(x / self.cell_size), -_CELL_LIMIT, _CELL_LIMIT).astype(np.int64)
+        cy = np.clip(np.floor(y / self.cell_size), -_CELL_LIMIT, _CELL_LIMIT).astype(np.int64)
+        return cx, cy
+
+    def build(self, x, y):
+        """Index positions from scratch."""
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.cx, self.cy = self._cells(self.x, self.y)
+        self.keys = _cell_keys(self.cx, self.cy)
+        self.order = np.argsort(self.keys, kind="stable")
+        self._index_cells()
+
+    def update(self, x, y):
+        """Refresh the index for new positions of the same robots."""
+        if self.keys is None or len(self.keys) != len(x):
+            self.build(x, y)
+            return
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        cx, cy = self._cells(self.x, self.y)
+        keys = _cell_keys(cx, cy)
+        if np.array_equal(keys, self.keys):
+            return
+        self.cx, self.cy, self.keys = cx, cy, keys
+        # Robots rarely change cell between ticks, so the old order is almost sorted
+        self.order = self.order[np.argsort(keys[self.order], kind="stable")]
+        self._index_cells()
+
+    def _index_cells(self):
+        sorted_keys = self.keys[self.order]
+        self.cell_keys, self.cell_start, self.cell_count = np.unique(
+            sorted_keys, return_index=True, return_counts=True
+        )
+
+    def candidates(self, reach: int = 1, robots: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (i, j) index arrays of every robot j in the (2 * reach + 1)^2
+        cells around robot i, for each query robot i (default: all), i != j.
+        """
+        # Querying in cell order keeps the searchsorted lookups cache-friendly
+        if robots is None:
+            robots = self.order
+        else:
+            robots = robots[np.argsort(self.keys[robots], kind="stable")]
+        pair_i, pair_j = [], []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                query = _cell_keys(self.cx[robots] + dx, self.cy[robots] + dy)
+                pos = np.minimum(np.searchsorted(self.cell_keys, query), len(self.cell_keys) - 1)
+                found = self.cell_keys[pos] == query
+                start = self.cell_start[pos[found]]
+                count = self.cell_count[pos[found]]
+                total = int(count.sum())
+                if total == 0:
+                    continue
+                # Expand each (robot, cell) match into one entry per robot in that cell
+                within = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+                pair_i.append(np.repeat(robots[found], count))
+                pair_j.append(self.order[np.repeat(start, count) + within])
+        if not pair_i:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        i = np.concatenate(pair_i)
+        j = np.concatenate(pair_j)
+        distinct = i != j
+        return i[distinct], j[distinct]
+
+    def _distance_sq(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        dx = self.x[j] - self.x[i]
+        dy = self.y[j] - self.y[i]
+        return dx * dx + dy * dy
+
+    def query_pairs(self, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """All unordered pairs (i < j) closer than radius, with their distances."""
+        reach = max(1, math.ceil(radius / self.cell_size))
+        i, j = self.candidates(reach)
+        keep = i < j
+        i, j = i[keep], j[keep]
+        distance_sq = self._distance_sq(i, j)
+        close = distance_sq <= radius * radius
+        return i[close], j[close], np.sqrt(distance_sq[close])
+
+    def query_radius(self, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Neighbors within radius of every robot, in CSR form: the neighbors of
+        robot i are indices[offsets[i]:offsets[i + 1]].
+        """
+        i, j, _ = self.query_pairs(radius)
+        source = np.concatenate([i, j])
+        target = np.concatenate([j, i])
+        order = np.argsort(source, kind="stable")
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(source, minlength=len(self)), out=offsets[1:])
+        return offsets, target[order]
+
+    def query_knn(self, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The k nearest other robots of every robot, as (N, k) index and distance
+        arrays sorted by distance. Missing neighbors (k >= N) are -1 / inf.
+        """
+        n = len(self)
+        indices = np.full((n, k), -1, dtype=np.int64)
+        distances = np.full((n, k), np.inf)
+        if n < 2 or k < 1:
+            return indices, distances
+
+        span_x = int(self.cx.max() - self.cx.min()) + 1
+        span_y = int(self.cy.max() - self.cy.min()) + 1
+        span = max(span_x, span_y)
+        # Start with a square expected to hold about 2k robots at the average density
+        robots_per_cell = n / (span_x * span_y)
+        reach = max(1, math.ceil(0.5 * math.sqrt(2.0 * k / robots_per_cell)))
+        pending = np.arange(n)
+        while len(pending):
+            i, j = self.candidates(reach, pending)
+            distance = np.sqrt(self._distance_sq(i, j))
+            order = np.lexsort((distance, i))
+            i, j, distance = i[order], j[order], distance[order]
+            counts = np.bincount(i, minlength=n)[pending]
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            rank = np.arange(len(i)) - np.repeat(starts, counts)
+
+            # The searched square only guarantees completeness within reach cells
+            kth = np.full(len(pending), np.inf)
+            has_k = counts >= k
+            kth[has_k] = distance[starts[has_k] + k - 1]
+            done = (kth <= reach * self.cell_size) | (reach >= span)
+
+            take = (rank < k) & np.repeat(done, counts)
+            indices[i[take], rank[take]] = j[take]
+            distances[i[take], rank[take]] = distance[take]
+            pending = pending[~done]
+            reach *= 2
+        return indices, distances
+
+
+def swept_circle_collisions(x0, y0, x1, y1, radius) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Detect robots whose circles touch while moving linearly from (x0, y0) to
+    (x1, y1) during one tick. `radius` is a scalar or per-robot array.
+    Returns (i, j, t) with i < j and t in [0, 1] the earliest contact fraction
+    of the tick, sorted by t.
+    """
+    x0, y0 = np.asarray(x0, dtype=np.float64), np.asarray(y0, dtype=np.float64)
+    x1, y1 = np.asarray(x1, dtype=np.float64), np.asarray(y1, dtype=np.float64)
+    radius = np.broadcast_to(np.asarray(radius, dtype=np.float64), x0.shape)
+    empty = np.empty(0, dtype=np.int64)
+    if len(x0) < 2:
+        return empty, empty, np.empty(0)
+
+    # Two robots can only meet if their start points are within this reach
+    displacement = np.hypot(x1 - x0, y1 - y0)
+    reach = 2.0 * float(radius.max()) + 2.0 * float(displacement.max())
+    index = UniformGridIndex(max(reach, 1e-9))
+    index.build(x0, y0)
+    i, j = index.candidates(1)
+    keep = i < j
+    i, j = i[keep], j[keep]
+
+    # Relative motion d(t) = d0 + t * dv; contact when |d(t)| <= r_i + r_j
+    d0x, d0y = x0[j] - x0[i], y0[j] - y0[i]
+    dvx = (x1[j] - x1[i]) - d0x
+    dvy = (y1[j] - y1[i]) - d0y
+    contact = radius[i] + radius[j]
+    a = dvx * dvx + dvy * dvy
+    b = 2.0 * (d0x * dvx + d0y * dvy)
+    c = d0x * d0x + d0y * d0y - contact * contact
+
+    t = np.full(len(i), np.inf)
+    t[c <= 0.0] = 0.0
+    moving = (c > 0.0) & (a > 0.0)
+    discriminant = b * b - 4.0 * a * c
+    solvable = moving & (discriminant >= 0.0)
+    t[solvable] = (-b[solvable] - np.sqrt(discriminant[solvable])) / (2.0 * a[solvable])
+
+    hit = (t >= 0.0) & (t <= 1.0)
+    order = np.argsort(t[hit], kind="stable")
+    return i[hit][order], j[hit][order], t[hit][order]
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Swarm Simulation Engine
+Vectorized NumPy counterpart of TurtleBotSimulator for many robots at once.
+"""
+
+import sys
+import math
+import logging
+from typing import Dict, Any, Callable, Optional
+
+import numpy as np
+
+from simulation.simulation import (
+    X, Y, THETA, LINEAR_VELOCITY, ANGULAR_VELOCITY,
+    PhaseProfiler, RateScheduler, StepPacer, create_lidar, create_motion_model, create_recorder, create_world,
+    is_enabled, lidar_summary, load_parameters, write_results
+)
+from simulation.spatial import UniformGridIndex, swept_circle_collisions
+
+logger = logging.getLogger(__name__)
+
+
+class SwarmSimulator:
+    """
+    Simulates N robots with the same motion model as TurtleBotSimulator,
+    stepped through the model's batched kernel.
+
+    All robot state lives in one contiguous (5, N) float64 array so a step is a
+    handful of in-place NumPy operations regardless of the swarm size.
+    """
+
+    def __init__(self, parameters: Dict[str, Any] = None, num_robots: Optional[int] = None,
+                 step_gate: Optional[Callable[[], bool]] = None, recorder=None, world=None, lidar=None):
+        self.parameters = parameters or {}
+        self.num_robots = int(num_robots if num_robots is not None else self.parameters.get("num_robots", 1))
+        if self.num_robots < 1:
+            raise ValueError("num_robots must be at least 1")
+        self.simulation_time = 0.0
+        self.max_simulation_time = float(self.parameters.get("max_time", 30.0))
+        self.sync_mode = str(self.parameters.get("sync_mode", "realtime")).lower()
+        self.real_time_factor = float(self.parameters.get("real_time_factor", 1.0))
+        max_steps = self.parameters.get("max_steps")
+        self.max_steps = int(max_steps) if max_steps is not None else None
+        self.step_gate = step_gate
+        self.recorder = recorder
+        self.world = world
+        self.lidar = lidar
+        self.scan = None
+        self.scan_count = 0
+        self.profiler = PhaseProfiler() if is_enabled(self.parameters.get("profile")) else None
+        self.dt = float(self.parameters.get("dt", 0.1))
+        self.integrator = str(self.parameters.get("integrator", "euler")).lower()
+        if self.integrator not in ("euler", "exact"):
+            raise ValueError(f"SwarmSimulator supports 'euler' and 'exact' integrators, got '{self.integrator}'")
+        self.motion_model = create_motion_model(self.parameters)
+
+        # Optional neighbor index and robot-robot collision detection
+        neighbor_radius = self.parameters.get("neighbor_radius")
+        robot_radius = self.parameters.get("robot_radius")
+        self.neighbor_radius = float(neighbor_radius) if neighbor_radius is not None else None
+        self.robot_radius = float(robot_radius) if robot_radius is not None else None
+
+        # With swarm_processes > 1 the state lives in shared memory stepped by a worker pool
+        self.stepper = None
+        processes = int(self.parameters.get("swarm_processes") or 1)
+        if processes > 1:
+            from simulation.parallel import SharedMemoryStepper
+            self.stepper = SharedMemoryStepper(self.parameters, self.num_robots, processes, self.neighbor_radius)
+            self.state = self.stepper.state
+        else:
+            self.state = np.zeros((5, self.num_robots), dtype=np.float64)
+        self.x, self.y, self.theta = self.state[X], self.state[Y], self.state[THETA]
+        self.linear_velocity = self.state[LINEAR_VELOCITY]
+        self.angular_velocity = self.state[ANGULAR_VELOCITY]
+        self._scratch = np.empty((2, self.num_robots), dtype=np.float64)
+
+        self._spawn(float(self.parameters.get("spawn_spacing", 1.0)))
+        self.set_velocities(*self.motion_model.initial_command())
+
+        self.collision_count = 0
+        self.obstacle_collision_count = 0
+        self.spatial_index = None
+        self.scheduler = RateScheduler(self.dt, self.profiler)
+        self._register_tasks()
+        # Sharded workers count neighbors themselves; the full index is built on demand
+        if self.neighbor_radius and self.stepper is None:
+            self.spatial_index = UniformGridIndex(self.neighbor_radius)
+            self.spatial_index.build(self.x, self.y)
+
+    def _register_tasks(self):
+        """Register the physics, sensing, persistence and logging tasks of run()."""
+        dt = self.dt
+        record_rate = self.parameters.get("record_rate")
+        log_interval = float(self.parameters.get("log_interval", 5.0))
+        self.scheduler.add("physics", lambda step: self.step(dt), order=10, profile=False)
+        if self.lidar is not None:
+            self.scheduler.add("sensing", lambda step: self.sense(),
+                               float(self.parameters.get("lidar_rate", 10.0)), order=20)
+        if self.recorder is not None:
+            self.scheduler.add("persistence", lambda step: self.record_state((step + 1) * dt),
+                               float(record_rate) if record_rate else None, order=30)
+        if log_interval > 0:
+            self.scheduler.add("logging", self._log_task, 1.0 / log_interval, order=40)
+
+    def _log_task(self, step: int):
+        logger.info(
+            f"Simulation time: {self.simulation_time:.1f}s, "
+            f"Centroid: ({self.x.mean():.3f}, {self.y.mean():.3f})"
+        )
+
+    def _spawn(self, spacing: float):
+        """Place robots on a square grid starting at the origin."""
+        side = math.ceil(math.sqrt(self.num_robots))
+        index = np.arange(self.num_robots)
+        self.x[:] = (index % side) * spacing
+        self.y[:] = (index // side) * spacing
+        self.theta[:] = 0.0
+
+    def set_velocities(self, linear_velocity, angular_velocity):
+        """Set per-robot commands; scalars are broadcast to the whole swarm."""
+        self.linear_velocity[:] = linear_velocity
+        self.angular_velocity[:] = angular_velocity
+
+    def step(self, dt: float):
+        """Advance every robot by dt, then refresh the neighbor index and collisions."""
+        profiler = self.profiler
+        if profiler:
+            lap = profiler.clock()
+        if self.robot_radius or self.world is not None:
+            start_x, start_y = self.x.copy(), self.y.copy()
+        if self.world is not None:
+            start_theta = self.theta.copy()
+        self._integrate(dt)
+        if profiler:
+            lap = profiler.lap("step", lap)
+        if self.world is not None:
+            # Robots that would enter a static obstacle keep their whole previous pose
+            blocked = self.world.collides_batch(self.x, self.y, self.robot_radius or 0.1)
+            self.x[blocked] = start_x[blocked]
+            self.y[blocked] = start_y[blocked]
+            self.theta[blocked] = start_theta[blocked]
+            self.obstacle_collision_count += int(blocked.sum())
+        if self.spatial_index is not None:
+            self.spatial_index.update(self.x, self.y)
+        if self.robot_radius:
+            hits, _, _ = swept_circle_collisions(start_x, start_y, self.x, self.y, self.robot_radius)
+            self.collision_count += len(hits)
+        if profiler and (self.world is not None or self.spatial_index is not None or self.robot_radius):
+            profiler.lap("collision", lap)
+
+    def sense(self):
+        """Scan every robot's lidar at once; other robots appear as discs of robot_radius."""
+        self.scan = self.lidar.scan(self.x, self.y, self.theta, self.world, self.robot_radius or 0.1)
+        self.scan_count += 1
+        return self.scan
+
+    def neighbors(self):
+        """CSR (offsets, indices) of robots within neighbor_radius of each robot."""
+        if not self.neighbor_radius:
+            raise ValueError("neighbor_radius is not configured for this swarm")
+        if self.spatial_index is None:
+            index = UniformGridIndex(self.neighbor_radius)
+            index.build(self.x, self.y)
+            return index.query_radius(self.neighbor_radius)
+        return self.spatial_index.query_radius(self.neighbor_radius)
+
+    def neighbor_counts(self) -> np.ndarray:
+        """Number of robots within neighbor_radius of each robot."""
+        if self.stepper is not None and self.stepper.neighbor_counts is not None:
+            return self.stepper.neighbor_counts.astype(np.int64)
+        offsets, _ = self.neighbors()
+        return np.diff(offsets)
+
+    def _integrate(self, dt: float):
+        """Advance every robot by dt with the motion model's batched kernel."""
+        if self.stepper is not None:
+            self.stepper.step(self.simulation_time, dt)
+            return
+        self.motion_model.step_batch(self.state, self.simulation_time, dt, self._scratch)
+
+    def close(self):
+        """Release the recorder and any worker pool; the state is copied out of shared memory."""
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.stepper is not None:
+            self.state = self.state.copy()
+            self.x, self.y, self.theta = self.state[X], self.state[Y], self.state[THETA]
+            self.linear_velocity = self.state[LINEAR_VELOCITY]
+            self.angular_velocity = self.state[ANGULAR_VELOCITY]
+            self.stepper.close()
+            self.stepper = None
+
+    def run(self):
+        """Main swarm simulation loop, paced like TurtleBotSimulator.run."""
+        logger.info(f"Starting swarm simulation with {self.num_robots} robots...")
+
+        try:
+            dt = self.dt  # 10 Hz simulation by default
+            steps = int(self.max_simulation_time / dt)
+            if self.max_steps is not None:
+                steps = min(steps, self.max_steps)
+            pacer = StepPacer(dt, self.real_time_factor, self.sync_mode, self.step_gate)
+            self.record_state(0.0)
+            profiler = self.profiler
+            tick = self.scheduler.tick
+
+            for step in range(steps):
+                if profiler:
+                    lap = profiler.clock()
+                if not pacer.wait(step):
+                    logger.info("Step gate closed, stopping simulation")
+                    break
+                if profiler:
+                    profiler.lap("pacing", lap)
+                self.simulation_time = step * dt
+                # Physics, persistence and logging at their own rates
+                tick(step)
+
+            logger.info("Swarm simulation completed successfully")
+            self.save_results()
+
+        except KeyboardInterrupt:
+            logger.info("Simulation interrupted by user")
+        except Exception as e:
+            logger.error(f"Simulation error: {e}")
+            sys.exit(1)
+        finally:
+            self.close()
+
+    def record_state(self, t: float):
+        """Append the whole swarm's pose to the trajectory recorder, if one is attached."""
+        if self.recorder is not None:
+            self.recorder.append(t, self.x, self.y, self.theta)
+
+    def positions(self):
+        """Return final poses as a list of position dicts, one per robot."""
+        return [
+            {"x": x, "y": y, "theta": theta}
+            for x, y, theta in zip(self.x.tolist(), self.y.tolist(), self.theta.tolist())
+        ]
+
+    def results(self) -> Dict[str, Any]:
+        """Final-state document in the same shape as TurtleBotSimulator.save_results."""
+        positions = self.positions()
+        results = {
+            "final_position": positions[0],
+            "final_positions": positions,
+            "num_robots": self.num_robots,
+            "simulation_time": self.simulation_time,
+            "parameters": self.parameters,
+            "status": "completed"
+        }
+        if self.robot_radius:
+            results["collisions"] = self.collision_count
+        if self.world is not None:
+            results["obstacle_collisions"] = self.obstacle_collision_count
+        if self.lidar is not None:
+            results["lidar"] = lidar_summary(self.lidar, self.scan, self.scan_count)
+        if self.profiler:
+            results["profile"] = self.profiler.summary()
+        return results
+
+    def save_results(self):
+        """Save swarm simulation results."""
+        write_results(self.results())
+
+
+def run():
+    """Entry point: load parameters from environment and run a swarm."""
+    logger.info("Swarm simulation starting...")
+    parameters = load_parameters()
+    num_robots = int(parameters.get("num_robots", 1))
+    simulator = SwarmSimulator(
+        parameters, recorder=create_recorder(parameters, num_robots), world=create_world(parameters),
+        lidar=create_lidar(parameters)
+    )
+    simulator.run()
+    logger.info("Swarm simulation completed")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,149 @@
+"""
+Parameter Sweep Engine
+Evaluates many simulation parameter sets in one worker.
+
+Points whose motion model allows it are batched into a single SwarmSimulator,
+one robot per parameter set, and stepped together by the vectorized kernel.
+Everything else (command schedules, the event integrator, other motion
+models) fans out across a
+process pool of headless TurtleBotSimulator runs. Every point obeys the
+in-process scenario limits on simulated time and step count, and pool workers
+are started with forkserver (or spawn), never forked from the server.
+"""
+
+import os
+import logging
+import itertools
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from simulation.inprocess import MAX_SCENARIO_STEPS, MAX_SCENARIO_TIME
+from simulation.simulation import TurtleBotSimulator, create_motion_model
+from simulation.swarm import SwarmSimulator
+
+logger = logging.getLogger(__name__)
+
+RESULT_COLUMNS = ["x", "y", "theta", "simulation_time"]
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Cartesian product of a parameter grid, in key order."""
+    if not grid:
+        return []
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def _limit(parameters: Dict[str, Any], max_time: float, max_steps: int) -> Dict[str, Any]:
+    """Apply the scenario limits: reject runs past `max_time`, cap the step count at `max_steps`."""
+    if float(parameters.get("max_time", 30.0)) > max_time:
+        raise ValueError(f"max_time of sweep points is limited to {max_time:g} seconds")
+    parameters["max_steps"] = min(int(parameters.get("max_steps", max_steps)), max_steps)
+    return parameters
+
+
+def _is_vectorizable(parameters: Dict[str, Any]) -> bool:
+    """Constant differential-drive commands with a fixed-step integrator can share one swarm kernel."""
+    integrator = str(parameters.get("integrator", "euler")).lower()
+    model = create_motion_model(parameters)
+    return not parameters.get("commands") and integrator in ("euler", "exact") and model.name == "differential_drive"
+
+
+def _group_key(parameters: Dict[str, Any]) -> Tuple:
+    """Points sharing a key run in the same swarm (same step size and count)."""
+    max_steps = parameters.get("max_steps")
+    return (
+        float(parameters.get("max_time", 30.0)),
+        float(parameters.get("dt", 0.1)),
+        str(parameters.get("integrator", "euler")).lower(),
+        int(max_steps) if max_steps is not None else None
+    )
+
+
+def _run_vectorized(points: List[Dict[str, Any]]) -> List[List[float]]:
+    """Run points sharing a group key as one swarm, one robot per point."""
+    max_time, dt, integrator, max_steps = _group_key(points[0])
+    swarm = SwarmSimulator(
+        {"max_time": max_time, "dt": dt, "integrator": integrator, "spawn_spacing": 0.0},
+        num_robots=len(points)
+    )
+    swarm.set_velocities(
+        np.array([float(p.get("linear_velocity", 1.0)) for p in points]),
+        np.array([float(p.get("angular_velocity", 0.5)) for p in points])
+    )
+    # Same step count and final time bookkeeping as TurtleBotSimulator.frames()
+    steps = int(max_time / dt)
+    if max_steps is not None:
+        steps = min(steps, max_steps)
+    for _ in range(steps):
+        swarm.step(dt)
+    simulation_time = (steps - 1) * dt if steps > 0 else 0.0
+    return [
+        [x, y, theta, simulation_time]
+        for x, y, theta in zip(swarm.x.tolist(), swarm.y.tolist(), swarm.theta.tolist())
+    ]
+
+
+def _run_single(parameters: Dict[str, Any]) -> List[float]:
+    """Run one headless TurtleBotSimulator; executed in pool workers."""
+    simulator = TurtleBotSimulator(dict(parameters, sync_mode="fast"))
+    for _ in simulator.frames():
+        pass
+    position = simulator.position
+    return [position["x"], position["y"], position["theta"], simulator.simulation_time]
+
+
+def run_sweep(points: List[Dict[str, Any]], base_parameters: Optional[Dict[str, Any]] = None,
+              processes: Optional[int] = None, max_time: float = MAX_SCENARIO_TIME,
+              max_steps: int = MAX_SCENARIO_STEPS) -> Dict[str, Any]:
+    """
+    Evaluate every point (merged over base_parameters) and return a compact
+    table: `columns` lists the swept parameter names followed by the result
+    columns, and `rows` holds one row per point in input order.
+    processes=0 runs non-vectorizable points serially in this process.
+    Raises ValueError when a point runs longer than `max_time` simulated
+    seconds; step counts are capped at `max_steps`.
+    """
+    base_parameters = base_parameters or {}
+    merged = [_limit({**base_parameters, **point}, max_time, max_steps) for point in points]
+    swept_keys = list(dict.fromkeys(key for point in points for key in point))
+    results: List[Optional[List[float]]] = [None] * len(merged)
+
+    groups = defaultdict(list)
+    pooled = []
+    for index, parameters in enumerate(merged):
+        if _is_vectorizable(parameters):
+            groups[_group_key(parameters)].append(index)
+        else:
+            pooled.append(index)
+
+    for indices in groups.values():
+        for index, row in zip(indices, _run_vectorized([merged[i] for i in indices])):
+            results[index] = row
+
+    if pooled:
+        if processes == 0:
+            rows = [_run_single(merged[i]) for i in pooled]
+        else:
+            workers = min(processes or os.cpu_count() or 1, len(pooled))
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method)) as executor:
+                rows = list(executor.map(_run_single, [merged[i] for i in pooled]))
+        for index, row in zip(pooled, rows):
+            results[index] = row
+
+    logger.info(f"Sweep of {len(merged)} points: {len(merged) - len(pooled)} vectorized "
+                f"in {len(groups)} batches, {len(pooled)} pooled")
+    return {
+        "columns": swept_keys + RESULT_COLUMNS,
+        "rows": [
+            [points[i].get(key) for key in swept_keys] + results[i]
+            for i in range(len(points))
+        ],
+        "vectorized": len(merged) - len(pooled),
+        "pooled": len(pooled)
+    }
@@ -0,0 +1,129 @@
+"""
+Streaming Telemetry
+Forwards simulator frames to asyncio consumers without letting slow clients
+stall the simulation.
+"""
+
+import json
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, AsyncIterator, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+
+class FrameChannel:
+    """
+    Bounded, lossy hand-off from a producer thread to an asyncio consumer.
+
+    publish() never blocks: once `maxsize` frames are waiting, the oldest one
+    is dropped and counted. The consumer is woken at most once per batch, so a
+    fast producer does not flood the event loop with callbacks.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int = 64):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self._loop = loop
+        self._frames = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self._wakeup_pending = False
+        self.dropped = 0
+        self.closed = False
+        self.cancelled = False
+        self.error = None
+
+    def publish(self, frame: Dict[str, Any]):
+        """Queue a frame from the producer thread, dropping the oldest if full."""
+        with self._lock:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append(frame)
+            wake = not self._wakeup_pending
+            self._wakeup_pending = True
+        if wake:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def close(self, error: str = None):
+        """Mark the stream finished; called by the producer thread."""
+        with self._lock:
+            self.closed = True
+            self.error = error
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def cancel(self):
+        """Ask the producer to stop, e.g. after the client disconnected."""
+        self.cancelled = True
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            frames = list(self._frames)
+            self._frames.clear()
+            self._wakeup_pending = False
+            return frames
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            for frame in self._drain():
+                yield frame
+            if self.closed:
+                # Frames published right before close() are still in the buffer
+                for frame in self._drain():
+                    yield frame
+                return
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def pump_frames(frames: Iterator[Dict[str, Any]], channel: FrameChannel):
+    """Producer: drive a frame generator into a channel until done or cancelled."""
+    try:
+        for frame in frames:
+            if channel.cancelled:
+                frames.close()
+                break
+            channel.publish(frame)
+    except Exception as e:
+        logger.error(f"Streaming simulation failed: {e}")
+        channel.close(error=str(e))
+        return
+    channel.close()
+
+
+async def stream_simulation_events(simulator, decimation: int = 1,
+                                   buffer_size: int = 64) -> AsyncIterator[str]:
+    """
+    Run a simulator in a worker thread and yield its frames as SSE messages.
+    Each frame carries the number of frames dropped so far for this client.
+    The stream ends with an `end` event holding the final results, or an
+    `error` event if the simulation failed.
+    """
+    loop = asyncio.get_running_loop()
+    channel = FrameChannel(loop, maxsize=buffer_size)
+    frames = simulator.frames(decimation=decimation)
+    producer = loop.run_in_executor(None, pump_frames, frames, channel)
+    try:
+        async for frame in channel:
+            frame["dropped"] = channel.dropped
+            yield format_sse("frame", frame)
+        await producer
+        if channel.error is not None:
+            yield format_sse("error", {"error": channel.error})
+        else:
+            yield format_sse("end", {
+                "final_position": simulator.position,
+                "simulation_time": simulator.simulation_time,
+                "dropped": channel.dropped,
+                "status": "completed"
+            })
+    finally:
+        # Stops the producer thread if the client went away mid-stream
+        channel.cancel()
@@ -0,0 +1,243 @@
+"""
+World Loader
+Parses Gazebo SDF worlds into a compact 2D static obstacle index.
+
+Collision geometry of static models is projected onto the ground plane as
+oriented boxes and circles, and every obstacle is registered in the cells of
+a uniform grid covering its AABB. The compiled arrays are cached on disk,
+keyed by the world file hash, so later runs skip XML parsing entirely.
+"""
+
+import os
+import math
+import hashlib
+import logging
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump when the compiled layout changes so stale cache entries are ignored
+WORLD_CACHE_VERSION = 1
+
+# Obstacle kinds stored in StaticWorld.kinds
+BOX, CIRCLE = 0, 1
+
+
+def default_cache_dir() -> str:
+    """Cache directory for compiled worlds (BRAIN_SWARM_CACHE_DIR overrides)."""
+    base = os.environ.get("BRAIN_SWARM_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "brain_swarm")
+    return os.path.join(base, "worlds")
+
+
+def _parse_pose(element: Optional[ET.Element]) -> Tuple[float, float, float]:
+    """Planar part (x, y, yaw) of an SDF <pose>; roll and pitch are ignored."""
+    if element is None:
+        return 0.0, 0.0, 0.0
+    pose = element.find("pose")
+    if pose is None or not (pose.text or "").strip():
+        return 0.0, 0.0, 0.0
+    values = [float(v) for v in pose.text.split()] + [0.0] * 6
+    return values[0], values[1], values[5]
+
+
+def _compose(parent: Tuple[float, float, float], child: Tuple[float, float, float]) -> Tuple[float, float, float]:
+    """Apply a child pose expressed in the parent frame."""
+    px, py, pyaw = parent
+    cx, cy, cyaw = child
+    cos_yaw, sin_yaw = math.cos(pyaw), math.sin(pyaw)
+    return px + cos_yaw * cx - sin_yaw * cy, py + sin_yaw * cx + cos_yaw * cy, pyaw + cyaw
+
+
+def parse_sdf_obstacles(path: str, include_dynamic: bool = False) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Extract planar collision obstacles from an SDF world.
+    Returns (names, kinds, shapes) where each shape row is
+    [cx, cy, half_x, half_y, cos_yaw, sin_yaw] for boxes and
+    [cx, cy, radius, radius, 1, 0] for cylinders and spheres.
+    Planes, meshes and <include>d models are skipped.
+    """
+    root = ET.parse(path).getroot()
+    world = root.find("world")
+    if world is None:
+        raise ValueError(f"{path} has no <world> element")
+
+    names, kinds, shapes = [], [], []
+    for model in world.findall("model"):
+        static = (model.findtext("static") or "false").strip().lower() in ("1", "true")
+        if not static and not include_dynamic:
+            continue
+        model_pose = _parse_pose(model)
+        for link in model.findall("link"):
+            link_pose = _compose(model_pose, _parse_pose(link))
+            for collision in link.findall("collision"):
+                x, y, yaw = _compose(link_pose, _parse_pose(collision))
+                geometry = collision.find("geometry")
+                if geometry is None:
+                    continue
+                name = f"{model.get('name')}::{link.get('name')}::{collision.get('name')}"
+                box = geometry.find("box")
+                if box is not None:
+                    size = [float(v) for v in box.findtext("size", "0 0 0").split()]
+                    names.append(name)
+                    kinds.append(BOX)
+                    shapes.append([x, y, size[0] / 2.0, size[1] / 2.0, math.cos(yaw), math.sin(yaw)])
+                    continue
+                round_shape = geometry.find("cylinder")
+                if round_shape is None:
+                    round_shape = geometry.find("sphere")
+                if round_shape is not None:
+                    radius = float(round_shape.findtext("radius", "0"))
+                    names.append(name)
+                    kinds.append(CIRCLE)
+                    shapes.append([x, y, radius, radius, 1.0, 0.0])
+                    continue
+                logger.debug(f"Skipping unsupported collision geometry in {name}")
+
+    for include in world.findall("include"):
+        logger.debug(f"Skipping included model {include.findtext('uri')}")
+
+    return names, np.array(kinds, dtype=np.int8), np.array(shapes, dtype=np.float64).reshape(-1, 6)
+
+
+def _aabbs(kinds: np.ndarray, shapes: np.ndarray) -> np.ndarray:
+    """Axis-aligned bounds [min_x, min_y, max_x, max_y] of every obstacle."""
+    cx, cy, hx, hy, cos_yaw, sin_yaw = shapes.T
+    extent_x = np.abs(cos_yaw) * hx + np.abs(sin_yaw) * hy
+    extent_y = np.abs(sin_yaw) * hx + np.abs(cos_yaw) * hy
+    return np.stack([cx - extent_x, cy - extent_y, cx + extent_x, cy + extent_y], axis=1)
+
+
+class StaticWorld:
+    """Compiled static obstacles with a uniform-grid broadphase."""
+
+    def __init__(self, names: List[str], kinds: np.ndarray, shapes: np.ndarray, cell_size: float = 1.0):
+        self.names = list(names)
+        self.kinds = kinds
+        self.shapes = shapes
+        self.aabbs = _aabbs(kinds, shapes)
+        self.cell_size = float(cell_size)
+        self._build_grid()
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def _build_grid(self):
+        """Register each obstacle in every cell its AABB overlaps (CSR layout)."""
+        keys, ids = [], []
+        for obstacle, (min_x, min_y, max_x, max_y) in enumerate(self.aabbs):
+            for cx in range(math.floor(min_x / self.cell_size), math.floor(max_x / self.cell_size) + 1):
+                for cy in range(math.floor(min_y / self.cell_size), math.floor(max_y / self.cell_size) + 1):
+                    keys.append(cx * (2 ** 32) + cy)
+                    ids.append(obstacle)
+        keys = np.array(keys, dtype=np.int64)
+        ids = np.array(ids, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        self.cell_obstacles = ids[order]
+        self.cell_keys, self.cell_start, self.cell_count = np.unique(
+            keys[order], return_index=True, return_counts=True
+        )
+        self._cell_lookup = {
+            int(key): self.cell_obstacles[start:start + count]
+            for key, start, count in zip(self.cell_keys, self.cell_start, self.cell_count)
+        }
+
+    def _overlaps(self, obstacles: np.ndarray, x, y, radius) -> np.ndarray:
+        """Exact circle-vs-obstacle test for matching obstacle/point arrays."""
+        cx, cy, hx, hy, cos_yaw, sin_yaw = self.shapes[obstacles].T
+        dx, dy = x - cx, y - cy
+        # Point in the obstacle frame, clamped to the box for the closest point
+        local_x = cos_yaw * dx + sin_yaw * dy
+        local_y = -sin_yaw * dx + cos_yaw * dy
+        gap_x = np.maximum(np.abs(local_x) - hx, 0.0)
+        gap_y = np.maximum(np.abs(local_y) - hy, 0.0)
+        box_hit = gap_x * gap_x + gap_y * gap_y <= radius * radius
+        circle_hit = dx * dx + dy * dy <= (hx + radius) ** 2
+        return np.where(self.kinds[obstacles] == BOX, box_hit, circle_hit)
+
+    def collides(self, x: float, y: float, radius: float = 0.0) -> bool:
+        """Whether a robot disc at (x, y) touches any static obstacle."""
+        if not len(self):
+            return False
+        candidates = set()
+        for cx in range(math.floor((x - radius) / self.cell_size), math.floor((x + radius) / self.cell_size) + 1):
+            for cy in range(math.floor((y - radius) / self.cell_size), math.floor((y + radius) / self.cell_size) + 1):
+                cell = self._cell_lookup.get(cx * (2 ** 32) + cy)
+                if cell is not None:
+                    candidates.update(cell.tolist())
+        if not candidates:
+            return False
+        return bool(self._overlaps(np.fromiter(candidates, dtype=np.int64), x, y, radius).any())
+
+    def collides_batch(self, x, y, radius: float = 0.0) -> np.ndarray:
+        """Vectorized collides() for arrays of robot positions."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        hit = np.zeros(x.shape, dtype=bool)
+        if not len(self) or not x.size:
+            return hit
+        reach = max(0, math.ceil(radius / self.cell_size))
+        base_x = np.floor(x / self.cell_size).astype(np.int64)
+        base_y = np.floor(y / self.cell_size).astype(np.int64)
+        robots = np.arange(x.size)
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                query = (base_x + dx) * (2 ** 32) + (base_y + dy)
+                pos = np.minimum(np.searchsorted(self.cell_keys, query), len(self.cell_keys) - 1)
+                found = self.cell_keys[pos] == query
+                count = self.cell_count[pos[found]]
+                total = int(count.sum())
+                if total == 0:
+                    continue
+                within = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+                robot = np.repeat(robots[found], count)
+                obstacle = self.cell_obstacles[np.repeat(self.cell_start[pos[found]], count) + within]
+                touching = self._overlaps(obstacle, x[robot], y[robot], radius)
+                hit[robot[touching]] = True
+        return hit
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "names": np.array(self.names, dtype=np.str_),
+            "kinds": self.kinds,
+            "shapes": self.shapes,
+            "cell_size": np.array(self.cell_size)
+        }
+
+
+def load_world(path: str, cell_size: float = 1.0, cache_dir: Optional[str] = None,
+               include_dynamic: bool = False) -> StaticWorld:
+    """
+    Load an SDF world as a StaticWorld, reusing the on-disk cache when the
+    file content and loader options are unchanged.
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    digest = hashlib.sha256(content)
+    digest.update(f"|v{WORLD_CACHE_VERSION}|cell={cell_size}|dynamic={include_dynamic}".encode())
+    cache_dir = cache_dir or default_cache_dir()
+    cache_path = os.path.join(cache_dir, f"{digest.hexdigest()}.npz")
+
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path, allow_pickle=False) as data:
+                world = StaticWorld(data["names"].tolist(), data["kinds"], data["shapes"], float(data["cell_size"]))
+            logger.info(f"Loaded {len(world)} obstacles for {path} from cache")
+            return world
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable world cache {cache_path}: {e}")
+
+    names, kinds, shapes = parse_sdf_obstacles(path, include_dynamic=include_dynamic)
+    world = StaticWorld(names, kinds, shapes, cell_size)
+    logger.info(f"Parsed {len(world)} obstacles from {path}")
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+        np.savez(temp_path, **world.to_arrays())
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not cache compiled world: {e}")
+    return world
@@ -6,14 +6,47 @@ Validates the fixes for 'function' object has no attribute 'run' error.
 
 import sys
 import os
+import json
+import math
+import io
+import asyncio
+import hashlib
+import tarfile
+import tempfile
+import time
+import queue
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch, MagicMock
 
+import numpy as np
+
 # Add simulation directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'simulation'))
 
 from simulation.main import TurtleBotSimulation, SimulationRequest, SimulationResponse
-from simulation.simulation import TurtleBotSimulator, run
+from simulation.simulation import (
+    TurtleBotSimulator, StepPacer, PhaseProfiler, RateScheduler, integrate_arc, load_parameters, run,
+    create_lidar, create_motion_model, X
+)
+from simulation.swarm import SwarmSimulator
+from simulation.parallel import REBIN_INTERVAL, count_shard_neighbors, partition
+from simulation.recorder import TrajectoryRecorder, TrajectoryReader
+from simulation.telemetry import FrameChannel
+from simulation.sweep import expand_grid, run_sweep
+from simulation.spatial import UniformGridIndex, swept_circle_collisions
+from simulation.world import BOX, CIRCLE, StaticWorld, load_world
+from simulation.lidar import PlanarLidar
+from simulation.cache import ResultCache, make_cache_key
+from simulation.inprocess import InProcessBackend, run_scenario, scenario_parameters
+from simulation.jobs import JobQueue, Quota, QueueFull
+from simulation.containers import WarmContainerPool
+from simulation.images import ImageMetadataCache, normalize_image_name
+from simulation.logs import LogStore, stream_process
+from simulation.artifacts import ArtifactStore
+from simulation.metrics import MetricsRegistry
+from simulation.benchmark import run_benchmarks, compare_to_baseline
 
 
 class TestSimulationFunctionCalling(unittest.TestCase):
@@ -103,11 +136,11 @@ class TestSimulationFunctionCalling(unittest.TestCase):
         # Mock container operations
         mock_container = Mock()
         mock_container.wait.return_value = {'StatusCode': 0}
-        mock_container.logs.return_value = b"Simulation completed successfully"
+        mock_container.logs.return_value = iter([b"Simulation completed successfully"])
         mock_client.containers.run.return_value = mock_container
         
         # Mock image exists
-        mock_client.images.get.return_value = Mock()
+        mock_client.images.get.return_value = Mock(id="sha256:image", attrs={})
         
         simulation = TurtleBotSimulation()
         self.assertTrue(simulation.is_docker_available)
@@ -185,6 +218,1947 @@ class TestFunctionAttributeErrorFixes(unittest.TestCase):
                 simulator.run()  # ✅ Correct: instance.run()
 
 
+class TestSimulationPacing(unittest.TestCase):
+    """Test real-time factor, step budget and lockstep pacing."""
+    
+    def test_fast_mode_never_sleeps(self):
+        """Fast mode should run the whole scenario without sleeping."""
+        simulator = TurtleBotSimulator({"max_time": 5, "sync_mode": "fast"})
+        with patch('simulation.simulation.time.sleep') as mock_sleep:
+            with patch('simulation.simulation.logger'):
+                simulator.run()
+        mock_sleep.assert_not_called()
+        self.assertAlmostEqual(simulator.simulation_time, 4.9)
+    
+    def test_zero_real_time_factor_never_sleeps(self):
+        """A real time factor of 0 means as fast as possible."""
+        pacer = StepPacer(0.1, real_time_factor=0)
+        with patch('simulation.simulation.time.sleep') as mock_sleep:
+            for step in range(10):
+                self.assertTrue(pacer.wait(step))
+        mock_sleep.assert_not_called()
+    
+    def test_max_steps_caps_run(self):
+        """max_steps should bound the number of executed steps."""
+        # The scheduler binds update_robot_state on construction, so patch it first
+        with patch.object(TurtleBotSimulator, 'update_robot_state') as mock_update:
+            simulator = TurtleBotSimulator({"max_time": 30, "sync_mode": "fast", "max_steps": 3})
+            with patch('simulation.simulation.logger'):
+                simulator.run()
+        self.assertEqual(mock_update.call_count, 3)
+    
+    def test_lockstep_gate_controls_steps(self):
+        """Lockstep mode should advance one step per granted tick."""
+        ticks = iter([True, True, False])
+        with patch.object(TurtleBotSimulator, 'update_robot_state') as mock_update:
+            simulator = TurtleBotSimulator(
+                {"max_time": 30, "sync_mode": "lockstep"},
+                step_gate=lambda: next(ticks)
+            )
+            with patch('simulation.simulation.logger'):
+                simulator.run()
+        self.assertEqual(mock_update.call_count, 2)
+    
+    def test_pacing_parameters_loaded_from_env(self):
+        """Pacing options should be read by load_parameters."""
+        env = {"SYNC_MODE": "fast", "REAL_TIME_FACTOR": "4.0", "MAX_STEPS": "100"}
+        with patch.dict(os.environ, env):
+            parameters = load_parameters()
+        self.assertEqual(parameters["sync_mode"], "fast")
+        self.assertEqual(parameters["real_time_factor"], 4.0)
+        self.assertEqual(parameters["max_steps"], 100)
+
+
+class TestSwarmSimulator(unittest.TestCase):
+    """Test the vectorized swarm engine."""
+    
+    def test_single_robot_matches_turtlebot(self):
+        """A one-robot swarm should follow the TurtleBotSimulator trajectory."""
+        parameters = {"max_time": 3, "sync_mode": "fast", "angular_velocity": 0.3, "linear_velocity": 0.8}
+        single = TurtleBotSimulator(dict(parameters))
+        swarm = SwarmSimulator(dict(parameters))
+        with patch('simulation.simulation.logger'), patch('simulation.swarm.logger'):
+            with patch.object(single, 'save_results'), patch.object(swarm, 'save_results'):
+                single.run()
+                swarm.run()
+        final = swarm.results()["final_position"]
+        for key in ("x", "y", "theta"):
+            self.assertAlmostEqual(final[key], single.position[key], places=9)
+        self.assertEqual(swarm.simulation_time, single.simulation_time)
+    
+    def test_results_shape(self):
+        """Swarm results should extend the single-robot results document."""
+        swarm = SwarmSimulator({"num_robots": 4, "spawn_spacing": 2.0})
+        results = swarm.results()
+        self.assertEqual(results["num_robots"], 4)
+        self.assertEqual(len(results["final_positions"]), 4)
+        self.assertEqual(results["final_positions"][3], {"x": 2.0, "y": 2.0, "theta": 0.0})
+        self.assertEqual(results["status"], "completed")
+    
+    def test_per_robot_velocities(self):
+        """Each robot should integrate its own commands."""
+        swarm = SwarmSimulator({"num_robots": 10000, "spawn_spacing": 0.0})
+        swarm.set_velocities(np.linspace(0.0, 1.0, 10000), 0.0)
+        swarm.step(1.0)
+        self.assertEqual(swarm.x[0], 0.0)
+        self.assertAlmostEqual(swarm.x[-1], 1.0)
+        self.assertTrue(swarm.state.flags["C_CONTIGUOUS"])
+
+
+class TestExactIntegrator(unittest.TestCase):
+    """Test the closed-form unicycle integrator and event-driven runs."""
+    
+    def test_arc_matches_analytic_circle(self):
+        """A full circle should return exactly to the start pose."""
+        x, y, theta = integrate_arc(0.0, 0.0, 0.0, 1.0, 0.5, 4 * math.pi)
+        self.assertAlmostEqual(x, 0.0, places=12)
+        self.assertAlmostEqual(y, 0.0, places=12)
+        self.assertAlmostEqual(theta, 2 * math.pi, places=12)
+    
+    def test_straight_line_limit(self):
+        """Zero angular velocity should drive in a straight line."""
+        x, y, theta = integrate_arc(1.0, 2.0, math.pi / 2, 2.0, 0.0, 3.0)
+        self.assertAlmostEqual(x, 1.0, places=12)
+        self.assertAlmostEqual(y, 8.0, places=12)
+        self.assertEqual(theta, math.pi / 2)
+    
+    def test_event_driven_jumps_between_commands(self):
+        """Event mode should take one jump per command segment."""
+        parameters = {
+            "max_time": 10,
+            "integrator": "event",
+            "commands": json.dumps([
+                {"time": 0, "linear_velocity": 1.0, "angular_velocity": 0.0},
+                {"time": 4, "linear_velocity": 0.0, "angular_velocity": 0.5}
+            ])
+        }
+        simulator = TurtleBotSimulator(parameters)
+        with patch('simulation.simulation.logger'), patch.object(simulator, 'save_results'):
+            with patch('simulation.simulation.integrate_arc', wraps=integrate_arc) as mock_arc:
+                simulator.run()
+        self.assertEqual(mock_arc.call_count, 2)
+        self.assertAlmostEqual(simulator.position["x"], 4.0)
+        self.assertAlmostEqual(simulator.position["theta"], 3.0)
+        self.assertEqual(simulator.simulation_time, 10.0)
+    
+    def test_exact_steps_agree_with_single_jump(self):
+        """Fixed-step exact integration should not drift from the single jump."""
+        stepped = TurtleBotSimulator({"max_time": 30, "sync_mode": "fast", "integrator": "exact", "dt": 1.0})
+        jumped = TurtleBotSimulator({"integrator": "event"})
+        with patch('simulation.simulation.logger'):
+            with patch.object(stepped, 'save_results'):
+                stepped.run()
+            # The stepped loop integrates one dt past its last recorded simulation_time
+            jumped.advance_to(stepped.simulation_time + 1.0)
+        for key in ("x", "y", "theta"):
+            self.assertAlmostEqual(stepped.position[key], jumped.position[key], places=9)
+
+
+class TestTrajectoryRecorder(unittest.TestCase):
+    """Test columnar trajectory recording and memory-mapped reads."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.trajectory_dir = os.path.join(self.temp_dir.name, "run")
+    
+    def test_round_trip_across_chunks(self):
+        """Rows spanning several chunks should read back by step index."""
+        with TrajectoryRecorder(self.trajectory_dir, num_robots=2, chunk_size=4) as recorder:
+            for step in range(10):
+                recorder.append(step * 0.1, [step, -step], [1.0, 2.0], 0.5)
+        
+        reader = TrajectoryReader(self.trajectory_dir)
+        self.assertEqual(len(reader), 10)
+        self.assertAlmostEqual(reader[7]["time"], 0.7)
+        self.assertEqual(reader[7]["x"].tolist(), [7.0, -7.0])
+        self.assertEqual(reader[-1]["theta"].tolist(), [0.5, 0.5])
+        self.assertIsInstance(reader.column("x"), np.memmap)
+        self.assertEqual(reader.column("y").shape, (10, 2))
+        with self.assertRaises(IndexError):
+            reader[10]
+    
+    def test_flushed_rows_visible_before_close(self):
+        """Readers should see every flushed chunk while recording continues."""
+        recorder = TrajectoryRecorder(self.trajectory_dir, chunk_size=3)
+        for step in range(5):
+            recorder.append(step, step, 0.0, 0.0)
+        self.assertEqual(len(TrajectoryReader(self.trajectory_dir)), 3)
+        recorder.close()
+        self.assertEqual(len(TrajectoryReader(self.trajectory_dir)), 5)
+    
+    def test_simulator_records_every_step(self):
+        """TurtleBotSimulator should record the initial pose and one row per step."""
+        recorder = TrajectoryRecorder(self.trajectory_dir)
+        simulator = TurtleBotSimulator({"max_time": 2, "sync_mode": "fast"}, recorder=recorder)
+        with patch('simulation.simulation.logger'), patch.object(simulator, 'save_results'):
+            simulator.run()
+        
+        reader = TrajectoryReader(self.trajectory_dir)
+        self.assertEqual(len(reader), 21)
+        self.assertEqual(reader[0]["x"].tolist(), [0.0])
+        self.assertAlmostEqual(reader[20]["time"], 2.0)
+        self.assertAlmostEqual(float(reader[20]["x"][0]), simulator.position["x"])
+
+
+class TestStreamingTelemetry(unittest.TestCase):
+    """Test frame generators and the streaming endpoint."""
+    
+    def test_frames_generator_decimates(self):
+        """frames() should yield every Nth step plus the final step."""
+        simulator = TurtleBotSimulator({"max_time": 1, "sync_mode": "fast"})
+        with patch('simulation.simulation.logger'):
+            frames = list(simulator.frames(decimation=4))
+        self.assertEqual([frame["step"] for frame in frames], [0, 4, 8, 9])
+        self.assertAlmostEqual(frames[-1]["time"], 1.0)
+        self.assertEqual(frames[-1]["position"], simulator.position)
+    
+    def test_channel_drops_oldest_when_full(self):
+        """A full channel should drop old frames instead of blocking the producer."""
+        async def consume():
+            channel = FrameChannel(asyncio.get_running_loop(), maxsize=3)
+            for step in range(10):
+                channel.publish({"step": step})
+            channel.close()
+            return channel, [frame async for frame in channel]
+        
+        channel, frames = asyncio.run(consume())
+        self.assertEqual([frame["step"] for frame in frames], [7, 8, 9])
+        self.assertEqual(channel.dropped, 7)
+    
+    def test_stream_endpoint_emits_sse(self):
+        """POST /simulate/stream should send frame events followed by an end event."""
+        from fastapi.testclient import TestClient
+        from simulation.main import app
+        
+        body = {"parameters": {"max_time": 1, "sync_mode": "fast"}, "decimation": 5, "buffer_size": 100}
+        with TestClient(app) as client, patch('simulation.simulation.logger'):
+            response = client.post("/simulate/stream", json=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+        self.assertEqual(events, ["event: frame"] * 3 + ["event: end"])
+    
+    def test_stream_endpoint_rejects_unsafe_runs(self):
+        """Lockstep pacing and over-long runs should be refused before streaming."""
+        from fastapi.testclient import TestClient
+        from simulation.main import app
+        
+        with TestClient(app) as client:
+            for parameters in ({"sync_mode": "lockstep"}, {"max_time": 1e9, "sync_mode": "fast"}):
+                with self.subTest(parameters=parameters):
+                    response = client.post("/simulate/stream", json={"parameters": parameters})
+                    self.assertEqual(response.status_code, 400)
+    
+    def test_stream_endpoint_limits_concurrent_streams(self):
+        """Streams beyond SIMULATION_STREAM_CONCURRENCY should be refused, and slots freed when they end."""
+        from fastapi.testclient import TestClient
+        from simulation import main
+        
+        body = {"parameters": {"max_time": 1, "sync_mode": "fast"}}
+        with patch.dict(os.environ, {"SIMULATION_STREAM_CONCURRENCY": "1"}), TestClient(main.app) as client, \
+             patch('simulation.simulation.logger'):
+            self.assertTrue(main.simulation_instance.stream_slots.acquire(blocking=False))
+            self.assertEqual(client.post("/simulate/stream", json=body).status_code, 503)
+            main.simulation_instance.stream_slots.release()
+            self.assertEqual(client.post("/simulate/stream", json=body).status_code, 200)
+            self.assertEqual(client.post("/simulate/stream", json=body).status_code, 200)
+
+
+class TestParameterSweep(unittest.TestCase):
+    """Test the batched parameter-sweep engine."""
+    
+    def test_sweep_endpoint_limits(self):
+        """Oversized sweeps are refused, processes are capped and concurrent sweeps bounded."""
+        from fastapi.testclient import TestClient
+        from simulation import main
+        
+        env = {"SIMULATION_SWEEP_MAX_POINTS": "4", "SIMULATION_SWEEP_MAX_PROCESSES": "2",
+               "SIMULATION_SWEEP_CONCURRENCY": "1"}
+        table = {"columns": [], "rows": [], "vectorized": 0, "pooled": 0}
+        with patch.dict(os.environ, env), TestClient(main.app) as client, \
+             patch('simulation.main.run_sweep', return_value=table) as sweep:
+            oversized = client.post("/sweep", json={"grid": {"a": [1, 2, 3], "b": [1, 2]}})
+            self.assertEqual(oversized.status_code, 400)
+            sweep.assert_not_called()
+            self.assertEqual(client.post("/sweep", json={"grid": {"a": [1, 2]}, "processes": 64}).status_code, 200)
+            self.assertEqual(sweep.call_args.args[2], 2)
+            limits = main.simulation_instance.inprocess
+            self.assertEqual(sweep.call_args.args[3:], (limits.max_time, limits.max_steps))
+            self.assertTrue(main.simulation_instance.sweep_slots.acquire(blocking=False))
+            self.assertEqual(client.post("/sweep", json={"points": [{"a": 1}]}).status_code, 503)
+            main.simulation_instance.sweep_slots.release()
+    
+    def test_expand_grid(self):
+        """Grids should expand to the cartesian product in key order."""
+        points = expand_grid({"linear_velocity": [0.5, 1.0], "angular_velocity": [0.1, 0.2, 0.3]})
+        self.assertEqual(len(points), 6)
+        self.assertEqual(points[1], {"linear_velocity": 0.5, "angular_velocity": 0.2})
+    
+    def test_vectorized_results_match_single_runs(self):
+        """Batched points should match individual TurtleBotSimulator runs."""
+        points = expand_grid({"angular_velocity": [0.0, 0.5], "max_time": [1, 2]})
+        with patch('simulation.simulation.logger'):
+            table = run_sweep(points, {"linear_velocity": 0.8}, processes=0)
+        self.assertEqual(table["columns"], ["angular_velocity", "max_time", "x", "y", "theta", "simulation_time"])
+        self.assertEqual(table["vectorized"], 4)
+        
+        for point, row in zip(points, table["rows"]):
+            simulator = TurtleBotSimulator(dict(point, linear_velocity=0.8, sync_mode="fast"))
+            with patch('simulation.simulation.logger'):
+                for _ in simulator.frames():
+                    pass
+            self.assertEqual(row[:2], [point["angular_velocity"], point["max_time"]])
+            self.assertAlmostEqual(row[2], simulator.position["x"], places=9)
+            self.assertAlmostEqual(row[3], simulator.position["y"], places=9)
+            self.assertAlmostEqual(row[5], simulator.simulation_time)
+    
+    def test_scheduled_points_fall_back_to_pool(self):
+        """Points with command schedules cannot be vectorized."""
+        points = [
+            {"integrator": "event", "max_time": 4},
+            {"max_time": 4}
+        ]
+        with patch('simulation.simulation.logger'):
+            table = run_sweep(points, processes=0)
+        self.assertEqual(table["pooled"], 1)
+        self.assertEqual(table["vectorized"], 1)
+        self.assertEqual(table["rows"][0][-1], 4.0)
+    
+    def test_points_obey_scenario_limits(self):
+        """Points past max_time are refused and step counts are capped on both paths."""
+        with self.assertRaises(ValueError):
+            run_sweep([{"max_time": 20}], processes=0, max_time=10.0)
+        commands = json.dumps([{"time": 0, "linear_velocity": 1.0, "angular_velocity": 0.0}])
+        points = [{"commands": commands, "max_time": 4}, {"max_time": 4}]
+        with patch('simulation.simulation.logger'):
+            table = run_sweep(points, {"dt": 0.1}, processes=0, max_steps=11)
+        self.assertEqual((table["pooled"], table["vectorized"]), (1, 1))
+        self.assertEqual([row[-1] for row in table["rows"]], [1.0, 1.0])
+
+
+class TestSpatialIndex(unittest.TestCase):
+    """Test the uniform-grid neighbor index against brute force."""
+    
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.x = rng.uniform(-20.0, 20.0, 500)
+        self.y = rng.uniform(-20.0, 20.0, 500)
+        self.distances = np.hypot(self.x[:, None] - self.x[None, :], self.y[:, None] - self.y[None, :])
+        np.fill_diagonal(self.distances, np.inf)
+    
+    def test_radius_pairs_match_brute_force(self):
+        """query_pairs should find exactly the pairs within the radius."""
+        index = UniformGridIndex(1.0)
+        index.build(self.x, self.y)
+        i, j, _ = index.query_pairs(2.5)
+        expected_i, expected_j = np.nonzero(np.triu(self.distances <= 2.5))
+        self.assertEqual(set(zip(i.tolist(), j.tolist())), set(zip(expected_i.tolist(), expected_j.tolist())))
+        
+        offsets, indices = index.query_radius(2.5)
+        self.assertEqual(
+            sorted(indices[offsets[7]:offsets[8]].tolist()),
+            np.nonzero(self.distances[7] <= 2.5)[0].tolist()
+        )
+    
+    def test_knn_matches_brute_force(self):
+        """query_knn should return the k nearest robots sorted by distance."""
+        index = UniformGridIndex(1.0)
+        index.build(self.x, self.y)
+        _, distances = index.query_knn(3)
+        np.testing.assert_allclose(distances, np.sort(self.distances, axis=1)[:, :3])
+    
+    def test_incremental_update(self):
+        """update() should track moved robots like a fresh build."""
+        index = UniformGridIndex(1.0)
+        index.build(self.x, self.y)
+        moved_x = self.x + 0.3
+        index.update(moved_x, self.y)
+        fresh = UniformGridIndex(1.0)
+        fresh.build(moved_x, self.y)
+        self.assertEqual(len(index.query_pairs(1.5)[0]), len(fresh.query_pairs(1.5)[0]))
+    
+    def test_swept_collisions(self):
+        """Robots crossing paths mid-tick should collide even if both endpoints are clear."""
+        i, j, t = swept_circle_collisions([0.0, 10.0], [0.0, 0.0], [10.0, 0.0], [0.0, 0.0], 0.5)
+        self.assertEqual((i.tolist(), j.tolist()), ([0], [1]))
+        self.assertAlmostEqual(t[0], 0.45)
+        i, _, _ = swept_circle_collisions([0.0, 0.0], [0.0, 5.0], [1.0, 1.0], [0.0, 5.0], 0.5)
+        self.assertEqual(len(i), 0)
+    
+    def test_swarm_counts_collisions(self):
+        """SwarmSimulator should count robot-robot contacts when robot_radius is set."""
+        swarm = SwarmSimulator({"num_robots": 2, "spawn_spacing": 0.5, "robot_radius": 0.3,
+                                "neighbor_radius": 1.0, "angular_velocity": 0.0})
+        swarm.step(0.1)
+        self.assertEqual(swarm.collision_count, 1)
+        offsets, indices = swarm.neighbors()
+        self.assertEqual(indices[offsets[0]:offsets[1]].tolist(), [1])
+        self.assertEqual(swarm.results()["collisions"], 1)
+
+
+class TestWorldLoader(unittest.TestCase):
+    """Test SDF world parsing, caching and obstacle collision checks."""
+    
+    WORLD_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'gazebo_data', 'worlds', 'brain_swarm_demo.world')
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+    
+    def test_demo_world_obstacles(self):
+        """The demo table should be the only obstacle; sun and ground are skipped."""
+        world = load_world(self.WORLD_FILE, cache_dir=self.temp_dir.name)
+        self.assertEqual(world.names, ["demo_table::link::collision"])
+        np.testing.assert_allclose(world.aabbs[0], [1.0, -0.5, 3.0, 0.5])
+        self.assertTrue(world.collides(2.0, 0.0))
+        self.assertTrue(world.collides(0.95, 0.0, radius=0.1))
+        self.assertFalse(world.collides(0.8, 0.0, radius=0.1))
+        self.assertEqual(world.collides_batch([2.0, 0.8, 2.0], [0.0, 0.0, 0.7], 0.1).tolist(), [True, False, False])
+    
+    def test_cached_world_skips_parsing(self):
+        """A second load of the same file should come from the on-disk cache."""
+        load_world(self.WORLD_FILE, cache_dir=self.temp_dir.name)
+        with patch('simulation.world.parse_sdf_obstacles') as mock_parse:
+            world = load_world(self.WORLD_FILE, cache_dir=self.temp_dir.name)
+        mock_parse.assert_not_called()
+        self.assertEqual(len(world), 1)
+        self.assertTrue(world.collides(2.0, 0.0))
+    
+    def test_simulator_blocked_by_table(self):
+        """A robot driving at the table should stop in front of it."""
+        world = load_world(self.WORLD_FILE, cache_dir=self.temp_dir.name)
+        simulator = TurtleBotSimulator(
+            {"max_time": 3, "sync_mode": "fast", "angular_velocity": 0.0, "robot_radius": 0.1},
+            world=world
+        )
+        with patch('simulation.simulation.logger'), patch('simulation.simulation.write_results') as mock_write:
+            simulator.run()
+        self.assertLess(simulator.position["x"], 0.9)
+        self.assertGreater(simulator.collision_count, 0)
+        self.assertEqual(mock_write.call_args[0][0]["collisions"], simulator.collision_count)
+    
+    def test_swarm_blocked_like_single_robot(self):
+        """A blocked swarm robot should keep its whole pose, heading included, as a single robot does."""
+        world = load_world(self.WORLD_FILE, cache_dir=self.temp_dir.name)
+        parameters = {"max_time": 3, "sync_mode": "fast", "angular_velocity": 0.2, "robot_radius": 0.1}
+        simulator = TurtleBotSimulator(dict(parameters), world=world)
+        with patch('simulation.simulation.logger'):
+            for _ in simulator.frames():
+                pass
+        swarm = SwarmSimulator(dict(parameters), num_robots=1, world=world)
+        swarm.set_velocities(1.0, 0.2)
+        for _ in range(30):
+            swarm.step(0.1)
+        self.assertGreater(simulator.collision_count, 0)
+        self.assertEqual(swarm.obstacle_collision_count, simulator.collision_count)
+        self.assertAlmostEqual(swarm.theta[0], simulator.position["theta"])
+        self.assertAlmostEqual(swarm.x[0], simulator.position["x"])
+
+
+class TestResultCache(unittest.TestCase):
+    """Test the content-addressed simulation result cache."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.script_dir = os.path.join(self.temp_dir.name, "scripts")
+        os.makedirs(self.script_dir)
+        with open(os.path.join(self.script_dir, "simulation.py"), "w") as f:
+            f.write("print('simulating')\n")
+    
+    def test_key_canonicalizes_parameters(self):
+        """Equivalent parameter encodings should share a key; other inputs should not."""
+        key = make_cache_key("sha256:abc", "f00", {"max_time": 10, "angular_velocity": "0.5"})
+        self.assertEqual(key, make_cache_key("sha256:abc", "f00", {"angular_velocity": 0.5, "max_time": "10"}))
+        self.assertNotEqual(key, make_cache_key("sha256:abd", "f00", {"max_time": 10, "angular_velocity": "0.5"}))
+        self.assertNotEqual(key, make_cache_key("sha256:abc", "f01", {"max_time": 10, "angular_velocity": "0.5"}))
+        # Collected artifact paths are part of the run, in any order
+        with_artifacts = make_cache_key("sha256:abc", "f00", {"max_time": 10}, ["/tmp/b", "/tmp/a"])
+        self.assertEqual(with_artifacts, make_cache_key("sha256:abc", "f00", {"max_time": 10}, ["/tmp/a", "/tmp/b"]))
+        self.assertNotEqual(with_artifacts, make_cache_key("sha256:abc", "f00", {"max_time": 10}))
+    
+    def test_lru_eviction(self):
+        """The least recently used entries should be evicted past max_entries."""
+        cache = ResultCache(os.path.join(self.temp_dir.name, "cache"), max_entries=2)
+        cache.put("a", {"value": 1})
+        cache.put("b", {"value": 2})
+        os.utime(os.path.join(cache.directory, "a.json"), (1, 1))
+        os.utime(os.path.join(cache.directory, "b.json"), (2, 2))
+        self.assertEqual(cache.get("a"), {"value": 1})  # refreshes a
+        cache.put("c", {"value": 3})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"value": 1})
+        self.assertEqual(cache.get("c"), {"value": 3})
+    
+    @patch('simulation.main.docker.from_env')
+    def test_repeat_request_served_from_cache(self, mock_docker):
+        """A repeated deterministic request should not start another container."""
+        mock_client = Mock()
+        mock_docker.return_value = mock_client
+        mock_client.images.get.return_value = Mock(id="sha256:image", attrs={})
+        mock_container = Mock()
+        mock_container.wait.return_value = {'StatusCode': 0}
+        mock_container.logs.side_effect = lambda **kwargs: iter([b"done"])
+        mock_client.containers.run.return_value = mock_container
+        
+        env = {"SIMULATION_CACHE_DIR": os.path.join(self.temp_dir.name, "cache")}
+        with patch.dict(os.environ, env), patch('simulation.main.SCRIPT_HOST_DIR', self.script_dir):
+            simulation = TurtleBotSimulation()
+            request = SimulationRequest(parameters={"max_time": "10"})
+            first = simulation.run(request)
+            second = simulation.run(request)
+            uncached = simulation.run(SimulationRequest(parameters={"max_time": "10"}, use_cache=False))
+        
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(second.output, "done")
+        self.assertFalse(uncached.cached)
+        self.assertEqual(mock_client.containers.run.call_count, 2)
+
+
+class TestSimulatorBenchmarks(unittest.TestCase):
+    """Test the benchmark report format and regression thresholds."""
+    
+    def test_report_contains_throughput(self):
+        """Every case should report steps/sec and robot-steps/sec."""
+        cases = [("turtlebot", 1, "euler", 0.1, 10), ("swarm", 50, "exact", 0.1, 10)]
+        report = run_benchmarks(cases, repeat=1)
+        self.assertEqual([r["id"] for r in report["results"]], [
+            "turtlebot/robots=1/integrator=euler/dt=0.1",
+            "swarm/robots=50/integrator=exact/dt=0.1"
+        ])
+        swarm = report["results"][1]
+        self.assertAlmostEqual(swarm["robot_steps_per_sec"], 50 * swarm["steps_per_sec"])
+        json.dumps(report)
+    
+    def test_regression_detection(self):
+        """Slowdowns beyond the tolerance should be flagged; others should pass."""
+        baseline = {"results": [
+            {"id": "a", "robot_steps_per_sec": 1000.0},
+            {"id": "b", "robot_steps_per_sec": 1000.0}
+        ]}
+        report = {"results": [
+            {"id": "a", "robot_steps_per_sec": 650.0},
+            {"id": "b", "robot_steps_per_sec": 750.0},
+            {"id": "new", "robot_steps_per_sec": 1.0}
+        ]}
+        regressions = compare_to_baseline(report, baseline, tolerance=0.3)
+        self.assertEqual([r["id"] for r in regressions], ["a"])
+        self.assertAlmostEqual(regressions[0]["ratio"], 0.65)
+
+
+class TestPhaseProfiler(unittest.TestCase):
+    """Test per-phase profiling of the simulation loop."""
+    
+    def test_histogram_statistics(self):
+        """Laps should land in log2 buckets with matching totals."""
+        profiler = PhaseProfiler()
+        clock = iter([1000, 2500, 100000])
+        profiler.clock = lambda: next(clock)
+        profiler.lap("step", 0)        # 1000 ns
+        profiler.lap("step", 1000)     # 1500 ns
+        profiler.lap("step", 0)        # 100000 ns
+        stats = profiler.summary()["step"]
+        self.assertEqual(stats["count"], 3)
+        self.assertAlmostEqual(stats["total_ms"], 0.1025)
+        self.assertEqual(stats["min_us"], 1.0)
+        self.assertEqual(stats["max_us"], 100.0)
+        self.assertEqual(stats["histogram"], [[1024, 1], [2048, 1], [131072, 1]])
+        self.assertEqual(stats["p50_us"], 2.048)
+    
+    def test_profile_emitted_with_results(self):
+        """An enabled profiler should add per-phase stats to the saved results."""
+        simulator = TurtleBotSimulator({"max_time": 1, "sync_mode": "fast", "profile": "1"})
+        with patch('simulation.simulation.logger'), patch('simulation.simulation.write_results') as mock_write:
+            simulator.run()
+        profile = mock_write.call_args[0][0]["profile"]
+        self.assertEqual(profile["step"]["count"], 10)
+        self.assertEqual(profile["pacing"]["count"], 10)
+        self.assertEqual(profile["logging"]["count"], 1)
+        self.assertNotIn("collision", profile)
+    
+    def test_disabled_by_default(self):
+        """Without the profile flag no profiler is attached and no stats are saved."""
+        simulator = TurtleBotSimulator({"max_time": 1, "sync_mode": "fast"})
+        self.assertIsNone(simulator.profiler)
+        with patch('simulation.simulation.logger'), patch('simulation.simulation.write_results') as mock_write:
+            simulator.run()
+        self.assertNotIn("profile", mock_write.call_args[0][0])
+
+
+class TestMotionModels(unittest.TestCase):
+    """Test the motion-model registry and its scalar and batched kernels."""
+    
+    def _run_scalar(self, parameters, steps, dt=0.1):
+        model = create_motion_model(parameters)
+        pose = (0.0, 0.0, 0.0)
+        for step in range(steps):
+            pose = model.step(*pose, step * dt, dt)
+        return pose
+    
+    def _run_batch(self, parameters, steps, num_robots=3):
+        swarm = SwarmSimulator(dict(parameters, spawn_spacing=0.0), num_robots=num_robots)
+        for step in range(steps):
+            swarm.simulation_time = step * 0.1
+            swarm.step(0.1)
+        return swarm
+    
+    def test_registry_selection(self):
+        """robot_model should pick the model, with TurtleBot aliases and a clear error."""
+        self.assertEqual(create_motion_model({}).name, "differential_drive")
+        self.assertEqual(create_motion_model({"robot_model": "turtlebot3_burger"}).name, "differential_drive")
+        self.assertEqual(create_motion_model({"robot_model": "ackermann"}).name, "ackermann")
+        with self.assertRaises(ValueError):
+            create_motion_model({"robot_model": "hovercraft"})
+    
+    def test_parameters_resolved_once(self):
+        """Steps should not re-read the parameter dict."""
+        parameters = {"linear_velocity": "1.0", "angular_velocity": "0.5"}
+        simulator = TurtleBotSimulator(dict(parameters, max_time=1, sync_mode="fast"))
+        simulator.parameters = None  # any parameter lookup would now raise
+        simulator.update_robot_state(0.1)
+        self.assertAlmostEqual(simulator.position["theta"], 0.05)
+    
+    def test_batch_matches_scalar(self):
+        """Every model's batched kernel should track its scalar kernel."""
+        cases = [
+            {"robot_model": "differential_drive", "integrator": "exact"},
+            {"robot_model": "ackermann", "steering_angle": 0.3, "wheelbase": 0.5},
+            {"robot_model": "holonomic", "lateral_velocity": 0.4, "integrator": "exact"},
+            {"robot_model": "waypoint_follower", "waypoints": "[[1, 1], [2, 0]]"},
+        ]
+        for parameters in cases:
+            with self.subTest(model=parameters["robot_model"]):
+                x, y, theta = self._run_scalar(parameters, 40)
+                swarm = self._run_batch(parameters, 40)
+                np.testing.assert_allclose(swarm.x, x, atol=1e-9)
+                np.testing.assert_allclose(swarm.y, y, atol=1e-9)
+                np.testing.assert_allclose(swarm.theta, theta, atol=1e-9)
+    
+    def test_euler_batch_matches_scalar_exactly(self):
+        """The Euler kernels share one operation order, so only cos/sin rounding could tell them apart."""
+        parameters = {"linear_velocity": 0.7, "angular_velocity": 0.3}
+        x, y, theta = self._run_scalar(parameters, 200)
+        # The scalar update keeps the original simulator's v * dt * cos(theta)
+        expected = [0.0, 0.0, 0.0]
+        for _ in range(200):
+            expected[2] += 0.3 * 0.1
+            expected[0] += 0.7 * 0.1 * math.cos(expected[2])
+            expected[1] += 0.7 * 0.1 * math.sin(expected[2])
+        self.assertEqual((x, y, theta), tuple(expected))
+        swarm = self._run_batch(parameters, 200)
+        headings = np.linspace(-7.0, 7.0, 1001)
+        if not (np.array_equal(np.cos(headings), [math.cos(h) for h in headings])
+                and np.array_equal(np.sin(headings), [math.sin(h) for h in headings])):
+            self.skipTest("NumPy's cos/sin round differently from libm on this platform")
+        np.testing.assert_array_equal(swarm.x, x)
+        np.testing.assert_array_equal(swarm.y, y)
+        np.testing.assert_array_equal(swarm.theta, theta)
+    
+    def test_ackermann_turning_radius(self):
+        """Constant steering should trace a circle of radius wheelbase / tan(steering)."""
+        parameters = {"robot_model": "ackermann", "steering_angle": 0.4, "wheelbase": 0.5,
+                      "linear_velocity": 1.0, "integrator": "exact"}
+        radius = 0.5 / math.tan(0.4)
+        x, y, _ = self._run_scalar(parameters, 25)
+        self.assertAlmostEqual(math.hypot(x, y - radius), radius, places=9)
+    
+    def test_holonomic_strafes(self):
+        """Pure lateral velocity should move sideways without turning."""
+        parameters = {"robot_model": "holonomic", "linear_velocity": 0.0,
+                      "lateral_velocity": 1.0, "angular_velocity": 0.0}
+        x, y, theta = self._run_scalar(parameters, 10)
+        self.assertAlmostEqual(x, 0.0)
+        self.assertAlmostEqual(y, 1.0)
+        self.assertEqual(theta, 0.0)
+    
+    def test_waypoint_follower_reaches_goal(self):
+        """The follower should reach its last waypoint and stop there."""
+        parameters = {"robot_model": "waypoint_follower", "waypoints": [[2, 0], [2, 2]],
+                      "waypoint_tolerance": 0.1}
+        x, y, _ = self._run_scalar(parameters, 300)
+        self.assertLess(math.hypot(x - 2.0, y - 2.0), 0.1)
+    
+    def test_event_integrator_requires_schedule_model(self):
+        """Event mode only supports the differential-drive command schedule."""
+        with self.assertRaises(ValueError):
+            TurtleBotSimulator({"robot_model": "holonomic", "integrator": "event"})
+
+
+class TestSharedMemorySwarm(unittest.TestCase):
+    """Test sharded swarm stepping over shared memory."""
+    
+    def _pair(self, parameters, num_robots=257):
+        serial = SwarmSimulator(dict(parameters), num_robots=num_robots)
+        sharded = SwarmSimulator(dict(parameters, swarm_processes=3), num_robots=num_robots)
+        self.addCleanup(sharded.close)
+        return serial, sharded
+    
+    def test_partition_covers_all_robots(self):
+        """Shards should be contiguous, disjoint and cover every robot."""
+        shards = partition(10, 3)
+        self.assertEqual(shards, [(0, 3), (3, 7), (7, 10)])
+    
+    def test_sharded_matches_serial(self):
+        """Stepping in worker processes should give the same poses as one process."""
+        serial, sharded = self._pair({"integrator": "exact", "robot_model": "ackermann", "steering_angle": 0.2})
+        self.assertIsNotNone(sharded.stepper)
+        for step in range(15):
+            for swarm in (serial, sharded):
+                swarm.simulation_time = step * 0.1
+                swarm.step(0.1)
+        np.testing.assert_array_equal(sharded.state, serial.state)
+    
+    def test_neighbor_counts_across_shard_boundaries(self):
+        """Workers should count neighbors that live in other shards."""
+        serial, sharded = self._pair({"neighbor_radius": 1.5, "spawn_spacing": 1.0})
+        for swarm in (serial, sharded):
+            swarm.step(0.1)
+        np.testing.assert_array_equal(sharded.neighbor_counts(), serial.neighbor_counts())
+    
+    def test_neighbor_counts_as_strips_drift(self):
+        """Counts should stay exact between re-binnings while robots cross strip boundaries."""
+        serial, sharded = self._pair({"neighbor_radius": 1.5, "spawn_spacing": 1.0, "linear_velocity": 2.0,
+                                      "angular_velocity": 1.0})
+        for swarm in (serial, sharded):
+            swarm.theta[:] = np.linspace(0.0, 2 * np.pi, swarm.num_robots)
+        for _ in range(REBIN_INTERVAL + 5):
+            for swarm in (serial, sharded):
+                swarm.step(0.1)
+            np.testing.assert_array_equal(sharded.neighbor_counts(), serial.neighbor_counts())
+    
+    def test_shard_counts_read_only_nearby_candidates(self):
+        """Candidates outside the shard's box grown by the radius are never indexed."""
+        state = np.zeros((5, 4))
+        state[X] = [0.0, 1.0, 2.5, 10.0]
+        own, candidates = np.array([0, 1]), np.array([2, 3])
+        with patch.object(UniformGridIndex, 'build', autospec=True, side_effect=UniformGridIndex.build) as build:
+            counts = count_shard_neighbors(state, own, candidates, 1.5)
+        np.testing.assert_array_equal(counts, [1, 2])
+        np.testing.assert_array_equal(build.call_args.args[1], [0.0, 1.0, 2.5])
+    
+    def test_close_copies_state_out(self):
+        """After close the swarm keeps its final state in private memory."""
+        _, sharded = self._pair({})
+        sharded.step(0.1)
+        expected = sharded.state.copy()
+        sharded.close()
+        self.assertIsNone(sharded.stepper)
+        np.testing.assert_array_equal(sharded.state, expected)
+    
+    def test_pause_between_ticks_longer_than_barrier_timeout(self):
+        """Idle workers should wait for the next tick however long the parent pauses."""
+        with patch('simulation.parallel.BARRIER_TIMEOUT', 1.0):
+            _, sharded = self._pair({"neighbor_radius": 1.5})
+            sharded.step(0.1)
+            time.sleep(2.5)
+            sharded.step(0.1)
+        self.assertIsNotNone(sharded.stepper)
+
+
+class TestRateScheduler(unittest.TestCase):
+    """Test multi-rate scheduling of simulation tasks."""
+    
+    def test_tasks_run_at_their_rates(self):
+        """Rates should round to whole base steps and due tasks run in order."""
+        scheduler = RateScheduler(0.01)
+        calls = []
+        self.assertEqual(scheduler.add("log", lambda step: calls.append(("log", step)), 20.0, order=40), 5)
+        self.assertEqual(scheduler.add("physics", lambda step: calls.append(("physics", step)), order=10), 1)
+        for step in range(6):
+            scheduler.tick(step)
+        self.assertEqual([c for c in calls if c[0] == "log"], [("log", 0), ("log", 5)])
+        self.assertEqual(calls[:2], [("physics", 0), ("log", 0)])
+        self.assertEqual(len([c for c in calls if c[0] == "physics"]), 6)
+    
+    def test_hot_path_for_single_rate_physics(self):
+        """Physics alone on every step gets a hot path carrying only the sparse tasks."""
+        scheduler = RateScheduler(0.1)
+        physics, log = (lambda step: None), (lambda step: None)
+        scheduler.add("physics", physics, order=10)
+        scheduler.add("logging", log, 2.0, order=40)
+        self.assertEqual(scheduler.hot_path("physics"), [(log,), (), (), (), ()])
+        scheduler.add("control", lambda step: None, 5.0, order=0)
+        self.assertIsNone(scheduler.hot_path("physics"))
+    
+    def test_default_run_takes_the_hot_path(self):
+        """A default run should call physics directly every step and log on its own period."""
+        simulator = TurtleBotSimulator({"max_time": 10, "sync_mode": "fast"})
+        with patch.object(simulator.scheduler, 'tick') as tick, patch('simulation.simulation.logger') as mock_logger:
+            frames = list(simulator.frames(decimation=100))
+        tick.assert_not_called()
+        self.assertEqual([frame["step"] for frame in frames], [0, 99])
+        self.assertEqual(mock_logger.info.call_count, 2)
+        self.assertAlmostEqual(simulator.position["theta"], 100 * 0.1 * 0.5)
+    
+    def test_long_hyperperiod_falls_back(self):
+        """Coprime periods beyond the precomputed table should still be scheduled."""
+        scheduler = RateScheduler(1.0)
+        seen = []
+        scheduler.add("a", lambda step: seen.append(step), 1.0 / 4099)
+        scheduler.add("b", lambda step: None, 1.0 / 4097)
+        self.assertIsNone(scheduler._due)
+        for step in range(4100):
+            scheduler.tick(step)
+        self.assertEqual(seen, [0, 4099])
+    
+    def test_controller_runs_slower_than_physics(self):
+        """A 10 Hz controller under 100 Hz physics should run once per 10 steps."""
+        parameters = {"max_time": 2, "dt": 0.01, "sync_mode": "fast", "control_rate": 10,
+                      "robot_model": "waypoint_follower", "waypoints": [[1, 1]]}
+        simulator = TurtleBotSimulator(parameters)
+        model_class = type(simulator.motion_model)
+        with patch('simulation.simulation.logger'), \
+             patch.object(model_class, 'control', autospec=True, side_effect=model_class.control) as mock_control:
+            for _ in simulator.frames():
+                pass
+        self.assertEqual(mock_control.call_count, 20)
+        self.assertGreater(simulator.position["x"], 0.5)
+    
+    def test_recorder_and_logger_rates(self):
+        """record_rate and log_interval should thin out persistence and logging."""
+        recorder = Mock()
+        parameters = {"max_time": 10, "sync_mode": "fast", "record_rate": 2, "log_interval": 2}
+        simulator = TurtleBotSimulator(parameters, recorder=recorder)
+        with patch('simulation.simulation.logger') as mock_logger:
+            for _ in simulator.frames():
+                pass
+        # Initial pose plus one sample every 0.5 s over 100 steps
+        self.assertEqual(recorder.append.call_count, 1 + 20)
+        progress = [c for c in mock_logger.info.call_args_list if "Simulation time" in c[0][0]]
+        self.assertEqual(len(progress), 5)
+
+
+class TestPlanarLidar(unittest.TestCase):
+    """Test batched lidar raycasting against obstacles and robots."""
+    
+    def setUp(self):
+        """A 1 m box at x=2 and a 0.5 m radius cylinder at y=3."""
+        self.world = StaticWorld(
+            ["box", "cylinder"], np.array([BOX, CIRCLE], dtype=np.int8),
+            np.array([[2.0, 0.0, 0.5, 0.5, 1.0, 0.0], [0.0, 3.0, 0.5, 0.5, 1.0, 0.0]])
+        )
+    
+    def test_ranges_to_static_obstacles(self):
+        """Beams should stop at the nearest surface and report max_range on a miss."""
+        lidar = PlanarLidar(beams=4, max_range=10.0)
+        np.testing.assert_allclose(lidar.scan(0.0, 0.0, 0.0, self.world), [[10.0, 10.0, 1.5, 2.5]])
+        # Rotating the robot rotates the scan
+        np.testing.assert_allclose(lidar.scan(0.0, 0.0, math.pi / 2, self.world), [[10.0, 1.5, 2.5, 10.0]])
+    
+    def test_rotated_box_corner(self):
+        """A box turned 45 degrees should be hit at its corner."""
+        c = math.cos(math.pi / 4)
+        world = StaticWorld(["diamond"], np.array([BOX], dtype=np.int8), np.array([[3.0, 0.0, 0.5, 0.5, c, c]]))
+        ranges = PlanarLidar(beams=1, max_range=10.0).scan(0.0, 0.0, 0.0, world)
+        self.assertAlmostEqual(ranges[0, 0], 3.0 - 0.5 * math.sqrt(2))
+    
+    def test_robots_see_each_other(self):
+        """With a robot radius, other robots appear as discs."""
+        lidar = PlanarLidar(beams=4, max_range=10.0)
+        ranges = lidar.scan([0.0, 0.0], [0.0, -2.0], [0.0, 0.0], robot_radius=0.2)
+        np.testing.assert_allclose(ranges, [[10.0, 1.8, 10.0, 10.0], [10.0, 10.0, 10.0, 1.8]])
+    
+    def test_sector_culling_matches_all_beams(self):
+        """Casting only the beams in each obstacle's sector should not change any range."""
+        rng = np.random.default_rng(3)
+        yaw = rng.uniform(0, 2 * math.pi, 40)
+        shapes = np.column_stack([rng.uniform(-5, 5, (40, 2)), rng.uniform(0.1, 0.6, (40, 2)),
+                                  np.cos(yaw), np.sin(yaw)])
+        world = StaticWorld([str(i) for i in range(40)], np.zeros(40, dtype=np.int8), shapes)
+        x, y, theta = rng.uniform(-5, 5, 30), rng.uniform(-5, 5, 30), rng.uniform(-3, 3, 30)
+        for fov, beams in ((2 * math.pi, 360), (math.pi, 91)):
+            lidar = PlanarLidar(beams=beams, max_range=4.0, fov=fov)
+            culled = lidar.scan(x, y, theta, world, robot_radius=0.2)
+            # Reference: every beam of every pair, by making every bounding circle enclose the robot
+            original = PlanarLidar._beams_in_view
+            with patch.object(PlanarLidar, '_beams_in_view',
+                              lambda self, d, r, bound: original(self, d, r, np.full_like(bound, np.inf))):
+                reference = lidar.scan(x, y, theta, world, robot_radius=0.2)
+            np.testing.assert_array_equal(culled, reference)
+    
+    def test_noise_is_seeded_and_clipped(self):
+        """Noise should be reproducible, applied to hits only and stay within range."""
+        first = PlanarLidar(beams=90, max_range=2.6, noise=0.5, seed=7).scan(0.0, 0.0, 0.0, self.world)
+        second = PlanarLidar(beams=90, max_range=2.6, noise=0.5, seed=7).scan(0.0, 0.0, 0.0, self.world)
+        np.testing.assert_array_equal(first, second)
+        self.assertTrue(((first >= 0.0) & (first <= 2.6)).all())
+        clean = PlanarLidar(beams=90, max_range=2.6).scan(0.0, 0.0, 0.0, self.world)
+        np.testing.assert_array_equal(first[clean == 2.6], 2.6)
+    
+    def test_simulator_scans_at_lidar_rate(self):
+        """A 5 Hz lidar under 10 Hz physics should scan every other step."""
+        parameters = {"max_time": 2, "sync_mode": "fast", "lidar_beams": 8, "lidar_rate": 5}
+        simulator = TurtleBotSimulator(parameters, world=self.world, lidar=create_lidar(parameters))
+        with patch('simulation.simulation.logger'), patch('simulation.simulation.write_results') as mock_write:
+            simulator.run()
+        self.assertEqual(simulator.scan.shape, (8,))
+        lidar = mock_write.call_args[0][0]["lidar"]
+        self.assertEqual(lidar["scans"], 10)
+        self.assertEqual(lidar["beams"], 8)
+
+    def test_event_integrator_rejected_with_world_or_lidar(self):
+        """Event jumps skip collisions and sensing, so worlds and lidars are refused."""
+        with self.assertRaises(ValueError):
+            TurtleBotSimulator({"integrator": "event"}, world=self.world)
+        with self.assertRaises(ValueError):
+            TurtleBotSimulator({"integrator": "event"}, lidar=PlanarLidar(beams=4))
+
+
+class TestInProcessBackend(unittest.TestCase):
+    """Test running trusted scenarios in the in-process worker pool."""
+    
+    def setUp(self):
+        """Use private result cache and log directories."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.env = patch.dict(os.environ, {"SIMULATION_CACHE_DIR": self.temp_dir.name,
+                                           "SIMULATION_LOG_DIR": os.path.join(self.temp_dir.name, "logs"),
+                                           "SIMULATION_INPROCESS_WORKERS": "1"})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+    
+    def test_parameters_normalized_like_the_container(self):
+        """Request parameters should load as the container's environment would."""
+        parameters = scenario_parameters({"max_time": "2", "dt": 0.05, "profile": True,
+                                          "waypoints": [[1, 2]], "unknown": "ignored"})
+        self.assertEqual(parameters["max_time"], 2)
+        self.assertEqual(parameters["dt"], 0.05)
+        self.assertEqual(parameters["profile"], "true")
+        self.assertEqual(parameters["waypoints"], "[[1, 2]]")
+        self.assertEqual(parameters["sync_mode"], "fast")
+        self.assertNotIn("unknown", parameters)
+        with self.assertRaises(ValueError):
+            scenario_parameters({"sync_mode": "lockstep"})
+    
+    def test_scenarios_limited_to_safe_bounds(self):
+        """Long runs, host paths and worlds outside the worlds directory should be refused."""
+        worlds = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazebo_data", "worlds")
+        with self.assertRaises(ValueError):
+            scenario_parameters({"max_time": "1e9"})
+        with self.assertRaises(ValueError):
+            scenario_parameters({"trajectory_dir": "/tmp/trajectory"})
+        with self.assertRaises(ValueError):
+            scenario_parameters({"world_file": "brain_swarm_demo.world"})
+        with self.assertRaises(ValueError):
+            scenario_parameters({"world_file": "../../requirements.txt"}, worlds_dir=worlds)
+        loaded = scenario_parameters({"world_file": "brain_swarm_demo.world", "max_steps": "5"}, worlds_dir=worlds,
+                                     max_steps=3)
+        self.assertEqual(loaded["world_file"], os.path.join(os.path.realpath(worlds), "brain_swarm_demo.world"))
+        self.assertEqual(loaded["max_steps"], 3)
+    
+    def test_timed_out_scenario_frees_its_worker(self):
+        """A scenario past its timeout should stop, leaving the single worker free for the next run."""
+        backend = InProcessBackend(workers=1, timeout=0.5)
+        self.addCleanup(backend.close)
+        slow = backend.run({"max_time": "3600", "dt": "0.0001"})
+        self.assertFalse(slow["success"])
+        self.assertIn("timeout", slow["error"])
+        self.assertTrue(backend.run({"max_time": "1"})["success"])
+    
+    def test_time_waiting_for_a_worker_not_counted_against_timeout(self):
+        """A run queued behind another should get its whole timeout once a worker takes it."""
+        backend = InProcessBackend(workers=1, timeout=1.5)
+        self.addCleanup(backend.close)
+        backend.start()
+        parameters = {"max_time": "1", "sync_mode": "realtime"}
+        with patch('simulation.inprocess.KILL_GRACE', 0.0), ThreadPoolExecutor(max_workers=2) as pool:
+            outcomes = list(pool.map(backend.run, [parameters, parameters]))
+        self.assertEqual([outcome["success"] for outcome in outcomes], [True, True])
+    
+    def test_restart_kills_busy_workers(self):
+        """restart() should kill a worker that ignores its timeout and start a fresh pool on the next run."""
+        backend = InProcessBackend(workers=1, timeout=5)
+        self.addCleanup(backend.close)
+        stuck = backend.start().submit(time.sleep, 60)
+        processes = list(backend._executor._processes.values())
+        backend.restart()
+        for process in processes:
+            process.join(5)
+            self.assertFalse(process.is_alive())
+        with self.assertRaises(Exception):
+            stuck.result(timeout=10)
+        self.assertTrue(backend.run({"max_time": "1"})["success"])
+    
+    def test_run_scenario_returns_results_and_output(self):
+        """A scenario should report its final state and log lines."""
+        outcome = run_scenario({"max_time": "1", "angular_velocity": "0"})
+        self.assertTrue(outcome["success"])
+        self.assertAlmostEqual(outcome["results"]["final_position"]["x"], 1.0)
+        self.assertIn("Simulation completed successfully", outcome["output"])
+        failed = run_scenario({"integrator": "rk4"})
+        self.assertFalse(failed["success"])
+        self.assertIn("rk4", failed["error"])
+    
+    def test_backend_selected_per_request(self):
+        """backend='inprocess' should run in the pool without touching Docker."""
+        simulation = TurtleBotSimulation()
+        self.addCleanup(simulation.close)
+        with patch.object(simulation, '_run_with_docker_sdk') as mock_docker, \
+             patch.object(simulation, '_run_with_cli_fallback') as mock_cli:
+            request = SimulationRequest(backend="inprocess", parameters={"max_time": "1"})
+            first = simulation.run(request)
+            second = simulation.run(request)
+        mock_docker.assert_not_called()
+        mock_cli.assert_not_called()
+        self.assertTrue(first.success)
+        self.assertEqual(first.backend, "inprocess")
+        self.assertIn("final_position", first.results)
+        self.assertTrue(second.cached)
+    
+    def test_cache_key_covers_world_content_and_lidar_noise(self):
+        """Editing the world file changes the key; unseeded lidar noise is never cached."""
+        worlds = os.path.join(self.temp_dir.name, "worlds")
+        os.makedirs(worlds)
+        with open(os.path.join(worlds, "room.world"), "w") as f:
+            f.write("<sdf version='1.6'><world name='room'/></sdf>")
+        with patch.dict(os.environ, {"SIMULATION_WORLDS_DIR": worlds}):
+            simulation = TurtleBotSimulation()
+        self.addCleanup(simulation.close)
+        request = SimulationRequest(backend="inprocess", parameters={"world_file": "room.world"})
+        key = simulation._inprocess_cache_key(request)
+        self.assertIsNotNone(key)
+        with open(os.path.join(worlds, "room.world"), "a") as f:
+            f.write("\n")
+        self.assertNotEqual(simulation._inprocess_cache_key(request), key)
+        
+        noisy = {"lidar_beams": "8", "lidar_noise": "0.01"}
+        self.assertIsNone(simulation._inprocess_cache_key(SimulationRequest(parameters=noisy)))
+        seeded = SimulationRequest(parameters=dict(noisy, lidar_seed="7"))
+        self.assertIsNotNone(simulation._inprocess_cache_key(seeded))
+    
+    def test_output_kept_in_the_log_store(self):
+        """Long in-process output should be stored as a log, with only its head and tail returned and cached."""
+        lines = "\n".join(f"line {index}" for index in range(20000))
+        simulation = TurtleBotSimulation()
+        self.addCleanup(simulation.close)
+        with patch.object(simulation.inprocess, 'run',
+                          return_value={"success": True, "output": lines, "results": {}, "error": None}):
+            request = SimulationRequest(backend="inprocess", parameters={"max_time": "1"})
+            first = simulation.run(request)
+            cached = simulation.run(request)
+        self.assertEqual(first.log_bytes, len(lines))
+        self.assertLess(len(first.output), len(lines))
+        self.assertIn("bytes omitted", first.output)
+        self.assertEqual(simulation.logs.read(first.log_id, 0, len(lines)), lines.encode())
+        self.assertTrue(cached.cached)
+        self.assertEqual(cached.output, first.output)
+    
+    def test_backend_selected_by_config(self):
+        """SIMULATION_BACKEND should set the default; untrusted scripts are refused."""
+        with patch.dict(os.environ, {"SIMULATION_BACKEND": "inprocess"}):
+            simulation = TurtleBotSimulation()
+        self.addCleanup(simulation.close)
+        with patch.object(simulation.inprocess, 'run') as mock_run:
+            result = simulation.run(SimulationRequest(script_path="/app/other.py"))
+        mock_run.assert_not_called()
+        self.assertFalse(result.success)
+        self.assertEqual(result.backend, "inprocess")
+
+
+class TestJobQueue(unittest.TestCase):
+    """Test queued simulation jobs and the /simulate and /jobs endpoints."""
+    
+    def wait_for(self, queue, job_id):
+        """Poll a job until it has finished."""
+        for _ in range(500):
+            job = queue.get(job_id)
+            if job.finished:
+                return job
+            threading.Event().wait(0.01)
+        self.fail(f"job {job_id} did not finish")
+    
+    def test_submit_returns_before_the_job_runs(self):
+        """submit() should not wait for the runner; the result is kept on the job."""
+        release = threading.Event()
+        queue = JobQueue(lambda request: release.wait(5) and request * 2, workers=1)
+        self.addCleanup(queue.close)
+        job = queue.submit(21)
+        self.assertIn(job.status, ("queued", "running"))
+        release.set()
+        finished = self.wait_for(queue, job.id)
+        self.assertEqual(finished.status, "completed")
+        self.assertEqual(finished.result, 42)
+        self.assertIsNotNone(finished.finished_at)
+    
+    def test_failed_runner_marks_job_failed(self):
+        """An exception from the runner should fail the job with its message."""
+        def runner(request):
+            raise RuntimeError("container exploded")
+        queue = JobQueue(runner, workers=1)
+        self.addCleanup(queue.close)
+        job = self.wait_for(queue, queue.submit(None).id)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "container exploded")
+    
+    def test_pending_limit_and_history(self):
+        """Submissions beyond max_pending are refused; old finished jobs are forgotten."""
+        release = threading.Event()
+        queue = JobQueue(lambda request: release.wait(5), workers=1, max_pending=2, history=1)
+        self.addCleanup(queue.close)
+        first, second = queue.submit(1), queue.submit(2)
+        with self.assertRaises(QueueFull):
+            queue.submit(3)
+        release.set()
+        self.wait_for(queue, second.id)
+        self.assertIsNone(queue.get(first.id))
+        self.assertEqual(queue.stats()["completed"], 1)
+    
+    def test_asynchronous_runner_frees_its_worker(self):
+        """A runner returning a future should free its worker; the job settles with the future."""
+        from concurrent.futures import Future
+        futures = []
+        
+        def runner(request):
+            futures.append(Future())
+            return futures[-1]
+        queue = JobQueue(runner, workers=1, capacity=Quota(4.0, 4096))
+        self.addCleanup(queue.close)
+        first, second = queue.submit(1), queue.submit(2)
+        for _ in range(500):
+            if len(futures) == 2:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(len(futures), 2)
+        self.assertEqual(queue.stats()["cpus"]["used"], 2.0)
+        futures[0].set_result("done")
+        futures[1].cancel()
+        self.assertEqual(self.wait_for(queue, first.id).result, "done")
+        self.assertEqual(self.wait_for(queue, second.id).status, "cancelled")
+        self.assertEqual(queue.stats()["cpus"]["used"], 0.0)
+    
+    def test_cancel_queued_job(self):
+        """A cancelled queued job never runs and reports its completion callback."""
+        release = threading.Event()
+        ran, notified = [], []
+        queue = JobQueue(lambda request: release.wait(5) and ran.append(request), workers=1)
+        self.addCleanup(queue.close)
+        running = queue.submit(1)
+        queued = queue.submit(2, callback=notified.append)
+        while running.status == "queued":
+            threading.Event().wait(0.01)
+        self.assertIs(queue.cancel(queued.id), queued)
+        self.assertEqual(queued.status, "cancelled")
+        self.assertEqual(notified, [queued])
+        self.assertEqual(queue.cancel(running.id).status, "running")
+        self.assertIsNone(queue.cancel("unknown"))
+        release.set()
+        self.wait_for(queue, running.id)
+        self.assertEqual(ran, [1])
+        self.assertEqual(queue.stats()["cancelled"], 1)
+    
+    def test_close_cancels_queued_jobs(self):
+        """Jobs still waiting at close() are cancelled and report their completion callback."""
+        release = threading.Event()
+        ran, notified = [], []
+        queue = JobQueue(lambda request: release.wait(5) and ran.append(request), workers=1)
+        running = queue.submit(1)
+        queued = queue.submit(2, callback=notified.append)
+        while running.status == "queued":
+            threading.Event().wait(0.01)
+        queue.close()
+        self.assertEqual(queued.status, "cancelled")
+        self.assertIsNotNone(queued.finished_at)
+        self.assertEqual(notified, [queued])
+        release.set()
+        self.wait_for(queue, running.id)
+        self.assertEqual(ran, [1])
+        self.assertEqual((queue.stats()["queued"], queue.stats()["cancelled"]), (0, 1))
+    
+    def test_generated_container_names_are_unique(self):
+        """Requests without a container name should each get their own."""
+        simulation = TurtleBotSimulation()
+        self.addCleanup(simulation.close)
+        names = {simulation._container_name(SimulationRequest()) for _ in range(3)}
+        self.assertEqual(len(names), 3)
+        self.assertTrue(all(name.startswith("turtlebot-sim-") for name in names))
+        self.assertEqual(simulation._container_name(SimulationRequest(container_name="mine")), "mine")
+    
+    def test_simulate_endpoint_queues_job(self):
+        """POST /simulate should return a job id while the run is still in progress."""
+        from fastapi.testclient import TestClient
+        from simulation import main
+        
+        release = threading.Event()
+        
+        def runner(request):
+            release.wait(5)
+            return SimulationResponse(success=True, message="done", output=str(request.parameters))
+        
+        with TestClient(main.app) as client:
+            with patch.object(main.simulation_instance.jobs, "runner", runner):
+                response = client.post("/simulate", json={"parameters": {"max_time": "1"}})
+                self.assertEqual(response.status_code, 202)
+                job_id = response.json()["job_id"]
+                # The event loop stays responsive while the job runs
+                self.assertEqual(client.get("/status").status_code, 200)
+                self.assertIn(client.get(f"/jobs/{job_id}").json()["status"], ("queued", "running"))
+                release.set()
+                self.wait_for(main.simulation_instance.jobs, job_id)
+                body = client.get(f"/jobs/{job_id}").json()
+            self.assertEqual(client.get("/jobs/missing").status_code, 404)
+        self.assertEqual(body["status"], "completed")
+        self.assertTrue(body["result"]["success"])
+        self.assertEqual(body["result"]["output"], "{'max_time': '1'}")
+
+
+class TestWarmContainerPool(unittest.TestCase):
+    """Test exec-based dispatch into pre-started simulation containers."""
+    
+    def make_client(self, exit_codes=None):
+        """Mock Docker client whose execs stream one chunk and exit with the given codes."""
+        codes = iter(exit_codes or [])
+        client = Mock()
+        client.started = []
+        
+        def start(**kwargs):
+            container = Mock(id=f"container-{len(client.started)}")
+            client.started.append(container)
+            return container
+        client.containers.run.side_effect = start
+        client.api.exec_create.side_effect = lambda container_id, *args, **kwargs: {"Id": f"exec-{container_id}"}
+        client.api.exec_start.side_effect = lambda exec_id, stream: iter([b"Simulation completed successfully"])
+        client.api.exec_inspect.side_effect = lambda exec_id: {"ExitCode": next(codes, 0)}
+        client.images.get.return_value = Mock(id="sha256:image", attrs={})
+        return client
+    
+    def test_runs_reuse_warm_container(self):
+        """Sequential runs should share one container and get their own environment and directory."""
+        client = self.make_client()
+        pool = WarmContainerPool(client, "turtlebot-simulation:latest", min_size=1, max_size=2)
+        pool.warm()
+        self.assertEqual(client.containers.run.call_count, 1)
+        self.assertEqual(client.containers.run.call_args.kwargs["command"], ["sleep", "infinity"])
+        chunks = []
+        first = pool.run(["python3", "/app/simulation.py"], {"MAX_TIME": "1"}, chunks.append)
+        pool.run(["python3", "/app/simulation.py"], {"MAX_TIME": "2"}, chunks.append)
+        self.assertEqual(first, 0)
+        self.assertEqual(chunks, [b"Simulation completed successfully"] * 2)
+        self.assertEqual(client.containers.run.call_count, 1)
+        calls = client.api.exec_create.call_args_list
+        self.assertTrue(all(call.args[0] == "container-0" for call in calls))
+        self.assertEqual(calls[0].args[1][-2:], ["python3", "/app/simulation.py"])
+        self.assertEqual(calls[1].kwargs["environment"]["MAX_TIME"], "2")
+        self.assertNotEqual(calls[0].kwargs["environment"]["RUN_DIR"], calls[1].kwargs["environment"]["RUN_DIR"])
+    
+    def test_failed_and_worn_out_containers_recycled(self):
+        """A failing run or reaching max_runs should replace the container."""
+        client = self.make_client([1])
+        pool = WarmContainerPool(client, "image", min_size=0, max_size=1, max_runs=2)
+        self.assertEqual(pool.run(["false"], {}, len), 1)
+        client.started[0].remove.assert_called_once_with(force=True)
+        self.assertEqual(pool.stats()["size"], 0)
+        
+        pool.run(["true"], {}, len)
+        pool.run(["true"], {}, len)
+        self.assertEqual(client.containers.run.call_count, 2)
+        client.started[1].remove.assert_called_once_with(force=True)
+        self.assertEqual(pool.stats()["size"], 0)
+    
+    def test_pool_grows_to_max_and_shrinks_when_idle(self):
+        """Concurrent acquires start containers up to max_size; idle ones age out to min_size."""
+        client = self.make_client()
+        pool = WarmContainerPool(client, "image", min_size=1, max_size=2, idle_timeout=0.0, acquire_timeout=0.05)
+        first, second = pool.acquire(), pool.acquire()
+        self.assertEqual(pool.stats()["size"], 2)
+        with self.assertRaises(TimeoutError):
+            pool.acquire()
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual(pool.stats()["size"], 1)
+        pool.close()
+        self.assertEqual(pool.stats()["size"], 0)
+        self.assertEqual(sum(container.remove.call_count for container in client.started), 2)
+    
+    def test_idle_containers_expire_without_further_runs(self):
+        """Surplus containers left by a burst should be removed once idle, with no later release."""
+        client = self.make_client()
+        pool = WarmContainerPool(client, "image", min_size=0, max_size=2, idle_timeout=0.2)
+        self.addCleanup(pool.close)
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual(pool.stats()["idle"], 2)
+        deadline = time.monotonic() + 5
+        while pool.stats()["size"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(pool.stats()["size"], 0)
+        self.assertEqual([container.remove.call_count for container in client.started], [1, 1])
+    
+    def test_run_wrapper_never_globs_artifacts(self):
+        """Listed artifacts are removed by name; wildcards are rejected and never expanded."""
+        import subprocess
+        from pydantic import ValidationError
+        from simulation.containers import RUN_WRAPPER
+        
+        with self.assertRaises(ValidationError):
+            SimulationRequest(artifacts=["/*"])
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("old.json", "keep.json"):
+                with open(os.path.join(directory, name), "w") as f:
+                    f.write("{}")
+            artifacts = [os.path.join(directory, "old.json"), os.path.join(directory, "*.json")]
+            environment = {"PATH": os.environ.get("PATH", ""), "RUN_DIR": os.path.join(directory, "run"),
+                           "RUN_ARTIFACTS": " ".join(artifacts)}
+            subprocess.run(["sh", "-c", RUN_WRAPPER, "run", "true"], env=environment, check=True)
+            self.assertEqual(os.listdir(directory), ["keep.json"])
+    
+    @patch('simulation.main.docker.from_env')
+    def test_simulation_dispatches_to_pool(self, mock_docker):
+        """With SIMULATION_POOL_MAX set, Docker runs should exec into a pooled container."""
+        mock_client = self.make_client()
+        mock_docker.return_value = mock_client
+        with tempfile.TemporaryDirectory() as cache_dir, \
+             patch.dict(os.environ, {"SIMULATION_POOL_MAX": "2", "SIMULATION_CACHE_DIR": cache_dir}):
+            simulation = TurtleBotSimulation()
+            self.addCleanup(simulation.close)
+            request = SimulationRequest(parameters={"max_time": "1"}, use_cache=False)
+            first = simulation.run(request)
+            second = simulation.run(request)
+        self.assertTrue(first.success and second.success)
+        self.assertEqual(first.output, "Simulation completed successfully")
+        self.assertEqual(mock_client.containers.run.call_count, 1)
+        self.assertEqual(simulation.container_pool(request.image_name).stats()["idle"], 1)
+
+
+class TestImageMetadataCache(unittest.TestCase):
+    """Test cached image lookups kept fresh by Docker image events."""
+    
+    def setUp(self):
+        """Mock Docker client with one local image and a controllable events stream."""
+        import docker
+        self.events = queue.Queue()
+        self.local = {"turtlebot-simulation:latest": Mock(id="sha256:aaa", attrs={"RepoDigests": [], "Size": 42})}
+        
+        def get(name):
+            if name not in self.local:
+                raise docker.errors.ImageNotFound(name)
+            return self.local[name]
+        
+        def stream():
+            yield from iter(self.events.get, None)
+        
+        self.client = Mock()
+        self.client.images.get.side_effect = get
+        self.client.events.side_effect = lambda **kwargs: stream()
+        self.cache = ImageMetadataCache(self.client)
+        self.addCleanup(self.cache.stop)
+        self.addCleanup(self.events.put, None)
+    
+    def watch(self):
+        """Start the watcher and wait until it is subscribed."""
+        self.cache.start()
+        for _ in range(500):
+            if self.cache.stats()["watching"]:
+                return
+            threading.Event().wait(0.01)
+        self.fail("image event watcher did not start")
+    
+    def test_names_normalized(self):
+        """Untagged references should resolve to :latest."""
+        self.assertEqual(normalize_image_name("turtlebot-simulation"), "turtlebot-simulation:latest")
+        self.assertEqual(normalize_image_name("localhost:5000/sim"), "localhost:5000/sim:latest")
+        self.assertEqual(normalize_image_name("sim@sha256:abc"), "sim@sha256:abc")
+    
+    def test_lookups_uncached_without_watcher(self):
+        """Without an events subscription every lookup should go to the daemon."""
+        self.cache.get("turtlebot-simulation")
+        self.cache.get("turtlebot-simulation")
+        self.assertEqual(self.client.images.get.call_count, 2)
+    
+    def test_events_invalidate_cached_lookups(self):
+        """Hits and misses are cached until a matching image event arrives."""
+        self.watch()
+        info = self.cache.get("turtlebot-simulation")
+        self.assertEqual((info.id, info.size), ("sha256:aaa", 42))
+        self.assertIsNone(self.cache.get("missing:1"))
+        self.cache.get("turtlebot-simulation:latest")
+        self.cache.get("missing:1")
+        self.assertEqual(self.client.images.get.call_count, 2)
+        
+        self.local["missing:1"] = Mock(id="sha256:bbb", attrs={})
+        self.cache.invalidate({"Action": "pull", "Actor": {"ID": "missing:1", "Attributes": {"name": "missing"}}})
+        self.assertEqual(self.cache.get("missing:1").id, "sha256:bbb")
+        del self.local["turtlebot-simulation:latest"]
+        self.cache.invalidate({"Action": "delete", "Actor": {"ID": "sha256:aaa", "Attributes": {}}})
+        self.assertIsNone(self.cache.get("turtlebot-simulation"))
+        self.assertEqual(self.cache.stats()["hits"], 2)
+    
+    def test_stream_loss_disables_cache(self):
+        """When the events stream ends, lookups should bypass the cache again."""
+        self.watch()
+        self.cache.get("turtlebot-simulation")
+        self.events.put(None)
+        for _ in range(500):
+            if not self.cache.stats()["watching"]:
+                break
+            threading.Event().wait(0.01)
+        self.cache.get("turtlebot-simulation")
+        self.assertEqual(self.client.images.get.call_count, 2)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+    
+    def test_prepull_pulls_missing_images(self):
+        """prepull() should pull absent images and report which are available."""
+        self.watch()
+        self.client.images.pull.side_effect = lambda name: self.local.setdefault(name, Mock(id="sha256:ccc", attrs={}))
+        available = self.cache.prepull(["turtlebot-simulation", "other"])
+        self.assertEqual(available, {"turtlebot-simulation:latest": True, "other:latest": True})
+        self.client.images.pull.assert_called_once_with("other:latest")
+        self.assertEqual(self.cache.get("other").id, "sha256:ccc")
+
+
+class TestLogCapture(unittest.TestCase):
+    """Test bounded in-memory log excerpts backed by compressed log files."""
+    
+    def setUp(self):
+        """Log store with a tiny head and tail in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.store = LogStore(self.temp_dir.name, head_bytes=10, tail_bytes=10, max_files=2)
+    
+    def test_excerpt_keeps_head_and_tail(self):
+        """Only the head and tail should stay in memory; the full log is on disk."""
+        with self.store.create() as capture:
+            for line in range(100):
+                capture.write(f"line {line:03d}\n".encode())
+        self.assertEqual(capture.total_bytes, 900)
+        excerpt = capture.excerpt()
+        self.assertTrue(excerpt.startswith("line 000\nl"))
+        self.assertTrue(excerpt.endswith("\nline 099\n"))
+        self.assertIn(f"880 bytes omitted; full log at /logs/{capture.log_id}", excerpt)
+        self.assertEqual(self.store.read(capture.log_id, 450, 9), b"line 050\n")
+        self.assertEqual(self.store.size(capture.log_id), 900)
+        self.assertIsNone(self.store.read("../../etc/passwd"))
+    
+    def test_short_logs_returned_whole(self):
+        """Output within head plus tail should be returned unchanged."""
+        with self.store.create() as capture:
+            capture.write(b"hello ")
+            capture.write(b"world")
+        self.assertEqual(capture.excerpt(), "hello world")
+    
+    def test_oldest_logs_evicted(self):
+        """Creating a log beyond max_files should delete the oldest one."""
+        captures = []
+        for index in range(3):
+            with self.store.create() as capture:
+                capture.write(b"x")
+            os.utime(capture.path, (index, index))
+            captures.append(capture)
+        self.assertFalse(os.path.exists(captures[0].path))
+        self.assertIsNone(self.store.read(captures[0].log_id))
+        self.assertEqual(self.store.read(captures[2].log_id), b"x")
+    
+    def test_stream_process_output_and_timeout(self):
+        """stream_process should pass on stdout and stderr, and report a timeout as None."""
+        chunks = []
+        code = asyncio.run(stream_process(
+            [sys.executable, "-c", "import sys; print('out'); sys.stderr.write('err')"], chunks.append, timeout=30
+        ))
+        self.assertEqual(code, 0)
+        self.assertCountEqual(b"".join(chunks).split(), [b"out", b"err"])
+        self.assertIsNone(asyncio.run(
+            stream_process([sys.executable, "-c", "import time; time.sleep(30)"], len, timeout=0.2)
+        ))
+    
+    def test_stream_process_cancellation_kills_process(self):
+        """Cancelling stream_process should kill the process instead of waiting for it."""
+        async def cancel_soon():
+            task = asyncio.ensure_future(stream_process([sys.executable, "-c", "import time; time.sleep(30)"], len, 30))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            await task
+        
+        started = time.monotonic()
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(cancel_soon())
+        self.assertLess(time.monotonic() - started, 10)
+    
+    def test_logs_endpoint_reads_ranges(self):
+        """GET /logs/{id} should serve byte ranges of a stored log."""
+        from fastapi.testclient import TestClient
+        from simulation import main
+        
+        with self.store.create() as capture:
+            capture.write(b"0123456789" * 10)
+        with TestClient(main.app) as client:
+            with patch.object(main.simulation_instance, "logs", self.store):
+                response = client.get(f"/logs/{capture.log_id}", params={"offset": 95, "length": 10})
+                missing = client.get(f"/logs/{'0' * 32}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"56789")
+        self.assertEqual(response.headers["X-Log-Size"], "100")
+        self.assertEqual(missing.status_code, 404)
+
+
+class TestAdmissionControl(unittest.TestCase):
+    """Test capacity-bound admission, priorities and per-client fairness of the job queue."""
+    
+    def setUp(self):
+        """Runner that records start order and blocks each job until it is released."""
+        self.started = []
+        self.releases = {}
+        
+        def runner(name):
+            self.started.append(name)
+            self.releases.setdefault(name, threading.Event()).wait(5)
+            return name
+        self.runner = runner
+    
+    def make_queue(self, cpus, memory_mb=4096):
+        """Queue with plenty of workers so only capacity limits concurrency."""
+        queue = JobQueue(self.runner, workers=8, capacity=Quota(cpus, memory_mb), default_quota=Quota(1.0, 512))
+        self.addCleanup(queue.close)
+        self.addCleanup(lambda: [event.set() for event in self.releases.values()])
+        return queue
+    
+    def submit(self, queue, name, **kwargs):
+        """Submit a named job whose release event exists before it starts."""
+        self.releases[name] = threading.Event()
+        return queue.submit(name, **kwargs)
+    
+    def wait_started(self, count):
+        """Wait until `count` jobs have started."""
+        for _ in range(500):
+            if len(self.started) >= count:
+                break
+            threading.Event().wait(0.01)
+        threading.Event().wait(0.05)
+        self.assertEqual(len(self.started), count)
+    
+    def test_jobs_beyond_capacity_wait(self):
+        """Only jobs whose quotas fit the free CPUs and memory should run."""
+        queue = self.make_queue(cpus=2.0, memory_mb=1024)
+        for name in ("a", "b", "c"):
+            self.submit(queue, name)
+        self.wait_started(2)
+        stats = queue.stats()
+        self.assertEqual((stats["running"], stats["queued"]), (2, 1))
+        self.assertEqual(stats["memory_mb"], {"used": 1024, "capacity": 1024})
+        self.releases["a"].set()
+        self.wait_started(3)
+        with self.assertRaises(ValueError):
+            queue.submit("huge", quota=Quota(4.0, 512))
+    
+    def test_interactive_runs_before_batch(self):
+        """A later interactive job should start before earlier batch jobs."""
+        queue = self.make_queue(cpus=1.0)
+        self.submit(queue, "first")
+        self.wait_started(1)
+        self.submit(queue, "sweep-1", priority="batch")
+        self.submit(queue, "sweep-2", priority="batch")
+        self.submit(queue, "interactive", priority="interactive")
+        self.releases["first"].set()
+        self.wait_started(2)
+        self.assertEqual(self.started[1], "interactive")
+    
+    def test_clients_share_capacity_fairly(self):
+        """A client with nothing running should go ahead of one client's backlog."""
+        queue = self.make_queue(cpus=2.0)
+        for name in ("a1", "a2", "a3"):
+            self.submit(queue, name, client="a")
+        self.wait_started(2)
+        self.submit(queue, "b1", client="b")
+        self.releases["a1"].set()
+        self.wait_started(3)
+        self.assertEqual(self.started[2], "b1")
+    
+    @patch('simulation.main.docker.from_env')
+    def test_container_gets_quota_limits(self, mock_docker):
+        """Docker runs should be started with the request's CPU and memory limits."""
+        mock_client = Mock()
+        mock_docker.return_value = mock_client
+        mock_client.images.get.return_value = Mock(id="sha256:image", attrs={})
+        mock_container = Mock()
+        mock_container.wait.return_value = {'StatusCode': 0}
+        mock_container.logs.return_value = iter([b"done"])
+        mock_client.containers.run.return_value = mock_container
+        simulation = TurtleBotSimulation()
+        self.addCleanup(simulation.close)
+        simulation.run(SimulationRequest(cpus=1.5, memory_mb=256, use_cache=False))
+        kwargs = mock_client.containers.run.call_args.kwargs
+        self.assertEqual(kwargs["nano_cpus"], 1500000000)
+        self.assertEqual(kwargs["mem_limit"], "256m")
+
+
+class TestBatchSubmission(unittest.TestCase):
+    """Test POST /simulate/batch streaming NDJSON results."""
+    
+    def post_batch(self, body, runner, images=None):
+        """Post a batch with the job runner (and optionally the image cache) replaced."""
+        from fastapi.testclient import TestClient
+        from simulation import main
+        
+        with TestClient(main.app) as client:
+            instance = main.simulation_instance
+            with patch.object(instance.jobs, "runner", runner), \
+                 patch.object(instance.jobs, "capacity", Quota(8.0, 64 * 1024)), \
+                 patch.object(instance, "images", images or instance.images), \
+                 patch.object(instance, "is_docker_available", images is not None or instance.is_docker_available):
+                response = client.post("/simulate/batch", json=body)
+        return response
+    
+    def test_results_streamed_in_completion_order(self):
+        """Every request should get one line; faster runs should arrive first."""
+        lock = threading.Lock()
+        active = {"now": 0, "peak": 0}
+        
+        def runner(request):
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            threading.Event().wait(float(request.parameters["delay"]))
+            with lock:
+                active["now"] -= 1
+            return SimulationResponse(success=True, message="done", output=str(request.parameters["delay"]))
+        
+        delays = [0.3, 0.0, 0.2, 0.0]
+        body = {"requests": [{"parameters": {"delay": delay}} for delay in delays], "concurrency": 2}
+        response = self.post_batch(body, runner)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(sorted(line["index"] for line in lines), [0, 1, 2, 3])
+        self.assertEqual(lines[0]["index"], 1)
+        self.assertTrue(all(line["status"] == "completed" and line["result"]["success"] for line in lines))
+        self.assertLessEqual(active["peak"], 2)
+    
+    def test_missing_image_checked_once(self):
+        """Requests for a missing image should fail without running, after one lookup."""
+        images = Mock()
+        images.get.return_value = None
+        runner = Mock()
+        body = {"requests": [{"image_name": "absent:1", "backend": "docker"}] * 3}
+        response = self.post_batch(body, runner, images)
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all(line["result"]["error"] == "Image not available" for line in lines))
+        images.get.assert_called_once_with("absent:1")
+        runner.assert_not_called()
+    
+    def test_empty_batch_rejected(self):
+        """An empty request list should fail validation."""
+        response = self.post_batch({"requests": []}, Mock())
+        self.assertEqual(response.status_code, 422)
+
+
+def make_tar_chunks(files, chunk_size=7):
+    """Tar archive of {name: bytes} split into small chunks, like a get_archive stream."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    data = buffer.getvalue()
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+class TestArtifactStore(unittest.TestCase):
+    """Test content-addressed storage of artifacts collected as tar streams."""
+    
+    def setUp(self):
+        """Artifact store in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.store = ArtifactStore(self.temp_dir.name)
+    
+    def test_archive_members_stored_by_digest(self):
+        """Each file of a directory archive should be stored under its SHA-256."""
+        chunks = make_tar_chunks({"trajectory/meta.json": b"{}", "trajectory/poses.npy": b"\x93NUMPY" * 100})
+        stored = self.store.store_archive(iter(chunks), "/tmp/trajectory/")
+        self.assertEqual([entry["path"] for entry in stored], ["/tmp/trajectory/meta.json", "/tmp/trajectory/poses.npy"])
+        digest = hashlib.sha256(b"\x93NUMPY" * 100).hexdigest()
+        self.assertEqual(stored[1], {"path": "/tmp/trajectory/poses.npy", "digest": digest, "size": 600})
+        with open(self.store.path(digest), "rb") as f:
+            self.assertEqual(f.read(), b"\x93NUMPY" * 100)
+        self.assertIsNone(self.store.path("../../etc/passwd"))
+    
+    def test_identical_content_stored_once(self):
+        """Two runs producing the same file should share one stored copy."""
+        for _ in range(2):
+            self.store.store_archive(iter(make_tar_chunks({"simulation_results.json": b'{"ok": true}'})),
+                                     "/tmp/simulation_results.json")
+        files = [name for _, _, names in os.walk(self.temp_dir.name) for name in names]
+        self.assertEqual(len(files), 1)
+    
+    def test_oldest_artifacts_evicted(self):
+        """The store should drop the oldest files beyond max_bytes."""
+        store = ArtifactStore(self.temp_dir.name, max_bytes=150)
+        first = store.store_archive(iter(make_tar_chunks({"a": b"a" * 100})), "/tmp/a")[0]
+        os.utime(store.path(first["digest"]), (0, 0))
+        second = store.store_archive(iter(make_tar_chunks({"b": b"b" * 100})), "/tmp/b")[0]
+        self.assertFalse(os.path.exists(store.path(first["digest"])))
+        self.assertTrue(os.path.exists(store.path(second["digest"])))
+    
+    @patch('simulation.main.docker.from_env')
+    def test_docker_run_collects_artifacts(self, mock_docker):
+        """The results file should be fetched with get_archive before the container is removed."""
+        import docker
+        mock_client = Mock()
+        mock_docker.return_value = mock_client
+        mock_client.images.get.return_value = Mock(id="sha256:image", attrs={})
+        mock_container = Mock()
+        mock_container.wait.return_value = {'StatusCode': 0}
+        mock_container.logs.return_value = iter([b"done"])
+        results = b'{"status": "completed"}'
+        
+        def get_archive(path, chunk_size):
+            if path != "/tmp/simulation_results.json":
+                raise docker.errors.NotFound(path)
+            return iter(make_tar_chunks({"simulation_results.json": results})), {}
+        mock_container.get_archive.side_effect = get_archive
+        mock_client.containers.run.return_value = mock_container
+        
+        with patch.dict(os.environ, {"SIMULATION_ARTIFACT_DIR": self.temp_dir.name}):
+            simulation = TurtleBotSimulation()
+        self.addCleanup(simulation.close)
+        request = SimulationRequest(use_cache=False, artifacts=["/tmp/simulation_results.json", "/tmp/missing"])
+        response = simulation.run(request)
+        self.assertNotIn("remove", mock_client.containers.run.call_args.kwargs)
+        mock_container.remove.assert_called_once_with(force=True)
+        self.assertEqual([artifact.path for artifact in response.artifacts], ["/tmp/simulation_results.json"])
+        digest = response.artifacts[0].digest
+        self.assertEqual(digest, hashlib.sha256(results).hexdigest())
+        
+        from fastapi.testclient import TestClient
+        from simulation import main
+        with TestClient(main.app) as client:
+            with patch.object(main.simulation_instance, "artifacts", simulation.artifacts):
+                download = client.get(f"/artifacts/{digest}", params={"filename": "results.json"})
+                missing = client.get(f"/artifacts/{'0' * 64}")
+        self.assertEqual(download.content, results)
+        self.assertIn("results.json", download.headers["content-disposition"])
+        self.assertEqual(missing.status_code, 404)
+    
+    @patch('simulation.main.docker.from_env')
+    def test_cached_result_rerun_when_artifact_evicted(self, mock_docker):
+        """A cache hit whose artifacts left the store should run the container again."""
+        mock_client = Mock()
+        mock_docker.return_value = mock_client
+        mock_client.images.get.return_value = Mock(id="sha256:image", attrs={})
+        mock_container = Mock()
+        mock_container.wait.return_value = {'StatusCode': 0}
+        mock_container.logs.side_effect = lambda **kwargs: iter([b"done"])
+        mock_container.get_archive.side_effect = lambda path, chunk_size: (
+            iter(make_tar_chunks({"simulation_results.json": b'{"status": "completed"}'})), {})
+        mock_client.containers.run.return_value = mock_container
+        script_dir = os.path.join(self.temp_dir.name, "scripts")
+        os.makedirs(script_dir)
+        with open(os.path.join(script_dir, "simulation.py"), "w") as f:
+            f.write("print('simulating')\n")
+        
+        env = {"SIMULATION_ARTIFACT_DIR": os.path.join(self.temp_dir.name, "artifacts"),
+               "SIMULATION_CACHE_DIR": os.path.join(self.temp_dir.name, "cache")}
+        with patch.dict(os.environ, env), patch('simulation.main.SCRIPT_HOST_DIR', script_dir):
+            simulation = TurtleBotSimulation()
+            self.addCleanup(simulation.close)
+            request = SimulationRequest(artifacts=["/tmp/simulation_results.json"])
+            first = simulation.run(request)
+            self.assertTrue(simulation.run(request).cached)
+            os.remove(simulation.artifacts.path(first.artifacts[0].digest))
+            rerun = simulation.run(request)
+        
+        self.assertFalse(rerun.cached)
+        self.assertEqual(mock_client.containers.run.call_count, 2)
+        self.assertTrue(simulation.artifacts.exists(rerun.artifacts[0].digest))
+    
+    def test_artifact_paths_validated(self):
+        """Relative artifact paths should be rejected."""
+        with self.assertRaises(ValueError):
+            SimulationRequest(artifacts=["results.json"])
+
+
+FAKE_DOCKER = """#!/bin/sh
+echo "$@" >> "$FAKE_DOCKER_CALLS"
+if [ "$1" = run ]; then
+    echo started
+    echo warning >&2
+    exec sleep "${FAKE_DOCKER_SLEEP:-0}"
+fi
+exit 1
+"""
+
+
+class TestCliFallback(unittest.TestCase):
+    """Test the asyncio-based Docker CLI fallback against a fake docker executable."""
+    
+    def setUp(self):
+        """Put a fake docker on PATH and build a simulation without the Docker SDK."""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        docker_path = os.path.join(temp_dir.name, "docker")
+        with open(docker_path, "w") as f:
+            f.write(FAKE_DOCKER)
+        os.chmod(docker_path, 0o755)
+        self.calls = os.path.join(temp_dir.name, "calls")
+        environment = patch.dict(os.environ, {
+            "PATH": temp_dir.name + os.pathsep + os.environ["PATH"],
+            "FAKE_DOCKER_CALLS": self.calls,
+            "SIMULATION_LOG_DIR": os.path.join(temp_dir.name, "logs")
+        })
+        environment.start()
+        self.addCleanup(environment.stop)
+        with patch('simulation.main.docker.from_env', side_effect=Exception("no daemon")):
+            self.simulation = TurtleBotSimulation()
+        self.addCleanup(self.simulation.close)
+    
+    def docker_calls(self):
+        with open(self.calls) as f:
+            return f.read().splitlines()
+    
+    def test_output_captured_and_container_removed(self):
+        """Both output streams should reach the log, and the container should be removed afterwards."""
+        response = self.simulation.run(SimulationRequest(container_name="cli-run", parameters={"max_time": "1"}))
+        self.assertTrue(response.success)
+        self.assertIn("started", response.output)
+        self.assertIn("warning", response.output)
+        self.assertEqual(response.artifacts, [])
+        calls = self.docker_calls()
+        self.assertTrue(calls[0].startswith("run --name cli-run"))
+        self.assertEqual(calls[-1], "rm -f cli-run")
+    
+    def test_request_timeout(self):
+        """A run exceeding the request's timeout should fail and have its container removed."""
+        with patch.dict(os.environ, {"FAKE_DOCKER_SLEEP": "30"}):
+            response = self.simulation.run(SimulationRequest(container_name="cli-slow", timeout=0.5))
+        self.assertFalse(response.success)
+        self.assertEqual(response.message, "Simulation timed out")
+        self.assertEqual(self.docker_calls()[-1], "rm -f cli-slow")
+    
+    def test_concurrent_runs_share_one_loop(self):
+        """Runs should be coroutines on one event loop, and closing cancels them and removes their containers."""
+        outcomes = queue.Queue()
+        
+        def run(name):
+            try:
+                outcomes.put(self.simulation.run(SimulationRequest(container_name=name)))
+            except BaseException as e:
+                outcomes.put(e)
+        
+        with patch.dict(os.environ, {"FAKE_DOCKER_SLEEP": "30"}):
+            threads = [threading.Thread(target=run, args=(f"cli-{index}",)) for index in range(3)]
+            for thread in threads:
+                thread.start()
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and (
+                    not os.path.exists(self.calls) or len(self.docker_calls()) < 3):
+                time.sleep(0.05)
+            cli_threads = [thread for thread in threading.enumerate() if thread.name == "simulation-cli"]
+            self.assertEqual(len(cli_threads), 1)
+            self.simulation.close()
+            for thread in threads:
+                thread.join(10)
+        
+        for _ in threads:
+            self.assertNotIsInstance(outcomes.get(timeout=1), SimulationResponse)
+        self.assertCountEqual([call for call in self.docker_calls() if call.startswith("rm")],
+                              ["rm -f cli-0", "rm -f cli-1", "rm -f cli-2"])
+    
+    def test_cli_jobs_hold_no_worker_thread(self):
+        """With one job worker, CLI jobs should still run concurrently up to the capacity."""
+        with patch.dict(os.environ, {"SIMULATION_JOB_WORKERS": "1", "SIMULATION_CAPACITY_CPUS": "4",
+                                     "FAKE_DOCKER_SLEEP": "30"}), \
+             patch('simulation.main.docker.from_env', side_effect=Exception("no daemon")):
+            simulation = TurtleBotSimulation()
+            self.addCleanup(simulation.close)
+            jobs = [simulation.submit(SimulationRequest(container_name=f"cli-job-{index}")) for index in range(2)]
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and (
+                    not os.path.exists(self.calls) or len(self.docker_calls()) < 2):
+                time.sleep(0.05)
+        self.assertEqual([job.status for job in jobs], ["running", "running"])
+        for job in jobs:
+            simulation.cancel(job.id)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and not all(job.finished for job in jobs):
+            time.sleep(0.05)
+        self.assertEqual([job.status for job in jobs], ["cancelled", "cancelled"])
+    
+    def test_cancel_running_job(self):
+        """Cancelling a running CLI job should stop it and remove its container."""
+        with patch.dict(os.environ, {"FAKE_DOCKER_SLEEP": "30"}):
+            job = self.simulation.submit(SimulationRequest(container_name="cli-cancel"))
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and not os.path.exists(self.calls):
+                time.sleep(0.05)
+        started = time.monotonic()
+        self.assertIs(self.simulation.cancel(job.id), job)
+        while not job.finished and time.monotonic() < started + 10:
+            time.sleep(0.05)
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertEqual(job.status, "cancelled")
+        self.assertEqual(self.docker_calls()[-1], "rm -f cli-cancel")
+
+
+class TestMetrics(unittest.TestCase):
+    """Test the Prometheus metrics registry and the /metrics endpoint."""
+    
+    def test_exposition_format(self):
+        """Counters, gauges and histograms should render in the Prometheus text format."""
+        registry = MetricsRegistry()
+        runs = registry.counter("runs_total", "Runs", ("image",))
+        registry.gauge("depth", "Queue depth", ("priority",), callback=lambda: {("normal",): 3})
+        latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        runs.inc(image='say "hi"')
+        runs.inc(2, image='say "hi"')
+        for value in (0.05, 0.5, 5.0):
+            latency.observe(value)
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE runs_total counter", lines)
+        self.assertIn('runs_total{image="say \\"hi\\""} 3.0', lines)
+        self.assertIn('depth{priority="normal"} 3.0', lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1.0', lines)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 2.0', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3.0', lines)
+        self.assertIn("latency_seconds_sum 5.55", lines)
+        self.assertIn("latency_seconds_count 3.0", lines)
+        with self.assertRaises(ValueError):
+            runs.inc(path="sdk")
+    
+    @patch('simulation.main.docker.from_env')
+    def test_runs_recorded_by_path_and_image(self, mock_docker):
+        """A Docker SDK run should be timed at each stage and counted by path, image and outcome."""
+        import docker
+        mock_client = Mock()
+        mock_docker.return_value = mock_client
+        mock_client.images.get.return_value = Mock(id="sha256:image", attrs={})
+        mock_container = Mock()
+        mock_container.wait.side_effect = [{'StatusCode': 0}, {'StatusCode': 1}]
+        mock_container.logs.side_effect = lambda **kwargs: iter([b"output"])
+        mock_container.get_archive.side_effect = docker.errors.NotFound("missing")
+        mock_client.containers.run.return_value = mock_container
+        
+        simulation = TurtleBotSimulation()
+        self.addCleanup(simulation.close)
+        self.assertTrue(simulation.run(SimulationRequest(use_cache=False)).success)
+        self.assertFalse(simulation.run(SimulationRequest(use_cache=False)).success)
+        
+        image = "turtlebot-simulation:latest"
+        self.assertEqual(simulation.runs_total.value(path="sdk", image=image, outcome="success"), 1)
+        self.assertEqual(simulation.runs_total.value(path="sdk", image=image, outcome="failure"), 1)
+        self.assertEqual(simulation.image_lookup_seconds.count(), 2)
+        self.assertEqual(simulation.container_start_seconds.count(path="sdk"), 2)
+        self.assertEqual(simulation.run_seconds.count(path="sdk"), 2)
+        self.assertEqual(simulation.log_collection_seconds.count(path="sdk"), 2)
+        self.assertEqual(simulation.running_containers.value(path="sdk"), 0)
+    
+    def test_metrics_endpoint(self):
+        """GET /metrics should serve the registry as Prometheus text."""
+        from fastapi.testclient import TestClient
+        from simulation import main
+        
+        with TestClient(main.app) as client:
+            response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('simulation_queue_depth{priority="interactive"} 0.0', response.text)
+        self.assertIn("simulation_jobs_running 0.0", response.text)
+        self.assertIn("# TYPE simulation_run_seconds histogram", response.text)
+
+
 def run_tests():
     """Run all simulation tests."""
     print("🧪 Running simulation tests...")
@@ -195,6 +2169,31 @@ def run_tests():
     # Add test cases
     test_suite.addTest(unittest.makeSuite(TestSimulationFunctionCalling))
     test_suite.addTest(unittest.makeSuite(TestFunctionAttributeErrorFixes))
+    test_suite.addTest(unittest.makeSuite(TestSimulationPacing))
+    test_suite.addTest(unittest.makeSuite(TestSwarmSimulator))
+    test_suite.addTest(unittest.makeSuite(TestExactIntegrator))
+    test_suite.addTest(unittest.makeSuite(TestTrajectoryRecorder))
+    test_suite.addTest(unittest.makeSuite(TestStreamingTelemetry))
+    test_suite.addTest(unittest.makeSuite(TestParameterSweep))
+    test_suite.addTest(unittest.makeSuite(TestSpatialIndex))
+    test_suite.addTest(unittest.makeSuite(TestWorldLoader))
+    test_suite.addTest(unittest.makeSuite(TestResultCache))
+    test_suite.addTest(unittest.makeSuite(TestSimulatorBenchmarks))
+    test_suite.addTest(unittest.makeSuite(TestPhaseProfiler))
+    test_suite.addTest(unittest.makeSuite(TestMotionModels))
+    test_suite.addTest(unittest.makeSuite(TestSharedMemorySwarm))
+    test_suite.addTest(unittest.makeSuite(TestRateScheduler))
+    test_suite.addTest(unittest.makeSuite(TestPlanarLidar))
+    test_suite.addTest(unittest.makeSuite(TestInProcessBackend))
+    test_suite.addTest(unittest.makeSuite(TestJobQueue))
+    test_suite.addTest(unittest.makeSuite(TestWarmContainerPool))
+    test_suite.addTest(unittest.makeSuite(TestImageMetadataCache))
+    test_suite.addTest(unittest.makeSuite(TestLogCapture))
+    test_suite.addTest(unittest.makeSuite(TestAdmissionControl))
+    test_suite.addTest(unittest.makeSuite(TestBatchSubmission))
+    test_suite.addTest(unittest.makeSuite(TestArtifactStore))
+    test_suite.addTest(unittest.makeSuite(TestCliFallback))
+    test_suite.addTest(unittest.makeSuite(TestMetrics))
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)